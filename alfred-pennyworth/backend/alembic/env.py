@@ -17,6 +17,7 @@ from app.models.meal import Meal
 from app.models.sleep import Sleep
 from app.models.activity import Activity
 from app.models.calendar_event import CalendarEvent
+from app.models.user_baseline import UserBaseline
 
 config = context.config
 database_url = settings.DATABASE_URL.replace("+asyncpg", "")
@@ -10,6 +10,7 @@ from typing import Optional
 
 from app.core.database import get_db
 from app.models.activity import Activity
+from app.services import detection_cache, rolling_stats
 
 router = APIRouter()
 
@@ -36,6 +37,10 @@ async def create_activity(
     db.add(new_activity)
     await db.commit()
     await db.refresh(new_activity)
+    await rolling_stats.record_activity(
+        user_id, new_activity.id, new_activity.start_time, new_activity.calories_burned
+    )
+    await detection_cache.bump_data_version(user_id)
     return new_activity
 
 
@@ -6,10 +6,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
 from datetime import datetime, timedelta, timezone
 from pydantic import BaseModel
-from openai import AsyncOpenAI
 
-from app.core.config import settings
 from app.core.database import get_db
+from app.core.llm_client import get_llm_client
 from app.core.logging import logger
 from app.models.meal import Meal
 from app.models.sleep import Sleep
@@ -17,8 +16,6 @@ from app.models.activity import Activity
 
 router = APIRouter()
 
-_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-
 SYSTEM_PROMPT = """You are Alfred Pennyworth, a sophisticated AI wellness assistant.
 You help users with nutrition, sleep, hydration, exercise, and general wellbeing.
 Be warm, concise, and practical. Use the user's recent health data when relevant.
@@ -70,7 +67,7 @@ async def chat(
     context = "\n".join(context_lines)
 
     try:
-        resp = await _client.chat.completions.create(
+        resp = await get_llm_client().chat.completions.create(
             model="gpt-4-turbo-preview",
             messages=[
                 {"role": "system", "content": f"{SYSTEM_PROMPT}\n\nUser context:\n{context}"},
@@ -6,6 +6,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from app.core.database import get_db
 from app.core.config import settings
+from app.services.nutrition import gpt_cache_stats, result_cache_stats
+from app.services.intervention_sweep import sweep_progress
+from app.services.nutrition_executor import nutrition_executor_stats
+from app.services.signal_detector import detector_stats
 
 router = APIRouter()
 
@@ -36,4 +40,26 @@ async def get_config():
         "gpt_model": settings.GPT_MODEL
     }
 
+
+@router.get("/nutrition")
+async def nutrition_stats():
+    """Nutrition engine, executor queue and GPT fallback cache counters"""
+    return {
+        "result_cache": result_cache_stats(),
+        "executor":     nutrition_executor_stats(),
+        "gpt_cache":    gpt_cache_stats(),
+    }
+
+
+@router.get("/signals")
+async def signal_stats():
+    """Per-detector runs, hit rate, pruned runs and latency histogram"""
+    return detector_stats()
+
+
+@router.get("/sweep")
+async def sweep_stats():
+    """Progress and per-chunk timings of the latest intervention sweep"""
+    return await sweep_progress() or {"status": "no sweep recorded"}
+
 ################################################################################
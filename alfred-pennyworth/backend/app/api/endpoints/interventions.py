@@ -4,7 +4,7 @@ Interventions API endpoint - Main Alfred functionality.
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select
 from typing import List, Optional
 from datetime import datetime, timedelta, timezone
 from pydantic import BaseModel
@@ -12,9 +12,11 @@ from pydantic import BaseModel
 from app.core.config import settings
 from app.core.database import get_db
 from app.core.logging import logger
-from app.models.intervention import Intervention, InterventionStatus, InterventionType
-from app.models.user import User
-from app.services.alfred_agent import alfred_agent, Signal, SignalType
+from app.models.intervention import Intervention, InterventionStatus
+from app.services.alfred_agent import alfred_agent
+from app.services import detection_cache, intervention_gate, wellness_data
+from app.services.interventions import new_intervention, user_data
+from app.services.baselines import load_baselines
 from app.services.signal_detector import detect_signals
 
 router = APIRouter()
@@ -41,150 +43,83 @@ async def generate_intervention(
 ):
     """Generate AI-powered intervention for user"""
     logger.info(f"Generating intervention for user {user_id}")
+    claimed = False
     
     try:
-        result = await db.execute(select(User).where(User.id == user_id))
-        user = result.scalar_one_or_none()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        from app.models.meal import Meal
-        from app.models.sleep import Sleep
-        from app.models.activity import Activity
-        from app.models.calendar_event import CalendarEvent
-        
         # Get current UTC time and ensure timezone consistency
         current_time = datetime.now(timezone.utc)
 
+        # Quiet hours, daily quota and cooldown, from Redis before anything else
+        gate = (await intervention_gate.load_states([user_id], current_time, db)).get(user_id)
+        if gate is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        reason = gate.blocked(current_time)
+        if reason:
+            logger.info(f"Intervention for user {user_id} gated: {reason}")
+            return JSONResponse(status_code=204, content={"detail": f"Intervention gated: {reason}"})
+
         window = timedelta(days=settings.PATTERN_DETECTION_WINDOW_DAYS)
 
-        # Get meals within detection window
-        recent_meals_result = await db.execute(
-            select(Meal).where(
-                and_(
-                    Meal.user_id == user_id,
-                    Meal.meal_time >= current_time - window
-                )
-            ).order_by(Meal.meal_time.desc())
-        )
-        recent_meals = [{"meal_time": m.meal_time, "meal_type": m.meal_type,
-                        "calories": m.calories, "water_ml": m.water_ml,
-                        "description": m.description}
-                       for m in recent_meals_result.scalars().all()]
-
-        # Get sleep within detection window
-        recent_sleep_result = await db.execute(
-            select(Sleep).where(
-                and_(
-                    Sleep.user_id == user_id,
-                    Sleep.sleep_start >= current_time - window
-                )
-            ).order_by(Sleep.sleep_start.desc())
-        )
-        recent_sleep = [{"sleep_start": s.sleep_start, "sleep_end": s.sleep_end,
-                        "duration_minutes": s.duration_minutes, "quality_score": s.quality_score}
-                       for s in recent_sleep_result.scalars().all()]
-
-        # Get activities within detection window
-        recent_activities_result = await db.execute(
-            select(Activity).where(
-                and_(
-                    Activity.user_id == user_id,
-                    Activity.start_time >= current_time - window
-                )
-            ).order_by(Activity.start_time.desc())
-        )
-        recent_activities = [{"start_time": a.start_time, "activity_type": a.activity_type,
-                              "duration_minutes": a.duration_minutes, "calories_burned": a.calories_burned,
-                              "intensity_level": a.intensity_level}
-                             for a in recent_activities_result.scalars().all()]
-
-        # Get upcoming calendar
-        upcoming_calendar_result = await db.execute(
-            select(CalendarEvent).where(
-                and_(
-                    CalendarEvent.user_id == user_id,
-                    CalendarEvent.start_time >= current_time,
-                    CalendarEvent.start_time <= current_time + timedelta(days=1)
-                )
-            ).order_by(CalendarEvent.start_time)
-        )
-        upcoming_calendar = [{"title": e.title, "start_time": e.start_time,
-                             "end_time": e.end_time, "duration_minutes": e.duration_minutes}
-                            for e in upcoming_calendar_result.scalars().all()]
+        async def load_window():
+            # Read the data version before the tables, so a write in between
+            # leaves the cached window under an older version
+            version = await detection_cache.data_version(user_id)
+            cached = detection_cache.get(user_id, version)
+            if cached is not None:
+                since = current_time - window
+                return cached.window_at(current_time, since), cached.patterns_since(since), cached
+            wellness, patterns = await wellness_data.fetch_window(user_id, current_time, db)
+            return wellness, patterns, detection_cache.put(user_id, version, wellness, patterns)
+
+        # Every read goes through the request session, so a request holds one connection;
+        # the window and the generator's meal and sleep patterns are one statement
+        wellness, patterns, cached = await load_window()
+
+        # Current per-user baselines; missing ones come from this window
+        baselines = await load_baselines(db, user_id, wellness)
 
         # ML-based signal detection across all wellness dimensions
         signal = detect_signals(
-            meals=recent_meals,
-            sleep_records=recent_sleep,
-            activities=recent_activities,
-            now=current_time,
+            wellness,
+            user_id=user_id,
+            baselines=baselines,
+            memo=cached.memo_for(wellness.today) if cached is not None else None,
         )
 
         if not signal:
             return JSONResponse(status_code=204, content={"detail": "No intervention needed at this time"})
-        
-        # Get recent interventions
-        recent_interventions_result = await db.execute(
-            select(Intervention).where(
-                and_(
-                    Intervention.user_id == user_id,
-                    Intervention.created_at >= current_time - timedelta(hours=24)
-                )
-            ).order_by(Intervention.created_at.desc()).limit(10)
-        )
-        recent_interventions = [{"type": i.type.value, "title": i.title,
-                                "created_at": i.created_at.isoformat(), 
-                                "user_response": i.user_response}
-                               for i in recent_interventions_result.scalars().all()]
-        
-        user_data = {
-            "timezone": user.timezone,
-            "dietary_preferences": user.dietary_preferences,
-            "fitness_goals": user.fitness_goals,
-            "upcoming_calendar": upcoming_calendar
-        }
+
+        if not gate.admits(signal):
+            logger.info(
+                f"Signal {signal.type.value} for user {user_id} below confidence threshold "
+                f"({signal.confidence:.2f} < {gate.confidence_threshold:.2f})"
+            )
+            return JSONResponse(status_code=204, content={"detail": "No intervention needed at this time"})
+
+        # Take the quota slot and start the cooldown; a concurrent request may have got there first
+        claimed = (await intervention_gate.claim({user_id: gate}, current_time))[user_id]
+        if not claimed:
+            return JSONResponse(status_code=204, content={"detail": "Intervention gated: claimed concurrently"})
+
+        # Calendar and the last day's interventions, one statement; the user's
+        # profile comes with the gate state
+        upcoming_calendar, recent_meals, recent_sleep, recent_interventions = (
+            await wellness_data.fetch_contexts({user_id: patterns}, current_time, db)
+        )[user_id]
         
         intervention_data = await alfred_agent.generate_intervention(
-            user_data=user_data,
+            user_data=user_data(gate, upcoming_calendar),
             signal=signal,
-            user_patterns={"meals": recent_meals[:7], "sleep": recent_sleep[:7]},
+            user_patterns={"meals": recent_meals, "sleep": recent_sleep},
             recent_interventions=recent_interventions
         )
         
         if not intervention_data:
             logger.warning("Intervention generator returned no result, returning no content")
+            await intervention_gate.release([user_id], current_time)
             return JSONResponse(status_code=204, content={"detail": "No intervention needed at this time"})
         
-        # Map AI signal type to intervention type enum safely
-        signal_to_intervention_type = {
-            SignalType.MEAL_GAP: InterventionType.MEAL,
-            SignalType.LOW_ENERGY: InterventionType.ENERGY,
-            SignalType.POOR_SLEEP: InterventionType.REST,
-            SignalType.DEHYDRATION: InterventionType.HYDRATION,
-            SignalType.CALENDAR_CONFLICT: InterventionType.FOCUS,
-            SignalType.RECOVERY_NEEDED: InterventionType.REST,
-            SignalType.STRESS_HIGH: InterventionType.GENERAL,
-        }
-
-        intervention_type = signal_to_intervention_type.get(signal.type, InterventionType.GENERAL)
-
-        # Keep generated source in recommendation_data for observability
-        rec_data = intervention_data.get("recommendation_data", {})
-        if intervention_data.get("generated_by"):
-            rec_data = {**rec_data, "generated_by": intervention_data.get("generated_by")}
-
-        intervention = Intervention(
-            user_id=user_id,
-            type=intervention_type,
-            status=InterventionStatus.PENDING,
-            title=intervention_data["title"],
-            message=intervention_data["message"],
-            reasoning=intervention_data["reasoning"],
-            confidence_score=intervention_data["confidence"],
-            triggering_signals=[signal.to_dict()],
-            recommendation_data=rec_data
-        )
+        intervention = new_intervention(user_id, signal, intervention_data)
         
         db.add(intervention)
         await db.commit()
@@ -198,6 +133,8 @@ async def generate_intervention(
     except Exception as e:
         logger.error(f"Error generating intervention: {e}", exc_info=True)
         await db.rollback()
+        if claimed:
+            await intervention_gate.release([user_id], current_time)
         raise HTTPException(status_code=500, detail="Failed to generate intervention")
 
 
@@ -7,19 +7,29 @@ not supply them.  A confidence score and parse method are stored in
 calculated_features so the frontend can show a disclaimer for estimates.
 
 POST /meals/parse  — analyse description without saving, for live preview.
-GET  /meals/suggest — top suggested dishes based on user history.
+POST /meals/parse/batch — analyse many descriptions in one call (importers, bulk sync).
+GET  /meals/suggest — top suggested dishes from the user's decayed dish counts.
 """
 from fastapi import APIRouter, Depends, Query
+from fastapi.responses import Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from datetime import datetime, timezone
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from dataclasses import asdict
 
 from app.core.database import get_db
 from app.models.meal import Meal
-from app.services.nutrition import estimate_nutrition_async, suggest_dishes
+from app.services import detection_cache, dish_frequency, rolling_stats
+from app.services.nutrition import (
+    estimate_nutrition_async,
+    estimate_nutrition_batch,
+    fill_suggestions,
+    nutrition_batch_json,
+    nutrition_json,
+    suggest_dishes,
+)
 
 router = APIRouter()
 
@@ -49,31 +59,11 @@ class ParseRequest(BaseModel):
     servings: Optional[float] = 1.0
 
 
-# ─────────────────────────────────────────────────────────────────────────────
-# Helpers
-# ─────────────────────────────────────────────────────────────────────────────
+MAX_BATCH_ITEMS = 5000
+
 
-def _nutrition_response(result) -> dict:
-    """Serialise NutritionResult to a JSON-friendly dict."""
-    ingredients_out = []
-    for ing in result.ingredients:
-        ingredients_out.append({
-            "name":        ing.name,
-            "matched_key": ing.matched_key,
-            "amount_g":    ing.amount_g,
-            "confidence":  ing.confidence,
-        })
-    return {
-        "calories":     result.calories,
-        "protein_g":    result.protein_g,
-        "carbs_g":      result.carbs_g,
-        "fat_g":        result.fat_g,
-        "fiber_g":      result.fiber_g,
-        "confidence":   result.confidence,
-        "method":       result.method,
-        "dish_matched": result.dish_matched,
-        "ingredients":  ingredients_out,
-    }
+class BatchParseRequest(BaseModel):
+    items: List[ParseRequest] = Field(..., max_length=MAX_BATCH_ITEMS)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -88,7 +78,21 @@ async def parse_meal(body: ParseRequest):
     Useful for live preview in the frontend before the user confirms logging.
     """
     result = await estimate_nutrition_async(body.description, servings=body.servings or 1.0)
-    return _nutrition_response(result)
+    return Response(nutrition_json(result), media_type="application/json")
+
+
+@router.post("/parse/batch")
+async def parse_meals_batch(body: BatchParseRequest):
+    """
+    Analyse many meal descriptions without saving.
+    Identical descriptions are estimated once and only low-confidence
+    leftovers reach the GPT fallback.  Results are returned in request order.
+    """
+    results = await estimate_nutrition_batch(
+        [item.description for item in body.items],
+        servings=[item.servings or 1.0 for item in body.items],
+    )
+    return Response(nutrition_batch_json(results), media_type="application/json")
 
 
 @router.get("/suggest")
@@ -97,7 +101,12 @@ async def suggest(
     limit: int = 8,
     db: AsyncSession = Depends(get_db),
 ):
-    """Return dish suggestions ranked by user history frequency."""
+    """Return dish suggestions ranked by time-decayed user history frequency."""
+    ranked = await dish_frequency.top_dishes(user_id, limit, db)
+    if ranked is not None:
+        return {"suggestions": fill_suggestions(ranked, limit=limit)}
+
+    # Index unavailable: rank the recent history directly
     rows = await db.execute(
         select(Meal.description)
         .where(Meal.user_id == user_id)
@@ -166,6 +175,9 @@ async def create_meal(
     db.add(new_meal)
     await db.commit()
     await db.refresh(new_meal)
+    await dish_frequency.record_meal(user_id, meal.description, meal.meal_time)
+    await rolling_stats.record_meal(user_id, new_meal.id, new_meal.meal_time, new_meal.calories)
+    await detection_cache.bump_data_version(user_id)
     return new_meal
 
 
@@ -10,6 +10,7 @@ from typing import Optional
 
 from app.core.database import get_db
 from app.models.sleep import Sleep
+from app.services import detection_cache, rolling_stats
 
 router = APIRouter()
 
@@ -35,6 +36,10 @@ async def create_sleep_record(
     db.add(new_sleep)
     await db.commit()
     await db.refresh(new_sleep)
+    await rolling_stats.record_sleep(
+        user_id, new_sleep.id, new_sleep.sleep_start, new_sleep.duration_minutes, new_sleep.quality_score
+    )
+    await detection_cache.bump_data_version(user_id)
     return new_sleep
 
 
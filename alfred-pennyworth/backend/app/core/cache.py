@@ -0,0 +1,224 @@
+"""
+Persistent key/value cache shared across workers.
+
+Redis is the primary store.  While Redis is unreachable, entries go to an
+on-disk SQLite file instead, so a single host still avoids repeat work.
+Values are JSON; a stored null is a negative entry (a remembered failure)
+and lives for a shorter TTL.
+
+get_or_fetch coalesces concurrent misses for the same key: within a
+process they await one shared task, and across workers a short Redis lock
+lets one leader fetch while the others wait for its result.
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+from redis.exceptions import RedisError
+
+from app.core.logging import logger
+from app.core.redis_client import mark_redis_down, redis_available, redis_client
+
+MISS = object()
+
+# Expired SQLite rows are deleted on a write at most this often
+_SQLITE_PURGE_SECONDS = 300.0
+
+
+class _SQLiteStore:
+    """Minimal TTL key/value table; calls are blocking, run them in a thread."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._purged_at = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row[0]
+
+    def set(self, key: str, value: str, ttl_seconds: int) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl_seconds),
+            )
+            if now - self._purged_at >= _SQLITE_PURGE_SECONDS:
+                conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+                self._purged_at = now
+
+
+class PersistentCache:
+    """Namespaced JSON cache backed by Redis with a SQLite fallback."""
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl_seconds: int,
+        negative_ttl_seconds: int,
+        sqlite_path: str,
+        lock_seconds: int = 30,
+        lock_wait_seconds: float = 10.0,
+    ):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.lock_seconds = lock_seconds
+        self.lock_wait_seconds = lock_wait_seconds
+        self._sqlite = _SQLiteStore(sqlite_path)
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.hits = self.negative_hits = self.misses = self.coalesced = 0
+
+    def _key(self, key: str) -> str:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return f"{self.namespace}:{digest}"
+
+    # -- storage ------------------------------------------------------------
+
+    # Redis is skipped while the shared down-circuit is open (see redis_client)
+
+    def _redis_available(self) -> bool:
+        return redis_available()
+
+    def _mark_redis_down(self, exc: Exception) -> None:
+        if self._redis_available():
+            logger.warning(f"Redis unavailable for cache '{self.namespace}', using SQLite: {exc}")
+        mark_redis_down(exc)
+
+    async def _read(self, full_key: str) -> Optional[str]:
+        if self._redis_available():
+            try:
+                return await redis_client().get(full_key)
+            except (RedisError, OSError) as exc:
+                self._mark_redis_down(exc)
+        return await asyncio.to_thread(self._sqlite.get, full_key)
+
+    async def _write(self, full_key: str, raw: str, ttl_seconds: int) -> None:
+        if self._redis_available():
+            try:
+                await redis_client().set(full_key, raw, ex=ttl_seconds)
+                return
+            except (RedisError, OSError) as exc:
+                self._mark_redis_down(exc)
+        await asyncio.to_thread(self._sqlite.set, full_key, raw, ttl_seconds)
+
+    async def get(self, key: str) -> Any:
+        """Return the cached value (None for a negative entry) or MISS."""
+        try:
+            raw = await self._read(self._key(key))
+            return MISS if raw is None else json.loads(raw)
+        except Exception as exc:
+            # Unreachable stores and corrupt or truncated entries alike
+            logger.warning(f"Cache read failed for '{self.namespace}': {exc}")
+            return MISS
+
+    async def set(self, key: str, value: Any) -> None:
+        """Store a value; None is stored as a short-lived negative entry."""
+        ttl = self.ttl_seconds if value is not None else self.negative_ttl_seconds
+        try:
+            await self._write(self._key(key), json.dumps(value), ttl)
+        except Exception as exc:
+            logger.warning(f"Cache write failed for '{self.namespace}': {exc}")
+
+    # -- cross-worker lock ----------------------------------------------------
+
+    async def _acquire(self, lock_key: str) -> bool:
+        if not self._redis_available():
+            return True
+        try:
+            return bool(await redis_client().set(lock_key, "1", nx=True, ex=self.lock_seconds))
+        except (RedisError, OSError) as exc:
+            self._mark_redis_down(exc)
+            return True
+
+    async def _release(self, lock_key: str) -> None:
+        if not self._redis_available():
+            return
+        try:
+            await redis_client().delete(lock_key)
+        except (RedisError, OSError) as exc:
+            self._mark_redis_down(exc)
+
+    # -- single-flight ------------------------------------------------------
+
+    async def _load(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        lock_key = f"{self._key(key)}:lock"
+        leader = await self._acquire(lock_key)
+        if not leader:
+            # Another worker is already fetching; wait for its result
+            self.coalesced += 1
+            deadline = time.monotonic() + self.lock_wait_seconds
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+                value = await self.get(key)
+                if value is not MISS:
+                    return value
+        try:
+            value = await fetch()
+            await self.set(key, value)
+            return value
+        finally:
+            if leader:
+                await self._release(lock_key)
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value for key, calling fetch() on a miss.
+
+        fetch returning None records a negative entry.  Concurrent callers
+        missing on the same key share a single fetch.
+        """
+        value = await self.get(key)
+        if value is not MISS:
+            if value is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(key, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one caller's cancellation does not cancel the shared fetch
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "namespace":     self.namespace,
+            "backend":       "redis" if self._redis_available() else "sqlite",
+            "hits":          self.hits,
+            "negative_hits": self.negative_hits,
+            "misses":        self.misses,
+            "coalesced":     self.coalesced,
+            "inflight":      len(self._inflight),
+        }
@@ -32,7 +32,7 @@ celery_app.conf.update(
 celery_app.conf.beat_schedule = {
     "check-interventions": {
         "task": "app.tasks.intervention_tasks.check_and_generate_interventions",
-        "schedule": crontab(minute="*/15"),
+        "schedule": crontab(minute=f"*/{settings.INTERVENTION_SWEEP_INTERVAL_MINUTES}"),
     },
     "retrain-ml-models": {
         "task": "app.tasks.ml_tasks.retrain_prediction_models",
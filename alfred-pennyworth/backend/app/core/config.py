@@ -3,7 +3,7 @@ Core application configuration using Pydantic Settings.
 """
 from pydantic_settings import BaseSettings
 from pydantic import Field, field_validator
-from typing import List, Union
+from typing import List, Literal, Union
 import json
 
 
@@ -25,21 +25,77 @@ class Settings(BaseSettings):
     
     REDIS_URL: str
     REDIS_PASSWORD: str = ""
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = 0.5
+    # After a connection failure Redis is skipped this long, in every caller
+    REDIS_RETRY_SECONDS: float = 30.0
     
     OPENAI_API_KEY: str
     HUGGINGFACE_API_KEY: str = ""
     
     GPT_MODEL: str = "gpt-4-turbo-preview"
+
+    LLM_MAX_CONNECTIONS: int = 100
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    LLM_TIMEOUT_SECONDS: float = 30.0
+    LLM_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    LLM_MAX_RETRIES: int = 2
+    LLM_HTTP2: bool = True
+
+    GPT_CACHE_TTL_SECONDS: int = 30 * 24 * 3600
+    GPT_CACHE_NEGATIVE_TTL_SECONDS: int = 300
+    GPT_CACHE_SQLITE_PATH: str = "cache/llm_cache.sqlite3"
+
+    # Compiled food table (python -m app.services.food_store); empty = built-in table
+    FOOD_STORE_PATH: str = ""
+
+    # Where rule-based nutrition estimates run; anything else fails at startup
+    NUTRITION_EXECUTOR: Literal["inline", "thread", "process"] = "thread"
+    NUTRITION_EXECUTOR_WORKERS: int = 2
+    NUTRITION_BATCH_MAX_ITEMS: int = 64
+    NUTRITION_BATCH_WINDOW_MS: float = 2.0
+    # Per-serving rule-engine results kept in process, keyed on the cleaned text
+    NUTRITION_RESULT_CACHE_SIZE: int = 4096
+    NUTRITION_RESULT_CACHE_TTL_SECONDS: float = 15 * 60
+
+    # /meals/suggest dish counts: weight halves every N days; idle users expire
+    DISH_SUGGEST_HALF_LIFE_DAYS: float = 30.0
+    DISH_SUGGEST_TTL_DAYS: int = 180
+
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
     
     ML_CONFIDENCE_THRESHOLD: float = 0.70
     PATTERN_DETECTION_WINDOW_DAYS: int = 14
     MIN_SAMPLES_FOR_PREDICTION: int = 7
+
+    # user_baselines rows older than this are ignored (computed from the request window)
+    BASELINE_MAX_AGE_HOURS: float = 36.0
+    # Redis per-day rolling stats are rebuilt from the tables this often
+    ROLLING_STATS_RESEED_HOURS: float = 24.0
+
+    # Per-user anomaly models fitted nightly; older ones are ignored (refit on the fly)
+    ANOMALY_MODEL_DIR: str = "ml_models/anomaly"
+    ANOMALY_MODEL_MAX_AGE_HOURS: float = 48.0
+    ANOMALY_MODEL_CACHE_SIZE: int = 1024
+    # The last two need no sklearn or model files; anything else fails at startup
+    ANOMALY_BACKEND: Literal["isolation_forest", "mahalanobis", "robust_z"] = "isolation_forest"
+    # Users whose fetched window and data-only detector results are kept in process
+    DETECTION_CACHE_SIZE: int = 4096
+    # ... and used for at most this long, in case a write's version bump was lost
+    DETECTION_CACHE_MAX_AGE_SECONDS: float = 300.0
     
     QUIET_HOURS_START: str = "22:00"
     QUIET_HOURS_END: str = "07:00"
     MAX_INTERVENTIONS_PER_DAY: int = 6
     INTERVENTION_COOLDOWN_HOURS: int = 2
+    # Redis gate state (preferences, today's count, last sent) is rebuilt from the tables this often
+    INTERVENTION_GATE_TTL_HOURS: float = 24.0
+    # Periodic sweep over all active users: keyset page and chunk-task sizes,
+    # and generator calls in flight per chunk
+    INTERVENTION_SWEEP_INTERVAL_MINUTES: int = 15
+    INTERVENTION_SWEEP_PAGE_SIZE: int = 5000
+    INTERVENTION_SWEEP_CHUNK_SIZE: int = 500
+    INTERVENTION_SWEEP_GENERATION_CONCURRENCY: int = 16
     
     GOOGLE_CALENDAR_CREDENTIALS_FILE: str = "credentials.json"
     GOOGLE_CALENDAR_TOKEN_FILE: str = "token.json"
@@ -60,6 +116,12 @@ class Settings(BaseSettings):
     
     CORS_ORIGINS: Union[List[str], str] = ["http://localhost:3000", "http://localhost:4173", "http://localhost:5175", "http://localhost:5178", "http://localhost:8000"]
     
+    @field_validator("ANOMALY_BACKEND", "NUTRITION_EXECUTOR", mode="before")
+    @classmethod
+    def normalise_choice(cls, v):
+        """Accept ANOMALY_BACKEND and NUTRITION_EXECUTOR in any case and with stray whitespace."""
+        return v.strip().lower() if isinstance(v, str) else v
+
     @field_validator("CORS_ORIGINS", mode="before")
     @classmethod
     def parse_cors_origins(cls, v):
@@ -0,0 +1,73 @@
+"""
+Shared OpenAI client backed by one keep-alive HTTP connection pool.
+
+Nutrition fallback, chat and the Alfred agent all call get_llm_client()
+instead of building their own AsyncOpenAI, so TLS sessions are reused
+across requests.  The FastAPI lifespan opens and closes the pool.
+"""
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.core.logging import logger
+
+_client: Optional[AsyncOpenAI] = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _build_client() -> AsyncOpenAI:
+    http2 = settings.LLM_HTTP2
+    if http2 and not _http2_available():
+        logger.warning("h2 not installed — LLM client falling back to HTTP/1.1")
+        http2 = False
+
+    http_client = httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(
+            settings.LLM_TIMEOUT_SECONDS,
+            connect=settings.LLM_CONNECT_TIMEOUT_SECONDS,
+        ),
+    )
+    logger.info(
+        f"LLM client pool created (max_connections={settings.LLM_MAX_CONNECTIONS}, "
+        f"http2={http2})"
+    )
+    return AsyncOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        http_client=http_client,
+        max_retries=settings.LLM_MAX_RETRIES,
+    )
+
+
+def get_llm_client() -> AsyncOpenAI:
+    """Return the process-wide OpenAI client, creating the pool on first use."""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+def open_llm_client() -> AsyncOpenAI:
+    """Create the pool eagerly at startup rather than on the first request."""
+    return get_llm_client()
+
+
+async def close_llm_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
@@ -0,0 +1,74 @@
+"""
+Shared async Redis connection for caches, counters and gates.
+
+Callers on request paths use redis_client() rather than get_redis() and
+report connection failures with mark_redis_down().  After a failure
+redis_client() raises RedisUnavailable at once for REDIS_RETRY_SECONDS,
+so while Redis is unreachable no request waits out the socket timeout,
+once per call, before falling back.  RedisUnavailable is a RedisError,
+so the callers' existing fallbacks handle it.
+"""
+import time
+from typing import Optional
+
+import redis.asyncio as aioredis
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import RedisError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+from app.core.config import settings
+from app.core.logging import logger
+
+_redis: Optional[aioredis.Redis] = None
+_down_until = 0.0
+
+
+class RedisUnavailable(RedisError):
+    """Redis failed recently; the call was not attempted."""
+
+
+def get_redis() -> aioredis.Redis:
+    """Return the process-wide Redis client, creating it on first use."""
+    global _redis
+    if _redis is None:
+        _redis = aioredis.from_url(
+            settings.REDIS_URL,
+            password=settings.REDIS_PASSWORD or None,
+            decode_responses=True,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+        )
+    return _redis
+
+
+def redis_available() -> bool:
+    return time.monotonic() >= _down_until
+
+
+def redis_client() -> aioredis.Redis:
+    """get_redis(), or RedisUnavailable while Redis is marked down."""
+    if not redis_available():
+        raise RedisUnavailable("Redis marked down after a recent connection failure")
+    return get_redis()
+
+
+def mark_redis_down(exc: BaseException) -> None:
+    """
+    Skip Redis for REDIS_RETRY_SECONDS if `exc` means it is unreachable.
+    Command errors (a bad script, a wrong type) leave it up.
+    """
+    global _down_until
+    if not isinstance(exc, (RedisConnectionError, RedisTimeoutError, OSError)):
+        return
+    if redis_available():
+        logger.warning(
+            f"Redis unreachable, skipped for {settings.REDIS_RETRY_SECONDS:.0f} s: {exc}"
+        )
+    _down_until = time.monotonic() + settings.REDIS_RETRY_SECONDS
+
+
+async def close_redis():
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
@@ -8,7 +8,11 @@ from contextlib import asynccontextmanager
 
 from app.core.config import settings
 from app.core.database import init_db, close_db
+from app.core.redis_client import close_redis
+from app.core.llm_client import open_llm_client, close_llm_client
 from app.core.logging import logger
+from app.services.nutrition import configure_result_cache, load_food_store
+from app.services.nutrition_executor import start_nutrition_executor, stop_nutrition_executor
 from app.api.endpoints import interventions, meals, sleep, activities, calendar, health, chat, auth
 
 
@@ -18,11 +22,20 @@ async def lifespan(app: FastAPI):
     logger.info("Starting Alfred Pennyworth system...")
     await init_db()
     logger.info("Database initialized")
+    open_llm_client()
+    if settings.FOOD_STORE_PATH:
+        foods = load_food_store(settings.FOOD_STORE_PATH)
+        logger.info(f"Food store mapped from {settings.FOOD_STORE_PATH} ({foods} foods)")
+    configure_result_cache(settings.NUTRITION_RESULT_CACHE_SIZE, settings.NUTRITION_RESULT_CACHE_TTL_SECONDS)
+    await start_nutrition_executor()
     
     yield
     
     logger.info("Shutting down Alfred Pennyworth system...")
+    await stop_nutrition_executor()
     await close_db()
+    await close_redis()
+    await close_llm_client()
     logger.info("Shutdown complete")
 
 
@@ -7,6 +7,7 @@ from app.models.meal import Meal
 from app.models.sleep import Sleep
 from app.models.activity import Activity
 from app.models.calendar_event import CalendarEvent
+from app.models.user_baseline import UserBaseline
 
 __all__ = [
     "User",
@@ -17,6 +18,7 @@ __all__ = [
     "Sleep",
     "Activity",
     "CalendarEvent",
+    "UserBaseline",
 ]
 
 ################################################################################
@@ -0,0 +1,31 @@
+"""
+Per-user rolling wellness baselines computed by the nightly ML task.
+"""
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from app.core.database import Base
+
+
+class UserBaseline(Base):
+    __tablename__ = "user_baselines"
+    __table_args__ = (
+        UniqueConstraint("user_id", "metric", name="uq_user_baselines_user_metric"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    metric = Column(String(50), nullable=False)
+    
+    mean = Column(Float, nullable=False)
+    std = Column(Float, nullable=False)
+    n_samples = Column(Integer, nullable=False)
+    window_days = Column(Integer, nullable=False)
+    
+    computed_at = Column(DateTime(timezone=True), nullable=False)
+    
+    user = relationship("User", backref="baselines")
+    
+    def __repr__(self):
+        return f"<UserBaseline(user_id={self.user_id}, metric={self.metric}, mean={self.mean:.2f})>"
+
+################################################################################
@@ -5,10 +5,10 @@ from datetime import datetime, timezone
 from enum import Enum
 from typing import List, Dict, Optional
 import json
-from openai import AsyncOpenAI
 
 from app.core.logging import logger
 from app.core.config import settings
+from app.core.llm_client import get_llm_client
 
 
 class Signal:
@@ -48,8 +48,12 @@ class AlfredAgent:
     """Core AI agent for generating contextual, intelligent interventions."""
     
     def __init__(self):
-        self.openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
         self.gpt_model = settings.GPT_MODEL
+
+    @property
+    def openai_client(self):
+        # Shared pooled client; opened and closed with the app lifespan
+        return get_llm_client()
         
     async def generate_intervention(
         self,
@@ -0,0 +1,273 @@
+"""
+Per-user anomaly models, fitted offline and scored at request time.
+
+The nightly retrain_prediction_models task fits a StandardScaler and an
+IsolationForest on each user's daily feature matrix and saves them here.
+detect_anomaly then only has to load and score, so /interventions/generate
+no longer fits 100 trees per call.
+
+A saved model is one small binary file per user under ANOMALY_MODEL_DIR:
+a fixed header followed by flat NumPy arrays.  The header holds the
+format version, a checksum of the feature names and the fit time.  All
+trees are flattened into shared node arrays, and one row is scored by
+walking every tree at once, a few array operations per level.  That
+takes tens of microseconds and reproduces IsolationForest.score_samples
+exactly.  scikit-learn is needed only to fit.
+
+Files are replaced atomically, so the API can read while the worker
+writes.  Loaded models are kept in a small in-process LRU and reloaded
+when the file's mtime changes.
+"""
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logging import logger
+
+# Bump whenever the file layout or the meaning of a stored field changes
+FORMAT_VERSION = 1
+
+_MAGIC = b"AFAM"
+# magic, version, n_features, n_trees, depth, n_nodes, n_days, schema crc,
+# fitted_at, offset, denominator (48 bytes, so the arrays stay 8-aligned)
+_HEADER = struct.Struct("<4sHHHHIII3d")
+
+# Same settings detect_anomaly has always used for its on-the-fly fit
+_CONTAMINATION = 0.1
+_RANDOM_STATE = 42
+
+
+def _schema(features: Sequence[str]) -> int:
+    return zlib.crc32(",".join(features).encode())
+
+
+def _average_path_length(n: np.ndarray) -> np.ndarray:
+    """Expected path length of an unsuccessful BST search over n samples."""
+    n = n.astype(np.float64)
+    out = np.zeros_like(n)
+    out[n == 2] = 1.0
+    big = n > 2
+    out[big] = 2.0 * (np.log(n[big] - 1.0) + np.euler_gamma) - 2.0 * (n[big] - 1.0) / n[big]
+    return out
+
+
+def _node_depths(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """1-based depth of every node (the root is 1), as IsolationForest counts it."""
+    depths = np.zeros(len(left), dtype=np.int64)
+    depths[0] = 1
+    # sklearn numbers nodes depth-first, so a parent always precedes its children
+    for node in range(len(left)):
+        if left[node] != -1:
+            depths[left[node]] = depths[right[node]] = depths[node] + 1
+    return depths
+
+
+class AnomalyModel:
+    """A fitted scaler plus a flattened IsolationForest."""
+
+    __slots__ = (
+        "mean", "scale", "threshold", "leaf_value", "left", "right", "feature",
+        "roots", "depth", "offset", "denominator", "n_days", "schema", "fitted_at",
+    )
+
+    def __init__(self, **fields) -> None:
+        for name in self.__slots__:
+            setattr(self, name, fields[name])
+
+    @property
+    def n_features(self) -> int:
+        return len(self.mean)
+
+    @property
+    def age_hours(self) -> float:
+        return (time.time() - self.fitted_at) / 3600
+
+    @classmethod
+    def from_sklearn(cls, scaler, forest, features: Sequence[str], n_days: int) -> "AnomalyModel":
+        lefts, rights, feats, thresholds, leaf_values, roots = [], [], [], [], [], []
+        offset = depth = 0
+        for est, est_features in zip(forest.estimators_, forest.estimators_features_):
+            tree = est.tree_
+            n = tree.node_count
+            left, right = tree.children_left, tree.children_right
+            is_leaf = left == -1
+            ids = np.arange(n)
+            depths = _node_depths(left, right)
+            # Leaves point at themselves, so extra steps of the walk leave them in place
+            lefts.append(np.where(is_leaf, ids, left) + offset)
+            rights.append(np.where(is_leaf, ids, right) + offset)
+            feats.append(np.where(is_leaf, 0, np.asarray(est_features)[np.maximum(tree.feature, 0)]))
+            thresholds.append(tree.threshold)
+            leaf_values.append(depths + _average_path_length(tree.n_node_samples) - 1.0)
+            roots.append(offset)
+            offset += n
+            depth = max(depth, int(depths.max()) - 1)
+        return cls(
+            mean=np.asarray(scaler.mean_, dtype=np.float64),
+            scale=np.asarray(scaler.scale_, dtype=np.float64),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            leaf_value=np.concatenate(leaf_values),
+            left=np.concatenate(lefts).astype(np.int32),
+            right=np.concatenate(rights).astype(np.int32),
+            feature=np.concatenate(feats).astype(np.uint8),
+            roots=np.asarray(roots, dtype=np.int32),
+            depth=depth,
+            offset=float(forest.offset_),
+            denominator=float(
+                len(forest.estimators_) * _average_path_length(np.array([forest.max_samples_]))[0]
+            ),
+            n_days=n_days,
+            schema=_schema(features),
+            fitted_at=time.time(),
+        )
+
+    # -- scoring ------------------------------------------------------------
+
+    def score_samples(self, X: np.ndarray) -> np.ndarray:
+        """IsolationForest.score_samples for raw (unscaled) rows of X."""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        # The forest compares float32 inputs against float64 thresholds
+        Xs = ((X - self.mean) / self.scale).astype(np.float32).astype(np.float64)
+        rows = np.arange(len(Xs))[:, None]
+        node = np.broadcast_to(self.roots, (len(Xs), len(self.roots)))
+        for _ in range(self.depth):
+            go_left = Xs[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        # Sequential sum over trees, in the same order as sklearn adds them
+        depths = np.add.accumulate(self.leaf_value[node], axis=1)[:, -1]
+        if self.denominator == 0:
+            # A single training sample: sklearn pins the normalised depth to 1
+            return np.full(len(Xs), -0.5)
+        return -(2 ** -(depths / self.denominator))
+
+    def is_anomaly(self, score: float) -> bool:
+        """Same decision as IsolationForest.predict(...) == -1."""
+        return score - self.offset < 0
+
+    # -- serialisation ------------------------------------------------------
+
+    def to_bytes(self) -> bytes:
+        header = _HEADER.pack(
+            _MAGIC, FORMAT_VERSION, self.n_features, len(self.roots), self.depth,
+            len(self.left), self.n_days, self.schema,
+            self.fitted_at, self.offset, self.denominator,
+        )
+        parts = [header]
+        for arr in (self.mean, self.scale, self.threshold, self.leaf_value,
+                    self.left, self.right, self.roots, self.feature):
+            parts.append(arr.tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, buf: bytes) -> "AnomalyModel":
+        (magic, version, n_features, n_trees, depth, n_nodes, n_days, schema,
+         fitted_at, offset, denominator) = _HEADER.unpack_from(buf)
+        if magic != _MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"unsupported anomaly model (magic={magic!r}, version={version})")
+        pos = _HEADER.size
+        arrays = {}
+        for name, dtype, count in (
+            ("mean", np.float64, n_features), ("scale", np.float64, n_features),
+            ("threshold", np.float64, n_nodes), ("leaf_value", np.float64, n_nodes),
+            ("left", np.int32, n_nodes), ("right", np.int32, n_nodes),
+            ("roots", np.int32, n_trees), ("feature", np.uint8, n_nodes),
+        ):
+            arrays[name] = np.frombuffer(buf, dtype=dtype, count=count, offset=pos)
+            pos += arrays[name].nbytes
+        if pos != len(buf):
+            raise ValueError(f"anomaly model size mismatch ({len(buf)} bytes, expected {pos})")
+        return cls(
+            **arrays, depth=depth, offset=offset, denominator=denominator,
+            n_days=n_days, schema=schema, fitted_at=fitted_at,
+        )
+
+
+def fit_anomaly_model(X: np.ndarray, features: Sequence[str]) -> AnomalyModel:
+    """Fit the scaler and forest on a daily feature matrix.  Needs scikit-learn."""
+    from sklearn.ensemble import IsolationForest
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    forest = IsolationForest(contamination=_CONTAMINATION, random_state=_RANDOM_STATE)
+    forest.fit(X_scaled)
+    return AnomalyModel.from_sklearn(scaler, forest, features, n_days=len(X))
+
+
+# ---------------------------------------------------------------------------
+# On-disk store
+# ---------------------------------------------------------------------------
+
+_cache: "OrderedDict[int, tuple[int, AnomalyModel]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _path(user_id: int) -> Path:
+    return Path(settings.ANOMALY_MODEL_DIR) / f"{user_id}.afm"
+
+
+def save_anomaly_model(user_id: int, model: AnomalyModel) -> Path:
+    """Write a user's model, replacing the previous one atomically."""
+    path = _path(user_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{user_id}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(model.to_bytes())
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    return path
+
+
+def delete_anomaly_model(user_id: int) -> None:
+    _path(user_id).unlink(missing_ok=True)
+    with _cache_lock:
+        _cache.pop(user_id, None)
+
+
+def load_anomaly_model(user_id: int, features: Sequence[str]) -> Optional[AnomalyModel]:
+    """
+    The user's saved model, or None when there is none, it is older than
+    ANOMALY_MODEL_MAX_AGE_HOURS, or it was fitted on different features.
+    """
+    path = _path(user_id)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        with _cache_lock:
+            _cache.pop(user_id, None)
+        return None
+
+    with _cache_lock:
+        cached = _cache.get(user_id)
+        if cached is not None and cached[0] == mtime:
+            _cache.move_to_end(user_id)
+            model = cached[1]
+        else:
+            model = None
+    if model is None:
+        try:
+            model = AnomalyModel.from_bytes(path.read_bytes())
+        except (OSError, ValueError, struct.error) as exc:
+            logger.warning(f"Ignoring unreadable anomaly model for user {user_id}: {exc}")
+            return None
+        with _cache_lock:
+            _cache[user_id] = (mtime, model)
+            _cache.move_to_end(user_id)
+            while len(_cache) > settings.ANOMALY_MODEL_CACHE_SIZE:
+                _cache.popitem(last=False)
+
+    if model.schema != _schema(features) or model.age_hours > settings.ANOMALY_MODEL_MAX_AGE_HOURS:
+        return None
+    return model
@@ -0,0 +1,161 @@
+"""
+Per-user rolling baselines (mean / std of a wellness metric) for the signal
+detectors.
+
+At request time load_baselines takes the streaming statistics kept up to
+date on every write (see rolling_stats).  Without Redis it reads the
+user_baselines rows that the nightly ML task upserts, one per (user,
+metric) over PATTERN_DETECTION_WINDOW_DAYS, in one indexed query.  The
+detectors then ask the returned BaselineProvider for a metric, which is a
+dict lookup.  A row older than BASELINE_MAX_AGE_HOURS, or missing, is
+computed from the request's own window instead, the way the detectors
+always did.
+
+Live baselines are computed over the request's WellnessWindow.  Days are
+UTC calendar days, the same grouping the detectors, the feature matrix and
+the streaming statistics use.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Mapping, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.user_baseline import UserBaseline
+from app.services.wellness_window import DAY_SECONDS, WellnessWindow, day_ordinals
+
+METRICS = ("sleep_quality", "sleep_duration", "daily_calories", "daily_burn", "meal_hour")
+
+
+@dataclass(frozen=True, slots=True)
+class Baseline:
+    mean: float
+    std: float
+    n: int                  # samples (days for the daily_* metrics)
+
+
+def _stats(values: np.ndarray) -> Optional[Baseline]:
+    if not len(values):
+        return None
+    return Baseline(mean=float(values.mean()), std=float(values.std()), n=len(values))
+
+
+def _present(column: np.ndarray) -> np.ndarray:
+    return column[~np.isnan(column)]
+
+
+def _daily_sums(times: np.ndarray, values: np.ndarray) -> np.ndarray:
+    _, day_idx = np.unique(day_ordinals(times), return_inverse=True)
+    return np.bincount(day_idx, weights=np.nan_to_num(values))
+
+
+def _hour_of_day(times: np.ndarray) -> np.ndarray:
+    # Hour plus whole minutes, as datetime.hour + datetime.minute / 60 gave
+    minutes = np.floor_divide(np.mod(times, DAY_SECONDS), 60)
+    return np.floor_divide(minutes, 60) + np.mod(minutes, 60) / 60
+
+
+_LIVE: Dict[str, Callable[[WellnessWindow], np.ndarray]] = {
+    "sleep_quality": lambda w: _present(w.sleep.quality_score),
+    "sleep_duration": lambda w: _present(w.sleep.duration_minutes),
+    "daily_calories": lambda w: _daily_sums(w.meals.time, w.meals.calories),
+    "daily_burn": lambda w: _daily_sums(w.activities.start, w.activities.calories_burned),
+    "meal_hour": lambda w: _hour_of_day(w.meals.time),
+}
+
+
+def compute_baseline(metric: str, window: WellnessWindow) -> Optional[Baseline]:
+    """One metric over the window; None when there are no samples."""
+    return _stats(_LIVE[metric](window))
+
+
+class BaselineProvider:
+    """Stored baselines for one user, with live computation for the gaps."""
+
+    def __init__(self, stored: Mapping[str, Optional[Baseline]], window: WellnessWindow) -> None:
+        self._baselines: Dict[str, Optional[Baseline]] = dict(stored)
+        self._window = window
+        self.stored = frozenset(stored)
+
+    @classmethod
+    def live(cls, window: WellnessWindow) -> "BaselineProvider":
+        return cls({}, window)
+
+    def get(self, metric: str) -> Optional[Baseline]:
+        try:
+            return self._baselines[metric]
+        except KeyError:
+            baseline = self._baselines[metric] = compute_baseline(metric, self._window)
+            return baseline
+
+
+async def load_stored_baselines(
+    db: AsyncSession,
+    user_ids: Sequence[int],
+    now: datetime,
+) -> Dict[int, Dict[str, Optional[Baseline]]]:
+    """
+    The current baselines of each of `user_ids` at `now`: the streaming
+    statistics when Redis is up, else fresh user_baselines rows.  Metrics
+    missing from a user's mapping are left to the window.
+    """
+    from app.services import rolling_stats     # imports this module
+
+    current = await rolling_stats.current_baselines_many(user_ids, now, db)
+    if current is not None:
+        return current
+
+    fresh_after = now - timedelta(hours=settings.BASELINE_MAX_AGE_HOURS)
+    rows = await db.execute(
+        select(UserBaseline.user_id, UserBaseline.metric, UserBaseline.mean,
+               UserBaseline.std, UserBaseline.n_samples)
+        .where(UserBaseline.user_id.in_(user_ids), UserBaseline.computed_at >= fresh_after)
+    )
+    stored: Dict[int, Dict[str, Optional[Baseline]]] = {uid: {} for uid in user_ids}
+    for user_id, metric, mean, std, n in rows.all():
+        stored[user_id][metric] = Baseline(mean, std, n)
+    return stored
+
+
+async def load_baselines(
+    db: AsyncSession,
+    user_id: int,
+    window: WellnessWindow,
+) -> BaselineProvider:
+    """The user's current baselines at window.now (see load_stored_baselines), backed by the window."""
+    stored = await load_stored_baselines(db, [user_id], window.now)
+    return BaselineProvider(stored[user_id], window)
+
+
+async def save_baselines(
+    db: AsyncSession,
+    user_id: int,
+    baselines: Mapping[str, Baseline],
+    computed_at: datetime,
+) -> None:
+    """Replace the user's rows with `baselines`; metrics without samples are dropped."""
+    existing = {
+        row.metric: row
+        for row in (
+            await db.execute(select(UserBaseline).where(UserBaseline.user_id == user_id))
+        ).scalars()
+    }
+    for metric, baseline in baselines.items():
+        row = existing.pop(metric, None)
+        if row is None:
+            row = UserBaseline(user_id=user_id, metric=metric)
+            db.add(row)
+        row.mean = baseline.mean
+        row.std = baseline.std
+        row.n_samples = baseline.n
+        row.window_days = settings.PATTERN_DETECTION_WINDOW_DAYS
+        row.computed_at = computed_at
+    if existing:
+        await db.execute(
+            delete(UserBaseline).where(
+                UserBaseline.user_id == user_id, UserBaseline.metric.in_(list(existing))
+            )
+        )
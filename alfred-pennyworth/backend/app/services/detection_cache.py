@@ -0,0 +1,162 @@
+"""
+Per-user cache of signal detection inputs between data writes.
+
+Every meal, sleep and activity write bumps the user's data version, a
+Redis counter.  /interventions/generate reads the version before it reads
+the tables and keeps what it fetched, as a WellnessWindow, under that
+version in an in-process LRU of DETECTION_CACHE_SIZE users.  While the
+version is unchanged the next request skips the window query and
+re-slices the cached window at the new `now` (window.at), which is what
+the query would have returned.  The user's latest meals and nights for
+the generator come with the window and are cut at the same cutoff
+(patterns_since): only the oldest of them can fall out of the window, so
+they stay the latest ones.
+
+The entry also memoises the detectors that only depend on the data, not
+on the clock (see register_detector's time_dependent): their results are
+reused for the same version within one UTC day.  The time-dependent ones
+(meal gap, the 24-hour and last-night slices, today's load) run again on
+every request.
+
+A missing version key is created with a fresh token, so a key that expired
+or was evicted never matches an old entry.  When Redis is unreachable
+there is no version and nothing is cached.
+
+A write whose bump fails leaves the old version in place, so other
+workers could keep serving a window without the new record.  The writing
+process evicts its own entry on every bump, the bump then deletes the
+version key when it can, and in any case no entry is used once it is
+DETECTION_CACHE_MAX_AGE_SECONDS old, which bounds the staleness.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Optional, Sequence
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.redis_client import mark_redis_down, redis_client
+from app.services.alfred_agent import Signal
+from app.services.wellness_data import Patterns
+from app.services.wellness_window import WellnessWindow, epoch_seconds
+
+
+def _version_key(user_id: int) -> str:
+    return f"alfred:dver:{user_id}"
+
+
+def _ttl() -> int:
+    return (settings.PATTERN_DETECTION_WINDOW_DAYS + 1) * 86400
+
+
+@dataclass(slots=True)
+class CachedDetection:
+    version: str
+    window: WellnessWindow
+    patterns: Patterns
+    stored_at: float = field(default_factory=time.monotonic)
+    day: int = -1
+    # Results of the data-only detectors, by detector name, for `day`
+    memo: Dict[str, Optional[Signal]] = field(default_factory=dict)
+
+    def window_at(self, now: datetime, since: datetime) -> WellnessWindow:
+        return self.window.at(now, since)
+
+    def patterns_since(self, since: datetime) -> Patterns:
+        cutoff = epoch_seconds(since)
+        meals, sleep = self.patterns
+        return (
+            [m for m in meals if epoch_seconds(m["meal_time"]) >= cutoff],
+            [s for s in sleep if epoch_seconds(s["sleep_start"]) >= cutoff],
+        )
+
+    def memo_for(self, today: int) -> Dict[str, Optional[Signal]]:
+        if today != self.day:
+            self.memo.clear()
+            self.day = today
+        return self.memo
+
+
+_cache: "OrderedDict[int, CachedDetection]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _evict(user_id: int) -> None:
+    with _cache_lock:
+        _cache.pop(user_id, None)
+
+
+async def bump_data_version(user_id: int) -> None:
+    """Mark the user's wellness data as changed.  Never raises."""
+    _evict(user_id)
+    key = _version_key(user_id)
+    try:
+        pipe = redis_client().pipeline(transaction=True)
+        pipe.set(key, time.time_ns(), nx=True)
+        pipe.incr(key)
+        pipe.expire(key, _ttl())
+        await pipe.execute()
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+        logger.warning(f"Data version bump failed for user {user_id}: {exc}")
+        # Without the key readers start over from a fresh token
+        try:
+            await redis_client().delete(key)
+        except (RedisError, OSError) as exc:
+            mark_redis_down(exc)
+
+
+async def data_versions(user_ids: Sequence[int]) -> Optional[Dict[int, str]]:
+    """The current data version of each of `user_ids`, or None if Redis is down."""
+    try:
+        pipe = redis_client().pipeline(transaction=True)
+        for user_id in user_ids:
+            key = _version_key(user_id)
+            pipe.set(key, time.time_ns(), nx=True, ex=_ttl())
+            pipe.get(key)
+        results = await pipe.execute()
+        return dict(zip(user_ids, results[1::2]))
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+        logger.warning(f"Data versions unavailable for {len(user_ids)} users: {exc}")
+        return None
+
+
+async def data_version(user_id: int) -> Optional[str]:
+    """The user's current data version, or None if Redis is down."""
+    versions = await data_versions([user_id])
+    return None if versions is None else versions[user_id]
+
+
+def get(user_id: int, version: Optional[str]) -> Optional[CachedDetection]:
+    """The user's entry if it was stored under `version`."""
+    if version is None:
+        return None
+    with _cache_lock:
+        entry = _cache.get(user_id)
+        if entry is None or entry.version != version:
+            return None
+        if time.monotonic() - entry.stored_at > settings.DETECTION_CACHE_MAX_AGE_SECONDS:
+            del _cache[user_id]
+            return None
+        _cache.move_to_end(user_id)
+        return entry
+
+
+def put(
+    user_id: int, version: Optional[str], window: WellnessWindow, patterns: Patterns
+) -> Optional[CachedDetection]:
+    """Keep `window` and `patterns` as fetched under `version`; nothing is kept without one."""
+    if version is None:
+        return None
+    entry = CachedDetection(version, window, patterns)
+    with _cache_lock:
+        _cache[user_id] = entry
+        _cache.move_to_end(user_id)
+        while len(_cache) > settings.DETECTION_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return entry
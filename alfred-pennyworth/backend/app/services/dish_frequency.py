@@ -0,0 +1,138 @@
+"""
+Per-user dish-frequency index backing GET /meals/suggest.
+
+Each user has a Redis sorted set of dish template keys.  Logging a meal adds
+2 ** ((meal_time - epoch) / half_life) to every dish it mentions, which is
+forward exponential decay.  Older meals count for less, yet no stored
+score ever needs rewriting, and the ranking is a plain ZREVRANGE.
+
+Those weights overflow a double within years at short half-lives, so the
+set holds log2 of each score instead, and a meal's weight is added with a
+log-sum-exp (one Lua script per meal).  The log is monotonic, so the
+ranking is unchanged, and a log weight is just the meal's age in
+half-lives, finite for any datetime.
+
+A user's set is seeded lazily from their recent meals the first time
+suggestions are read.  A marker key records that, and both keys expire
+after a period of inactivity.  When Redis is unreachable, top_dishes
+returns None and the caller falls back to scanning history.
+"""
+import math
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.redis_client import mark_redis_down, redis_client
+from app.models.meal import Meal
+from app.services.nutrition import dishes_in
+
+# Meals read when seeding a user's index (matches the old history window)
+SEED_HISTORY_LIMIT = 200
+
+_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+
+# Adds weight 2 ** ARGV[2] to each dish in ARGV[3..] of the log2-score set
+_RECORD_LUA = """
+local w = tonumber(ARGV[2])
+for i = 3, #ARGV do
+    local s = redis.call('ZSCORE', KEYS[1], ARGV[i])
+    local score = w
+    if s then
+        s = tonumber(s)
+        local hi, lo = math.max(s, w), math.min(s, w)
+        score = hi + math.log(1 + 2 ^ (lo - hi)) / math.log(2)
+    end
+    redis.call('ZADD', KEYS[1], score, ARGV[i])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+"""
+
+
+def _key(user_id: int) -> str:
+    return f"alfred:dishlog:{user_id}"
+
+
+def _seeded_key(user_id: int) -> str:
+    return f"alfred:dishlog:{user_id}:seeded"
+
+
+def _log_weight(meal_time: Optional[datetime]) -> float:
+    """log2 of the meal's weight: its time since the epoch in half-lives."""
+    if meal_time is None:
+        meal_time = datetime.now(timezone.utc)
+    elif meal_time.tzinfo is None:
+        meal_time = meal_time.replace(tzinfo=timezone.utc)
+    half_life_s = settings.DISH_SUGGEST_HALF_LIFE_DAYS * 86400
+    return (meal_time.timestamp() - _EPOCH) / half_life_s
+
+
+def _log_sum(log_weights: Iterable[float]) -> float:
+    """log2 of the sum of 2 ** w over log_weights."""
+    log_weights = list(log_weights)
+    top = max(log_weights)
+    return top + math.log2(sum(2.0 ** (w - top) for w in log_weights))
+
+
+async def record_meal(user_id: int, description: str, meal_time: Optional[datetime]) -> None:
+    """Count the dishes in a newly logged meal.  Never raises."""
+    dishes = dishes_in(description) if description else []
+    if not dishes:
+        return
+    ttl = settings.DISH_SUGGEST_TTL_DAYS * 86400
+    try:
+        script = redis_client().register_script(_RECORD_LUA)
+        await script(
+            keys=[_key(user_id), _seeded_key(user_id)],
+            args=[ttl, repr(_log_weight(meal_time)), *dishes],
+        )
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+        logger.warning(f"Dish frequency update skipped for user {user_id}: {exc}")
+
+
+async def _seed(user_id: int, db: AsyncSession) -> None:
+    rows = await db.execute(
+        select(Meal.description, Meal.meal_time)
+        .where(Meal.user_id == user_id)
+        .order_by(Meal.meal_time.desc())
+        .limit(SEED_HISTORY_LIMIT)
+    )
+    log_weights: dict[str, list[float]] = {}
+    for description, meal_time in rows.all():
+        if not description:
+            continue
+        weight = _log_weight(meal_time)
+        for dish in dishes_in(description):
+            log_weights.setdefault(dish, []).append(weight)
+    scores = {dish: _log_sum(weights) for dish, weights in log_weights.items()}
+
+    ttl = settings.DISH_SUGGEST_TTL_DAYS * 86400
+    # Replace whatever partial counts record_meal made before the seed
+    pipe = redis_client().pipeline(transaction=True)
+    pipe.delete(_key(user_id))
+    if scores:
+        pipe.zadd(_key(user_id), scores)
+        pipe.expire(_key(user_id), ttl)
+    pipe.set(_seeded_key(user_id), "1", ex=ttl)
+    await pipe.execute()
+
+
+async def top_dishes(user_id: int, k: int, db: AsyncSession) -> Optional[list[str]]:
+    """
+    The user's k highest-scoring dishes, best first; None if Redis is down.
+    """
+    try:
+        redis = redis_client()
+        if not await redis.exists(_seeded_key(user_id)):
+            await _seed(user_id, db)
+        return await redis.zrevrange(_key(user_id), 0, max(k, 1) - 1)
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+        logger.warning(f"Dish frequency index unavailable for user {user_id}: {exc}")
+        return None
@@ -0,0 +1,589 @@
+"""
+Compiled, memory-mapped ingredient table for large food databases.
+
+compile_food_table() turns CSV/TSV/JSON/JSONL food exports (USDA, Open Food
+Facts, …), optionally gzipped, into one binary file of columns:
+
+  macros        float32 (fields × foods), one contiguous column per macro
+  name_offsets  uint64  (foods + 1) into the UTF-8 name blob
+  names         uint8   concatenated, de-duplicated canonical names
+  name_hashes   uint64  each name's hash (_name_hash)
+  name_slots    int32   open-addressing table of food ids by name hash, -1 empty
+  unit_ptr      uint32  (foods + 1) CSR row pointers into the unit arrays
+  unit_ids      uint8   index into the header's unit name list
+  unit_grams    float32 grams per unit
+  key_sizes     int32   size of each name's bigram set (fuzzy matching)
+  bigram_codes  int64   sorted codes of every bigram of any name
+  bigram_ptr    uint64  (bigrams + 1) CSR pointers into bigram_ids
+  bigram_ids    int32   the foods of each bigram, ascending
+
+FoodStore maps that file read-only, so every worker on a host shares the
+same page-cache copy of the whole table: names are looked up through the
+hash table and decoded only when read, and the fuzzy matcher's postings
+are read in place, so loading builds no per-name Python objects.  It
+behaves like the INGREDIENT_DB / INGREDIENT_UNIT_OVERRIDES dicts it
+replaces, which lets the nutrition engine use it without changes to its
+lookups.
+
+Usage:
+    python -m app.services.food_store usda.csv off.jsonl.gz -o foods.bin
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import gzip
+import json
+from collections.abc import Iterator, Mapping, Sequence
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+FIELDS: tuple[str, ...] = ("cal", "pro", "carb", "fat", "fiber")
+
+# float32 keeps ~7 significant digits; values are read back rounded to this
+# many decimals, which covers every food table we load (macros per 100 g)
+DECIMALS = 3
+
+_MAGIC = b"ALFOODS1"
+_VERSION = 2
+_ALIGN = 64
+
+# Name hash: a polynomial over code points mod 2**64, so every substring of
+# a query hashes in one vectorised pass (FoodStore.contained)
+_HASH_BASE = 0x100000001B3
+_HASH_MASK = (1 << 64) - 1
+# Fibonacci hashing spreads the hash over the table's slots
+_SLOT_MIX = 0x9E3779B97F4A7C15
+# Code of a one-character bigram (a one-character name); above any code point
+_NO_CHAR = 0x1FFFFF
+
+# Common column names in exported food tables → our macro fields
+_FIELD_ALIASES: dict[str, str] = {
+    "calories": "cal", "kcal": "cal", "energy_kcal": "cal", "energy-kcal_100g": "cal",
+    "protein": "pro", "protein_g": "pro", "proteins_100g": "pro",
+    "carbs": "carb", "carbs_g": "carb", "carbohydrate": "carb",
+    "carbohydrates": "carb", "carbohydrates_100g": "carb",
+    "fat_g": "fat", "total_fat": "fat", "fat_100g": "fat",
+    "fibre": "fiber", "fiber_g": "fiber", "dietary_fiber": "fiber", "fiber_100g": "fiber",
+}
+_NAME_COLUMNS = ("name", "description", "product_name", "food")
+_UNIT_PREFIX = "unit_"
+# Open Food Facts nests nutrients here; only the per-100 g values are read
+_NESTED_NUTRIENTS = "nutriments"
+_PER_100G = "_100g"
+_DELIMITERS = (",", "\t", ";")
+
+
+def _canonical_name(name: str) -> str:
+    return " ".join(str(name).lower().split())
+
+
+def _name_hash(name: str) -> int:
+    h = 0
+    for ch in name:
+        h = (h * _HASH_BASE + ord(ch)) & _HASH_MASK
+    return h
+
+
+def _bigram_code(bigram: str) -> int:
+    second = ord(bigram[1]) if len(bigram) > 1 else _NO_CHAR
+    return ord(bigram[0]) << 21 | second
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Source readers — each yields (name, {field: value}, {unit: grams})
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _split_record(record: Mapping) -> tuple[dict[str, float], dict[str, float]]:
+    macros: dict[str, float] = {}
+    units: dict[str, float] = {}
+    for column, value in record.items():
+        col = str(column).strip().lower()
+        if col in FIELDS or col in _FIELD_ALIASES:
+            macros.setdefault(_FIELD_ALIASES.get(col, col), _to_float(value))
+        elif col.startswith(_UNIT_PREFIX) and value not in (None, ""):
+            grams = _to_float(value)
+            if grams > 0:
+                units[col[len(_UNIT_PREFIX):]] = grams
+    nested = record.get(_NESTED_NUTRIENTS)
+    if isinstance(nested, Mapping):
+        for column, value in nested.items():
+            col = str(column).strip().lower()
+            if col.endswith(_PER_100G) and col in _FIELD_ALIASES:
+                macros.setdefault(_FIELD_ALIASES[col], _to_float(value))
+    if isinstance(record.get("units"), Mapping):
+        for unit, grams in record["units"].items():
+            if _to_float(grams) > 0:
+                units[str(unit).strip().lower()] = _to_float(grams)
+    return macros, units
+
+
+def _format(path: Path) -> str:
+    """The suffix that names the table format, under any .gz."""
+    suffixes = [s.lower() for s in path.suffixes]
+    if suffixes and suffixes[-1] == ".gz":
+        suffixes.pop()
+    return suffixes[-1] if suffixes else ""
+
+
+def _open(path: Path):
+    if path.suffix.lower() == ".gz":
+        return gzip.open(path, "rt", newline="", encoding="utf-8")
+    return path.open(newline="", encoding="utf-8")
+
+
+def _record_name(record: Mapping) -> str:
+    return next((record.get(c) for c in _NAME_COLUMNS if record.get(c)), "")
+
+
+def _read_csv(path: Path) -> Iterator[tuple[str, dict, dict]]:
+    with _open(path) as fh:
+        header = fh.readline()
+        if _format(path) == ".tsv":
+            delimiter = "\t"
+        else:
+            # Open Food Facts' ".csv" export is tab-separated too
+            delimiter = max(_DELIMITERS, key=header.count)
+        fh.seek(0)
+        # Tab-separated exports (Open Food Facts) do not quote their fields
+        quoting = csv.QUOTE_NONE if delimiter == "\t" else csv.QUOTE_MINIMAL
+        csv.field_size_limit(2 ** 31 - 1)
+        for row in csv.DictReader(fh, delimiter=delimiter, quoting=quoting):
+            row = {str(k).strip().lower(): v for k, v in row.items() if k is not None}
+            macros, units = _split_record(row)
+            yield _record_name(row), macros, units
+
+
+def _read_json(path: Path) -> Iterator[tuple[str, dict, dict]]:
+    with _open(path) as fh:
+        data = json.load(fh)
+    # Either {name: {...}} like INGREDIENT_DB, or [{"name": ..., ...}, ...]
+    items = data.items() if isinstance(data, dict) else (
+        (_record_name(rec), rec) for rec in data
+    )
+    for name, record in items:
+        macros, units = _split_record(record)
+        yield name, macros, units
+
+
+def _read_jsonl(path: Path) -> Iterator[tuple[str, dict, dict]]:
+    """One JSON record per line, like the Open Food Facts product dump."""
+    with _open(path) as fh:
+        for line in fh:
+            if line.strip():
+                record = json.loads(line)
+                macros, units = _split_record(record)
+                yield _record_name(record), macros, units
+
+
+def _read_source(path: Path) -> Iterator[tuple[str, dict, dict]]:
+    fmt = _format(path)
+    if fmt == ".json":
+        return _read_json(path)
+    if fmt in (".jsonl", ".ndjson"):
+        return _read_jsonl(path)
+    if fmt in (".csv", ".tsv", ".txt"):
+        return _read_csv(path)
+    raise ValueError(f"Unsupported food table format: {path}")
+
+
+def _builtin_rows() -> Iterator[tuple[str, dict, dict]]:
+    from app.services import nutrition
+
+    for name, macros in nutrition.INGREDIENT_DB.items():
+        yield name, dict(macros), dict(nutrition.INGREDIENT_UNIT_OVERRIDES.get(name, {}))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Compiler
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _pad(fh, align: int = _ALIGN) -> int:
+    pos = fh.tell()
+    if pos % align:
+        fh.write(b"\0" * (align - pos % align))
+    return fh.tell()
+
+
+def _name_table(names: list[str]) -> dict[str, np.ndarray]:
+    """Each name's hash, and an open-addressing table of food ids by hash."""
+    hashes = [_name_hash(name) for name in names]
+    bits = max(1, (2 * len(names) - 1).bit_length())
+    mask, shift = (1 << bits) - 1, 64 - bits
+    slots = np.full(1 << bits, -1, dtype="<i4")
+    for kid, h in enumerate(hashes):
+        slot = ((h * _SLOT_MIX) & _HASH_MASK) >> shift
+        while slots[slot] >= 0:
+            slot = (slot + 1) & mask
+        slots[slot] = kid
+    return {"name_hashes": np.asarray(hashes, dtype="<u8"), "name_slots": slots}
+
+
+def _bigram_postings(names: list[str]) -> dict[str, np.ndarray]:
+    """The fuzzy matcher's bigram → food postings, as CSR arrays."""
+    from app.services.nutrition import _bigrams
+
+    sizes, codes, owners = [], [], []
+    for kid, name in enumerate(names):
+        bigrams = _bigrams(name)
+        sizes.append(len(bigrams))
+        codes.extend(_bigram_code(bg) for bg in bigrams)
+        owners.extend([kid] * len(bigrams))
+    codes_arr = np.asarray(codes, dtype="<i8")
+    # Stable, so each bigram's foods stay ascending
+    order = np.argsort(codes_arr, kind="stable")
+    unique, counts = np.unique(codes_arr[order], return_counts=True)
+    ptr = np.zeros(len(unique) + 1, dtype="<u8")
+    np.cumsum(counts, out=ptr[1:])
+    return {
+        "key_sizes":    np.asarray(sizes, dtype="<i4"),
+        "bigram_codes": unique.astype("<i8"),
+        "bigram_ptr":   ptr,
+        "bigram_ids":   np.asarray(owners, dtype="<i4")[order],
+    }
+
+
+def compile_food_table(
+    sources: Iterable[str | Path],
+    dest: str | Path,
+    include_builtin: bool = True,
+) -> int:
+    """
+    Compile food tables into a columnar file at dest; returns the food count.
+
+    Names are lower-cased and whitespace-collapsed; the first occurrence of a
+    name wins.  With include_builtin the shipped INGREDIENT_DB (and its unit
+    overrides) comes first, so dish templates keep resolving and built-in
+    foods are not shadowed by external rows of the same name.  A source that
+    yields no named food raises ValueError.
+    """
+    ids: dict[str, int] = {}
+    columns: list[list[float]] = [[] for _ in FIELDS]
+    overrides: list[dict[str, float]] = []
+
+    streams = [(str(p), _read_source(Path(p))) for p in sources]
+    if include_builtin:
+        streams.insert(0, ("built-in ingredients", _builtin_rows()))
+
+    for source, stream in streams:
+        named = 0
+        for raw_name, macros, units in stream:
+            name = _canonical_name(raw_name)
+            if not name:
+                continue
+            named += 1
+            if name in ids:
+                continue
+            ids[name] = len(ids)
+            for col, field in zip(columns, FIELDS):
+                col.append(macros.get(field, 0.0))
+            overrides.append(units)
+        # Usually the wrong delimiter or layout rather than an empty export
+        if not named:
+            raise ValueError(f"No named foods read from {source}")
+
+    unit_names = sorted({u for units in overrides for u in units})
+    if len(unit_names) > 255:
+        raise ValueError(f"Too many distinct units ({len(unit_names)}); at most 255 are supported")
+    unit_index = {u: i for i, u in enumerate(unit_names)}
+
+    encoded = [name.encode("utf-8") for name in ids]
+    name_offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    np.cumsum([len(b) for b in encoded], out=name_offsets[1:])
+    unit_ptr = np.zeros(len(overrides) + 1, dtype="<u4")
+    np.cumsum([len(u) for u in overrides], out=unit_ptr[1:])
+
+    sections = {
+        "macros":       np.asarray(columns, dtype="<f4").reshape(len(FIELDS), len(ids)),
+        "name_offsets": name_offsets,
+        "names":        np.frombuffer(b"".join(encoded), dtype="u1"),
+        **_name_table(list(ids)),
+        "unit_ptr":     unit_ptr,
+        "unit_ids":     np.asarray(
+            [unit_index[u] for units in overrides for u in units], dtype="u1"
+        ),
+        "unit_grams":   np.asarray(
+            [g for units in overrides for g in units.values()], dtype="<f4"
+        ),
+        **_bigram_postings(list(ids)),
+    }
+
+    # Section offsets are relative to the first aligned byte after the header
+    layout, offset = {}, 0
+    for key, arr in sections.items():
+        layout[key] = {"offset": offset, "dtype": arr.dtype.str, "shape": list(arr.shape)}
+        offset += -(-arr.nbytes // _ALIGN) * _ALIGN
+    header = {"version": _VERSION, "count": len(ids), "fields": list(FIELDS),
+              "units": unit_names, "max_name_len": max(map(len, ids), default=0),
+              "sections": layout}
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = -(-(len(_MAGIC) + 4 + len(header_bytes)) // _ALIGN) * _ALIGN
+
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_suffix(dest.suffix + ".tmp")
+    with tmp.open("wb") as fh:
+        fh.write(_MAGIC)
+        fh.write(len(header_bytes).to_bytes(4, "little"))
+        fh.write(header_bytes)
+        for key, arr in sections.items():
+            fh.write(b"\0" * (data_start + layout[key]["offset"] - fh.tell()))
+            fh.write(arr.tobytes())
+        _pad(fh)
+    # Atomic swap so running workers never map a half-written file
+    tmp.replace(dest)
+    return len(ids)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Memory-mapped reader
+# ─────────────────────────────────────────────────────────────────────────────
+
+class _Names(Sequence):
+    """The store's names in row order, decoded from the mapped blob when read."""
+
+    def __init__(self, store: "FoodStore") -> None:
+        self._store = store
+
+    def __getitem__(self, kid):
+        if isinstance(kid, slice):
+            return [self[i] for i in range(*kid.indices(len(self)))]
+        if not -len(self) <= kid < len(self):
+            raise IndexError(kid)
+        return self._store.name(kid % len(self))
+
+    def __iter__(self) -> Iterator[str]:
+        blob, offsets = self._store.name_blob, self._store.name_offsets
+        for lo in range(0, len(self), 4096):
+            bounds = offsets[lo:lo + 4097].tolist()
+            for a, b in zip(bounds, bounds[1:]):
+                yield blob[a:b].tobytes().decode("utf-8")
+
+    def __len__(self) -> int:
+        return self._store.count
+
+
+class _NameIds(Mapping):
+    """Read-only {name: row} view over the store's name hash table."""
+
+    def __init__(self, store: "FoodStore") -> None:
+        self._store = store
+
+    def __getitem__(self, name: str) -> int:
+        kid = self._store.find(name)
+        if kid < 0:
+            raise KeyError(name)
+        return kid
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and self._store.find(name) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store.names)
+
+    def __len__(self) -> int:
+        return self._store.count
+
+
+class _UnitOverrides(Mapping):
+    """Read-only {name: {unit: grams}} view over the store's CSR unit arrays."""
+
+    def __init__(self, store: "FoodStore") -> None:
+        self._store = store
+
+    def __getitem__(self, name: str) -> dict[str, float]:
+        kid = self._store.ids[name]
+        lo, hi = int(self._store.unit_ptr[kid]), int(self._store.unit_ptr[kid + 1])
+        if lo == hi:
+            raise KeyError(name)
+        units = self._store.units
+        return {
+            units[u]: round(g, DECIMALS)
+            for u, g in zip(self._store.unit_ids[lo:hi].tolist(),
+                            self._store.unit_grams[lo:hi].tolist())
+        }
+
+    def __iter__(self) -> Iterator[str]:
+        has_units = np.flatnonzero(np.diff(self._store.unit_ptr) > 0)
+        return (self._store.name(i) for i in has_units.tolist())
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(np.diff(self._store.unit_ptr) > 0))
+
+
+class FoodStore(Mapping):
+    """
+    Read-only, memory-mapped food table: {name: {field: value per 100 g}}.
+
+    macro_matrix is a (foods × FIELDS) float32 view straight onto the mapped
+    columns; ids maps each name to its row through the compiled hash table,
+    and names reads them back by row.  Round gathered values to `decimals`
+    to recover the source numbers.  bigram_postings, key_sizes and
+    contained serve the nutrition engine's fuzzy matcher.
+    """
+
+    decimals = DECIMALS
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._mm = np.memmap(self.path, dtype=np.uint8, mode="r")
+        if bytes(self._mm[:len(_MAGIC)]) != _MAGIC:
+            raise ValueError(f"{self.path} is not a compiled food table")
+        header_len = int.from_bytes(bytes(self._mm[len(_MAGIC):len(_MAGIC) + 4]), "little")
+        header_end = len(_MAGIC) + 4 + header_len
+        header = json.loads(bytes(self._mm[len(_MAGIC) + 4:header_end]).decode("utf-8"))
+        if header.get("version") != _VERSION:
+            raise ValueError(
+                f"Unsupported food table version: {header.get('version')} "
+                f"(recompile it with python -m app.services.food_store)"
+            )
+
+        self.count: int = header["count"]
+        self.fields: tuple[str, ...] = tuple(header["fields"])
+        self.units: list[str] = header["units"]
+        self.max_name_len: int = header["max_name_len"]
+        data_start = -(-header_end // _ALIGN) * _ALIGN
+        arrays = {}
+        for key, sec in header["sections"].items():
+            shape = tuple(sec["shape"])
+            arrays[key] = np.frombuffer(
+                self._mm,
+                dtype=np.dtype(sec["dtype"]),
+                count=int(np.prod(shape)),
+                offset=data_start + sec["offset"],
+            ).reshape(shape)
+
+        self.columns: np.ndarray = arrays["macros"]
+        self.macro_matrix: np.ndarray = self.columns.T
+        self.unit_ptr: np.ndarray = arrays["unit_ptr"]
+        self.unit_ids: np.ndarray = arrays["unit_ids"]
+        self.unit_grams: np.ndarray = arrays["unit_grams"]
+        self.name_blob: np.ndarray = arrays["names"]
+        self.name_offsets: np.ndarray = arrays["name_offsets"]
+        self.name_hashes: np.ndarray = arrays["name_hashes"]
+        self.name_slots: np.ndarray = arrays["name_slots"]
+        self.key_sizes: np.ndarray = arrays["key_sizes"]
+        self.bigram_codes: np.ndarray = arrays["bigram_codes"]
+        self.bigram_ptr: np.ndarray = arrays["bigram_ptr"]
+        self.bigram_ids: np.ndarray = arrays["bigram_ids"]
+        bits = len(self.name_slots).bit_length() - 1
+        self._slot_mask, self._slot_shift = (1 << bits) - 1, 64 - bits
+
+        self.names = _Names(self)
+        self.ids = _NameIds(self)
+        self.unit_overrides = _UnitOverrides(self)
+
+    # -- names --------------------------------------------------------------
+
+    def name(self, kid: int) -> str:
+        lo, hi = self.name_offsets[kid:kid + 2].tolist()
+        return self.name_blob[lo:hi].tobytes().decode("utf-8")
+
+    def find(self, name: str) -> int:
+        """The row of `name`, or -1."""
+        h = _name_hash(name)
+        slot = ((h * _SLOT_MIX) & _HASH_MASK) >> self._slot_shift
+        while True:
+            kid = int(self.name_slots[slot])
+            if kid < 0:
+                return -1
+            if int(self.name_hashes[kid]) == h and self.name(kid) == name:
+                return kid
+            slot = (slot + 1) & self._slot_mask
+
+    def _find_hashes(self, hashes: np.ndarray) -> np.ndarray:
+        """The row whose name hash is each of `hashes`, or -1; names still need checking."""
+        mask = np.uint64(self._slot_mask)
+        slots = (hashes * np.uint64(_SLOT_MIX)) >> np.uint64(self._slot_shift)
+        found = np.full(len(hashes), -1, dtype=np.int64)
+        pending = np.arange(len(hashes))
+        while len(pending):
+            kid = self.name_slots[slots[pending]].astype(np.int64)
+            filled = kid >= 0
+            hit = filled & (self.name_hashes[np.maximum(kid, 0)] == hashes[pending])
+            found[pending[hit]] = kid[hit]
+            pending = pending[filled & ~hit]
+            slots[pending] = (slots[pending] + np.uint64(1)) & mask
+        return found
+
+    def contained(self, text: str, max_len: int) -> list[int]:
+        """The rows of the names that occur in `text`, none longer than `max_len`."""
+        n = len(text)
+        if not n or not max_len:
+            return []
+        # Prefix hashes, so each substring's hash is one multiply-subtract
+        prefix, powers = [0], [1]
+        for ch in text:
+            prefix.append((prefix[-1] * _HASH_BASE + ord(ch)) & _HASH_MASK)
+            powers.append((powers[-1] * _HASH_BASE) & _HASH_MASK)
+        prefix_arr = np.asarray(prefix, dtype=np.uint64)
+        starts, hashes = [], []
+        for length in range(1, min(n, max_len) + 1):
+            starts.append(np.arange(n - length + 1))
+            hashes.append(prefix_arr[length:] - prefix_arr[:n - length + 1] * np.uint64(powers[length]))
+        lengths = np.repeat(np.arange(1, len(starts) + 1), [len(a) for a in starts])
+        starts_arr = np.concatenate(starts)
+        found = self._find_hashes(np.concatenate(hashes))
+        return [
+            kid for kid, i, length in zip(
+                found.tolist(), starts_arr.tolist(), lengths.tolist()
+            )
+            if kid >= 0 and self.name(kid) == text[i:i + length]
+        ]
+
+    # -- fuzzy matching -----------------------------------------------------
+
+    def bigram_postings(self, bigrams: Iterable[str]) -> list[np.ndarray]:
+        """The rows whose names have each of `bigrams` (those any name has)."""
+        codes = np.fromiter((_bigram_code(bg) for bg in bigrams), dtype=np.int64)
+        if not len(codes) or not len(self.bigram_codes):
+            return []
+        pos = np.minimum(np.searchsorted(self.bigram_codes, codes), len(self.bigram_codes) - 1)
+        pos = pos[self.bigram_codes[pos] == codes]
+        return [
+            self.bigram_ids[lo:hi]
+            for lo, hi in (self.bigram_ptr[p:p + 2].tolist() for p in pos.tolist())
+        ]
+
+    # -- mapping ------------------------------------------------------------
+
+    def __getitem__(self, name: str) -> dict[str, float]:
+        row = self.macro_matrix[self.ids[name]].tolist()
+        return {f: round(v, self.decimals) for f, v in zip(self.fields, row)}
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return self.count
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compile food tables for the nutrition engine.")
+    parser.add_argument(
+        "sources", nargs="+", help="CSV, TSV, JSON or JSONL food tables (per 100 g), optionally .gz",
+    )
+    parser.add_argument("-o", "--output", required=True, help="Destination .bin file")
+    parser.add_argument(
+        "--no-builtin", action="store_true",
+        help="Do not include the built-in ingredient table (dish templates may stop resolving)",
+    )
+    args = parser.parse_args(argv)
+    count = compile_food_table(args.sources, args.output, include_builtin=not args.no_builtin)
+    print(f"Wrote {count} foods to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Per-user intervention gate, checked before any wellness data is fetched.
+
+A user is sent an intervention only
+  * outside their quiet hours, on their own timezone's clock,
+  * while they have had fewer than max_interventions_per_day on their
+    local day,
+  * once their last one is intervention_cooldown_hours old,
+and, after detection, only for a signal whose confidence reaches their
+intervention_confidence_threshold.  User columns left NULL fall back to
+QUIET_HOURS_START/END, MAX_INTERVENTIONS_PER_DAY,
+INTERVENTION_COOLDOWN_HOURS and ML_CONFIDENCE_THRESHOLD.
+
+Preferences and counters share one Redis hash per user, alfred:gate:{id},
+so the check is one HGETALL (one pipeline for a sweep chunk), and a gated
+request touches neither the database nor the generator.  The hash also
+keeps the profile the generator is given (timezone, dietary preferences,
+fitness goals), so /interventions/generate reads no user row.  A missing
+hash is built from the tables (wellness_data.fetch_gate_rows) and expires
+after INTERVENTION_GATE_TTL_HOURS, which is also how long a changed
+preference or profile can take to apply.
+
+claim takes the quota and cooldown right before the generator is called:
+a Lua script re-checks both and records the intervention atomically, so
+concurrent requests for one user cannot both pass.  release gives the
+slot back when nothing was generated.  A claim against a hash that has
+expired since the check goes through uncounted, and the rebuild counts it
+from the tables.  When Redis is unreachable every check is built from the
+tables and claims are not enforced.
+"""
+import json
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone, tzinfo
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.redis_client import mark_redis_down, redis_client
+from app.services import wellness_data
+from app.services.alfred_agent import Signal
+
+# 1 if the slot was taken, 0 if the quota or cooldown forbids it, -1 if
+# there is no gate state to check against
+_CLAIM_LUA = """
+local f = redis.call('HMGET', KEYS[1], 'day', 'count', 'last_at', 'max_per_day', 'cooldown_s')
+if not f[4] then return -1 end
+local count = 0
+if f[1] == ARGV[1] then count = tonumber(f[2]) end
+if count >= tonumber(f[4]) then return 0 end
+if tonumber(ARGV[2]) - tonumber(f[3]) < tonumber(f[5]) then return 0 end
+redis.call('HSET', KEYS[1], 'day', ARGV[1], 'count', count + 1, 'last_at', ARGV[2], 'prev_at', f[3])
+return 1
+"""
+
+# Undoes the claim stamped ARGV[1], unless a later one has replaced it
+_RELEASE_LUA = """
+local f = redis.call('HMGET', KEYS[1], 'last_at', 'prev_at', 'count')
+if f[1] ~= ARGV[1] then return 0 end
+redis.call('HSET', KEYS[1], 'last_at', f[2], 'count', math.max(tonumber(f[3]) - 1, 0))
+return 1
+"""
+
+
+def _key(user_id: int) -> str:
+    return f"alfred:gate:{user_id}"
+
+
+def _stamp(now: datetime) -> str:
+    return f"{now.timestamp():.6f}"
+
+
+def _utc(dt: datetime) -> datetime:
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+
+
+def _zone(name: Optional[str]) -> tzinfo:
+    try:
+        return ZoneInfo(name or "UTC")
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+def _minutes(hhmm: str) -> Optional[int]:
+    try:
+        hours, minutes = hhmm.split(":")
+        return int(hours) * 60 + int(minutes)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _or(value, default):
+    return default if value is None else value
+
+
+@dataclass(frozen=True, slots=True)
+class GateState:
+    timezone: str
+    quiet_start: str
+    quiet_end: str
+    max_per_day: int
+    cooldown_s: float
+    confidence_threshold: float
+    # What user_data() reads besides the timezone
+    dietary_preferences: Any
+    fitness_goals: Any
+    # The user's local date `count` is for
+    day: str
+    count: int
+    # Epoch seconds of the latest intervention, 0 if none
+    last_at: float
+
+    def local_day(self, now: datetime) -> str:
+        return now.astimezone(_zone(self.timezone)).date().isoformat()
+
+    def in_quiet_hours(self, now: datetime) -> bool:
+        start, end = _minutes(self.quiet_start), _minutes(self.quiet_end)
+        if start is None or end is None or start == end:
+            return False
+        local = now.astimezone(_zone(self.timezone))
+        minute = local.hour * 60 + local.minute
+        if start < end:
+            return start <= minute < end
+        return minute >= start or minute < end
+
+    def blocked(self, now: datetime) -> Optional[str]:
+        """Why no intervention may be sent at `now`, or None."""
+        if self.in_quiet_hours(now):
+            return "quiet_hours"
+        if self.day == self.local_day(now) and self.count >= self.max_per_day:
+            return "daily_quota"
+        if now.timestamp() - self.last_at < self.cooldown_s:
+            return "cooldown"
+        return None
+
+    def admits(self, signal: Signal) -> bool:
+        return signal.confidence >= self.confidence_threshold
+
+    def to_hash(self) -> Dict[str, Any]:
+        fields = asdict(self)
+        fields["dietary_preferences"] = json.dumps(self.dietary_preferences)
+        fields["fitness_goals"] = json.dumps(self.fitness_goals)
+        return fields
+
+    @classmethod
+    def from_hash(cls, fields: Dict[str, str]) -> "GateState":
+        return cls(
+            timezone=fields["timezone"],
+            quiet_start=fields["quiet_start"],
+            quiet_end=fields["quiet_end"],
+            max_per_day=int(fields["max_per_day"]),
+            cooldown_s=float(fields["cooldown_s"]),
+            confidence_threshold=float(fields["confidence_threshold"]),
+            dietary_preferences=json.loads(fields["dietary_preferences"]),
+            fitness_goals=json.loads(fields["fitness_goals"]),
+            day=fields["day"],
+            count=int(fields["count"]),
+            last_at=float(fields["last_at"]),
+        )
+
+    @classmethod
+    def from_tables(
+        cls, user: Any, sent: Iterable[datetime], latest: Optional[datetime], now: datetime
+    ) -> "GateState":
+        """The state of `user` given their last 24 hours' and latest interventions."""
+        zone = _zone(user.timezone)
+        today = now.astimezone(zone).date()
+        return cls(
+            timezone=user.timezone or "UTC",
+            quiet_start=_or(user.quiet_hours_start, settings.QUIET_HOURS_START),
+            quiet_end=_or(user.quiet_hours_end, settings.QUIET_HOURS_END),
+            max_per_day=_or(user.max_interventions_per_day, settings.MAX_INTERVENTIONS_PER_DAY),
+            cooldown_s=_or(user.intervention_cooldown_hours, settings.INTERVENTION_COOLDOWN_HOURS) * 3600.0,
+            confidence_threshold=_or(user.intervention_confidence_threshold, settings.ML_CONFIDENCE_THRESHOLD),
+            dietary_preferences=user.dietary_preferences,
+            fitness_goals=user.fitness_goals,
+            day=today.isoformat(),
+            count=sum(1 for t in sent if _utc(t).astimezone(zone).date() == today),
+            last_at=_utc(latest).timestamp() if latest is not None else 0.0,
+        )
+
+
+# ---------------------------------------------------------------------------
+# Checks
+# ---------------------------------------------------------------------------
+
+async def _store(states: Dict[int, GateState]) -> None:
+    ttl = int(settings.INTERVENTION_GATE_TTL_HOURS * 3600)
+    try:
+        pipe = redis_client().pipeline(transaction=True)
+        for user_id, state in states.items():
+            pipe.delete(_key(user_id))
+            pipe.hset(_key(user_id), mapping={**state.to_hash(), "prev_at": state.last_at})
+            pipe.expire(_key(user_id), ttl)
+        await pipe.execute()
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+        logger.warning(f"Intervention gate state not stored: {exc}")
+
+
+async def load_states(
+    user_ids: Sequence[int], now: datetime, db: Optional[AsyncSession] = None
+) -> Dict[int, GateState]:
+    """
+    Gate state of each of `user_ids` that exists, from Redis; users without
+    one are built from the tables (three queries for all of them, on `db`
+    if given) and stored.
+    """
+    states: Dict[int, GateState] = {}
+    cached = True
+    try:
+        pipe = redis_client().pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.hgetall(_key(user_id))
+        for user_id, fields in zip(user_ids, await pipe.execute()):
+            if fields:
+                try:
+                    states[user_id] = GateState.from_hash(fields)
+                except (KeyError, ValueError):
+                    pass
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+        logger.warning(f"Intervention gate state unavailable, reading the tables: {exc}")
+        cached = False
+
+    missing = [uid for uid in user_ids if uid not in states]
+    if missing:
+        users, sent, latest = await wellness_data.fetch_gate_rows(missing, now, db)
+        built = {
+            uid: GateState.from_tables(user, sent.get(uid, ()), latest.get(uid), now)
+            for uid, user in users.items()
+        }
+        if cached and built:
+            await _store(built)
+        states.update(built)
+    return states
+
+
+# ---------------------------------------------------------------------------
+# Claims
+# ---------------------------------------------------------------------------
+
+async def claim(states: Dict[int, GateState], now: datetime) -> Dict[int, bool]:
+    """
+    Take one intervention of each user's quota and start their cooldown,
+    atomically.  False for users a concurrent claim got to first.
+    """
+    if not states:
+        return {}
+    stamp = _stamp(now)
+    try:
+        redis = redis_client()
+        script = redis.register_script(_CLAIM_LUA)
+        pipe = redis.pipeline(transaction=False)
+        for user_id, state in states.items():
+            await script(keys=[_key(user_id)], args=[state.local_day(now), stamp], client=pipe)
+        results = await pipe.execute()
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+        logger.warning(f"Intervention gate claims not enforced: {exc}")
+        return {user_id: True for user_id in states}
+    return {user_id: result != 0 for user_id, result in zip(states, results)}
+
+
+async def release(user_ids: List[int], now: datetime) -> None:
+    """Give back the slots claimed at `now` by `user_ids`.  Never raises."""
+    if not user_ids:
+        return
+    stamp = _stamp(now)
+    try:
+        redis = redis_client()
+        script = redis.register_script(_RELEASE_LUA)
+        pipe = redis.pipeline(transaction=False)
+        for user_id in user_ids:
+            await script(keys=[_key(user_id)], args=[stamp], client=pipe)
+        await pipe.execute()
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+        logger.warning(f"Intervention gate slots not released: {exc}")
@@ -0,0 +1,406 @@
+"""
+The periodic intervention sweep over every active user.
+
+check_and_generate_interventions (app.tasks.intervention_tasks) pages the
+active user ids by keyset (active_user_id_pages), cuts them into chunks of
+INTERVENTION_SWEEP_CHUNK_SIZE and runs one chunk task per chunk as a Celery
+group.  run_chunk then:
+
+  1. drops the users the intervention gate holds back (quiet hours, daily
+     quota, cooldown), from their Redis gate state in one pipeline;
+  2. reads the remaining users' data versions and sweep memos (two Redis
+     reads): a user who has logged nothing since an earlier run today
+     runs only the time-dependent detectors again, on what the memo kept
+     (see sweep_memo);
+  3. loads the windows and latest meals and nights of the others
+     (wellness_data.fetch_batch: one UNION ALL statement) and their stored
+     baselines (load_stored_baselines: the same ones /interventions/generate
+     uses, so both reach the same decision on the same data), detects
+     their signals at once (detect_signals_batch, stored baselines first,
+     the windows for the rest), runs the anomaly detector for the users
+     whose rule signal it could still beat, against stored models only,
+     and keeps a memo of each;
+  4. keeps the signals of active users that reach the user's confidence
+     threshold, claims a gate slot for each of those users and loads the
+     rest of their generator context, calendar and recent interventions
+     (wellness_data.fetch_contexts: one statement);
+  5. generates with at most INTERVENTION_SWEEP_GENERATION_CONCURRENCY
+     generator calls in flight, holding no database connection, stores
+     the interventions in one commit and releases the unused slots.
+
+Loading, detection and storing take a fraction of a second per chunk of
+500 (detection alone a few milliseconds), and next to nothing for users
+with no new records, so the sweep's wall time is set by the generator
+calls: signals × call latency / (workers × concurrency).
+
+Each sweep's progress is kept in Redis for a day: counters in
+alfred:sweep:{id} and one JSON entry per finished chunk, with its stage
+timings, in alfred:sweep:{id}:chunks.  A chunk that raises releases the
+slots it claimed and is recorded as well, with its error, so a sweep
+always finishes.  sweep_progress reads them back for /health/sweep.
+Recording never fails a chunk.
+"""
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from redis.exceptions import RedisError
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.logging import logger
+from app.core.redis_client import mark_redis_down, redis_client
+from app.models.intervention import Intervention
+from app.models.user import User
+from app.services import detection_cache, intervention_gate, sweep_memo, wellness_data
+from app.services.alfred_agent import Signal, alfred_agent
+from app.services.baselines import Baseline, load_stored_baselines
+from app.services.intervention_gate import GateState
+from app.services.interventions import new_intervention, user_data
+from app.services.signal_batch import BaselineColumns, batch_baselines, detect_signals_batch
+from app.services.signal_detector import DETECTORS, detect_anomaly
+from app.services.sweep_memo import SweepMemo
+from app.services.wellness_data import Context, Patterns
+from app.services.wellness_window import WindowBatch
+
+_PROGRESS_TTL = 86400
+_LAST_SWEEP_KEY = "alfred:sweep:last"
+_COUNTERS = ("users_done", "gated", "unchanged", "signals", "below_threshold", "generated", "failed")
+_STAGES = ("gate_ms", "load_ms", "detect_ms", "context_ms", "generate_ms", "store_ms", "total_ms")
+
+
+def _progress_key(sweep_id: str) -> str:
+    return f"alfred:sweep:{sweep_id}"
+
+
+def _chunks_key(sweep_id: str) -> str:
+    return f"alfred:sweep:{sweep_id}:chunks"
+
+
+def _ms(since: float) -> float:
+    return round((time.perf_counter() - since) * 1000, 1)
+
+
+# ---------------------------------------------------------------------------
+# Coordinator side
+# ---------------------------------------------------------------------------
+
+def new_sweep_id(now: datetime) -> str:
+    return f"{now:%Y%m%dT%H%M%SZ}-{uuid.uuid4().hex[:6]}"
+
+
+async def active_user_id_pages(page_size: int) -> AsyncIterator[List[int]]:
+    """Active user ids in ascending order, `page_size` at a time (keyset paging)."""
+    last_id = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(User.id)
+                .where(User.is_active.is_(True), User.id > last_id)
+                .order_by(User.id)
+                .limit(page_size)
+            )
+            ids = list(result.scalars().all())
+        if ids:
+            yield ids
+        if len(ids) < page_size:
+            return
+        last_id = ids[-1]
+
+
+async def start_sweep(sweep_id: str, users: int, chunks: int, started_at: datetime) -> None:
+    key = _progress_key(sweep_id)
+    try:
+        pipe = redis_client().pipeline(transaction=True)
+        pipe.hset(key, mapping={
+            "started_at": started_at.isoformat(),
+            "users_total": users,
+            "chunks_total": chunks,
+            "chunks_done": 0,
+            "chunks_failed": 0,
+            **{counter: 0 for counter in _COUNTERS},
+        })
+        pipe.expire(key, _PROGRESS_TTL)
+        pipe.set(_LAST_SWEEP_KEY, sweep_id, ex=_PROGRESS_TTL)
+        await pipe.execute()
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+        logger.warning(f"Sweep {sweep_id} progress not recorded: {exc}")
+
+
+# ---------------------------------------------------------------------------
+# Chunk side
+# ---------------------------------------------------------------------------
+
+async def _stored_baselines(
+    user_ids: Sequence[int], now: datetime,
+) -> Dict[int, Dict[str, Optional[Baseline]]]:
+    async with AsyncSessionLocal() as db:
+        return await load_stored_baselines(db, user_ids, now)
+
+
+def _detect(
+    batch: WindowBatch,
+    baselines: Dict[str, BaselineColumns],
+    memos: List[Dict[str, Optional[Signal]]],
+    run_anomaly: bool = True,
+) -> Tuple[List[Optional[Signal]], List[int]]:
+    """
+    detect_signals for every user of the batch, anomaly models from disk
+    only.  memos[i] holds user i's data-only results: the anomaly detector's
+    is taken from it or, with `run_anomaly`, computed and put there.  Also
+    returns the users whose anomaly result was needed but not there.
+    """
+    signals = detect_signals_batch(batch, baselines)
+    anomaly = next(d for d in DETECTORS if d.name == "anomaly")
+    missing = []
+    for i, signal in enumerate(signals):
+        strength = signal.severity * signal.confidence if signal else -1.0
+        # Registered last, so it has to beat the rule signal outright
+        if anomaly.max_strength <= strength:
+            continue
+        if anomaly.name not in memos[i]:
+            if not run_anomaly:
+                missing.append(i)
+                continue
+            memos[i][anomaly.name] = detect_anomaly(
+                batch.window(i), int(batch.user_ids[i]), fit_missing=False
+            )
+        found = memos[i][anomaly.name]
+        if found is not None and found.severity * found.confidence > strength:
+            signals[i] = found
+    return signals, missing
+
+
+def _detect_unchanged(memos: Dict[int, SweepMemo], now: datetime) -> Dict[int, Optional[Signal]]:
+    """
+    The signals of the users of `memos`, from what each memo kept; users
+    whose memo cannot tell are left out.
+    """
+    user_ids = list(memos)
+    if not user_ids:
+        return {}
+    batch = WindowBatch.from_windows(user_ids, [memos[uid].window_at(now) for uid in user_ids])
+    baselines = batch_baselines(batch, [memos[uid].baselines for uid in user_ids])
+    signals, missing = _detect(batch, baselines, [memos[uid].memo for uid in user_ids], run_anomaly=False)
+    unknown = {user_ids[i] for i in missing}
+    return {uid: signal for uid, signal in zip(user_ids, signals) if uid not in unknown}
+
+
+async def _detect_loaded(
+    batch: WindowBatch,
+    stored: Dict[int, Dict[str, Optional[Baseline]]],
+    versions: Optional[Dict[int, str]],
+    now: datetime,
+) -> Dict[int, Optional[Signal]]:
+    """The signals of the users of a loaded batch; keeps a memo of each."""
+    user_ids = [int(uid) for uid in batch.user_ids]
+    memos: List[Dict[str, Optional[Signal]]] = [{} for _ in user_ids]
+    baselines = batch_baselines(batch, [stored[uid] for uid in user_ids])
+    signals, _ = _detect(batch, baselines, memos)
+    if versions is not None:
+        kept = {
+            uid: sweep_memo.from_window(versions[uid], batch.window(i), stored[uid], memos[i])
+            for i, uid in enumerate(user_ids)
+        }
+        await sweep_memo.store({uid: m for uid, m in kept.items() if m is not None}, now)
+    return dict(zip(user_ids, signals))
+
+
+async def _generate(
+    flagged: List[Tuple[int, Signal]],
+    gates: Dict[int, GateState],
+    contexts: Dict[int, Context],
+) -> Tuple[List[Intervention], int]:
+    """Interventions for the flagged users, and how many generator calls failed."""
+    semaphore = asyncio.Semaphore(settings.INTERVENTION_SWEEP_GENERATION_CONCURRENCY)
+
+    async def one(user_id: int, signal: Signal) -> Optional[Intervention]:
+        calendar, meals, sleep, recent = contexts[user_id]
+        async with semaphore:
+            data = await alfred_agent.generate_intervention(
+                user_data=user_data(gates[user_id], calendar),
+                signal=signal,
+                user_patterns={"meals": meals, "sleep": sleep},
+                recent_interventions=recent,
+            )
+        return new_intervention(user_id, signal, data) if data else None
+
+    results = await asyncio.gather(*(one(uid, sig) for uid, sig in flagged), return_exceptions=True)
+    interventions, failed = [], 0
+    for (user_id, _), result in zip(flagged, results):
+        if isinstance(result, BaseException):
+            failed += 1
+            logger.warning(f"Intervention generation failed for user {user_id}: {result}")
+        elif result is not None:
+            interventions.append(result)
+    return interventions, failed
+
+
+async def run_chunk(user_ids: Sequence[int], sweep_id: str, index: int) -> Dict:
+    """Detect, generate and store interventions for one chunk of users."""
+    started = time.perf_counter()
+    now = datetime.now(timezone.utc)
+    stats: Dict = {"chunk": index, "users": len(user_ids), **dict.fromkeys(_COUNTERS, 0)}
+    # Claimed gate slots, and the users whose intervention was stored
+    flagged: List[Tuple[int, Signal]] = []
+    generated: set = set()
+
+    try:
+        t = time.perf_counter()
+        gates = await intervention_gate.load_states(user_ids, now)
+        open_ids = [uid for uid in user_ids if uid in gates and gates[uid].blocked(now) is None]
+        stats["gate_ms"] = _ms(t)
+
+        # Versions are read before the tables, so a write in between leaves
+        # the memo under an older version
+        t = time.perf_counter()
+        versions = await detection_cache.data_versions(open_ids) if open_ids else {}
+        memos = await sweep_memo.load(versions or {}, now)
+        stats["load_ms"] = _ms(t)
+
+        t = time.perf_counter()
+        kept = _detect_unchanged(memos, now)
+        signals = dict(kept)
+        stats["detect_ms"] = _ms(t)
+
+        loaded = [uid for uid in open_ids if uid not in kept]
+        patterns: Dict[int, Patterns] = {}
+        if loaded:
+            t = time.perf_counter()
+            (batch, patterns), stored = await asyncio.gather(
+                wellness_data.fetch_batch(loaded, now),
+                _stored_baselines(loaded, now),
+            )
+            stats["load_ms"] += _ms(t)
+
+            t = time.perf_counter()
+            signals.update(await _detect_loaded(batch, stored, versions, now))
+            stats["detect_ms"] += _ms(t)
+
+        # Users deactivated since the sweep started are skipped
+        t = time.perf_counter()
+        detected = [(uid, signals[uid]) for uid in open_ids if signals[uid] is not None]
+        active = await wellness_data.fetch_active_user_ids([uid for uid, _ in detected]) if detected else set()
+        detected = [(uid, sig) for uid, sig in detected if uid in active]
+        admitted = [(uid, sig) for uid, sig in detected if gates[uid].admits(sig)]
+
+        # A request for the same user may have taken the slot since the check
+        claimed = await intervention_gate.claim({uid: gates[uid] for uid, _ in admitted}, now)
+        flagged = [(uid, sig) for uid, sig in admitted if claimed[uid]]
+        # Users detected from their memo have their patterns read with the context
+        contexts = await wellness_data.fetch_contexts(
+            {uid: None if uid in kept else patterns.get(uid, ([], [])) for uid, _ in flagged}, now
+        )
+        stats["context_ms"] = _ms(t)
+
+        t = time.perf_counter()
+        interventions, failed = await _generate(flagged, gates, contexts)
+        stats["generate_ms"] = _ms(t)
+
+        t = time.perf_counter()
+        if interventions:
+            async with AsyncSessionLocal() as db:
+                db.add_all(interventions)
+                await db.commit()
+        generated = {i.user_id for i in interventions}
+        stats["store_ms"] = _ms(t)
+
+        stats.update(
+            users_done=len(user_ids), unchanged=len(kept),
+            gated=len(user_ids) - len(open_ids) + len(admitted) - len(flagged),
+            signals=len(detected), below_threshold=len(detected) - len(admitted),
+            generated=len(interventions), failed=failed,
+        )
+    except Exception as exc:
+        stats["error"] = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        # Slots claimed for users who got no stored intervention, whatever failed
+        await intervention_gate.release([uid for uid, _ in flagged if uid not in generated], now)
+        stats["total_ms"] = _ms(started)
+        # Failed chunks are recorded too, so the sweep still finishes
+        await _record_chunk(sweep_id, stats)
+
+    logger.info(
+        f"Sweep {sweep_id} chunk {index}: {len(user_ids)} users, {stats['gated']} gated, "
+        f"{stats['signals']} signals, {stats['generated']} interventions, {stats['failed']} failed "
+        f"in {stats['total_ms']:.0f} ms"
+    )
+    return stats
+
+
+async def _record_chunk(sweep_id: str, stats: Dict) -> None:
+    key = _progress_key(sweep_id)
+    try:
+        redis = redis_client()
+        pipe = redis.pipeline(transaction=True)
+        pipe.hincrby(key, "chunks_done", 1)
+        pipe.hincrby(key, "chunks_failed", int("error" in stats))
+        for counter in _COUNTERS:
+            pipe.hincrby(key, counter, stats[counter])
+        pipe.hget(key, "chunks_total")
+        pipe.rpush(_chunks_key(sweep_id), json.dumps(stats))
+        pipe.expire(key, _PROGRESS_TTL)
+        pipe.expire(_chunks_key(sweep_id), _PROGRESS_TTL)
+        results = await pipe.execute()
+        done, total = results[0], results[2 + len(_COUNTERS)]
+        if total is not None and done >= int(total):
+            await redis.hset(key, "finished_at", datetime.now(timezone.utc).isoformat())
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+        logger.warning(f"Sweep {sweep_id} chunk {stats['chunk']} progress not recorded: {exc}")
+
+
+# ---------------------------------------------------------------------------
+# Progress
+# ---------------------------------------------------------------------------
+
+async def sweep_progress(sweep_id: Optional[str] = None) -> Optional[Dict]:
+    """Counters and chunk timings of a sweep (the latest by default); None if unknown."""
+    try:
+        redis = redis_client()
+        sweep_id = sweep_id or await redis.get(_LAST_SWEEP_KEY)
+        if not sweep_id:
+            return None
+        progress = await redis.hgetall(_progress_key(sweep_id))
+        chunks = [json.loads(c) for c in await redis.lrange(_chunks_key(sweep_id), 0, -1)]
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+        logger.warning(f"Sweep progress unavailable: {exc}")
+        return None
+    if not progress:
+        return None
+
+    started_at = datetime.fromisoformat(progress["started_at"])
+    finished_at = progress.get("finished_at")
+    end = datetime.fromisoformat(finished_at) if finished_at else datetime.now(timezone.utc)
+    report = {
+        "sweep_id": sweep_id,
+        "started_at": progress["started_at"],
+        "finished_at": finished_at,
+        "elapsed_s": round((end - started_at).total_seconds(), 1),
+        **{
+            field: int(progress.get(field, 0))
+            for field in ("users_total", "chunks_total", "chunks_done", "chunks_failed", *_COUNTERS)
+        },
+    }
+    if chunks:
+        # A failed chunk has only the stages it finished
+        timings = {stage: [c[stage] for c in chunks if stage in c] for stage in _STAGES}
+        report["chunk_ms"] = {
+            stage: {
+                "p50": round(float(np.percentile(values, 50)), 1),
+                "max": round(float(max(values)), 1),
+            }
+            for stage, values in timings.items() if values
+        }
+    errors = [{"chunk": c["chunk"], "error": c["error"]} for c in chunks if "error" in c]
+    if errors:
+        report["chunk_errors"] = errors
+    return report
@@ -0,0 +1,78 @@
+"""
+Turning a detected signal into a stored intervention.
+
+Shared by /interventions/generate (one user) and the periodic sweep (see
+intervention_sweep), so both hand the generator the same context and
+store the same rows.  Rows may be ORM instances or projected rows with
+the same field names.
+"""
+from typing import Any, Dict, List
+
+from app.models.intervention import Intervention, InterventionStatus, InterventionType
+from app.services.alfred_agent import Signal, SignalType
+
+# How many of the latest meals / nights the generator sees
+PATTERN_ROWS = 7
+# How many of the last 24 hours' interventions it sees
+RECENT_INTERVENTIONS = 10
+
+SIGNAL_TO_INTERVENTION_TYPE = {
+    SignalType.MEAL_GAP: InterventionType.MEAL,
+    SignalType.LOW_ENERGY: InterventionType.ENERGY,
+    SignalType.POOR_SLEEP: InterventionType.REST,
+    SignalType.DEHYDRATION: InterventionType.HYDRATION,
+    SignalType.CALENDAR_CONFLICT: InterventionType.FOCUS,
+    SignalType.RECOVERY_NEEDED: InterventionType.REST,
+    SignalType.STRESS_HIGH: InterventionType.GENERAL,
+}
+
+
+def calendar_entry(e: Any) -> Dict:
+    return {"title": e.title, "start_time": e.start_time,
+            "end_time": e.end_time, "duration_minutes": e.duration_minutes}
+
+
+def meal_entry(m: Any) -> Dict:
+    return {"meal_time": m.meal_time, "meal_type": m.meal_type,
+            "calories": m.calories, "water_ml": m.water_ml,
+            "description": m.description}
+
+
+def sleep_entry(s: Any) -> Dict:
+    return {"sleep_start": s.sleep_start, "sleep_end": s.sleep_end,
+            "duration_minutes": s.duration_minutes, "quality_score": s.quality_score}
+
+
+def intervention_entry(i: Any) -> Dict:
+    return {"type": i.type.value, "title": i.title,
+            "created_at": i.created_at.isoformat(),
+            "user_response": i.user_response}
+
+
+def user_data(user: Any, upcoming_calendar: List[Dict]) -> Dict:
+    return {
+        "timezone": user.timezone,
+        "dietary_preferences": user.dietary_preferences,
+        "fitness_goals": user.fitness_goals,
+        "upcoming_calendar": upcoming_calendar,
+    }
+
+
+def new_intervention(user_id: int, signal: Signal, intervention_data: Dict) -> Intervention:
+    """A PENDING intervention for what the generator returned."""
+    # Keep generated source in recommendation_data for observability
+    rec_data = intervention_data.get("recommendation_data", {})
+    if intervention_data.get("generated_by"):
+        rec_data = {**rec_data, "generated_by": intervention_data.get("generated_by")}
+
+    return Intervention(
+        user_id=user_id,
+        type=SIGNAL_TO_INTERVENTION_TYPE.get(signal.type, InterventionType.GENERAL),
+        status=InterventionStatus.PENDING,
+        title=intervention_data["title"],
+        message=intervention_data["message"],
+        reasoning=intervention_data["reasoning"],
+        confidence_score=intervention_data["confidence"],
+        triggering_signals=[signal.to_dict()],
+        recommendation_data=rec_data,
+    )
@@ -16,10 +16,17 @@ LLM is NOT called here — use as optional fallback in the endpoint layer.
 """
 from __future__ import annotations
 
+import asyncio
+import json
 import re
 import math
-from dataclasses import dataclass, field
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Union
+
+import numpy as np
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -673,7 +680,7 @@ def _clean_text(text: str) -> str:
 
 
 # ─────────────────────────────────────────────────────────────────────────────
-# 7.  FUZZY MATCHING  (no external dependencies — character bigram similarity)
+# 7.  FUZZY MATCHING  (character bigram similarity over an inverted index)
 # ─────────────────────────────────────────────────────────────────────────────
 
 def _bigrams(s: str) -> set[str]:
@@ -689,21 +696,119 @@ def _dice(a: str, b: str) -> float:
     return 2 * len(bg_a & bg_b) / (len(bg_a) + len(bg_b))
 
 
+class _BigramIndex:
+    """
+    Inverted bigram index over ingredient keys, compiled once per table.
+
+    Holds each key's bigram-set size and a bigram → key-id postings array, so
+    a query counts shared bigrams with one bincount and only scores keys that
+    can still reach the threshold.  Scores are computed exactly as the
+    original linear scan did, and ties still go to the key that comes first
+    in table order.  A compiled FoodStore carries its own postings and name
+    hash table, which are read through its memmap instead of built here.
+    """
+
+    def __init__(self, keys) -> None:
+        if hasattr(keys, "bigram_postings"):
+            self.store = keys
+            self.keys = keys.names
+            self.key_sizes = keys.key_sizes
+            self.max_key_len = keys.max_name_len
+            return
+        self.store = None
+        self.keys: list[str] = list(keys)
+        self.key_ids: dict[str, int] = {k: i for i, k in enumerate(self.keys)}
+        postings: dict[str, list[int]] = {}
+        sizes = []
+        for kid, key in enumerate(self.keys):
+            bgs = _bigrams(key)
+            sizes.append(len(bgs))
+            for bg in bgs:
+                postings.setdefault(bg, []).append(kid)
+        self.postings: dict[str, np.ndarray] = {
+            bg: np.asarray(ids, dtype=np.int32) for bg, ids in postings.items()
+        }
+        self.key_sizes = np.asarray(sizes, dtype=np.int64)
+        self.max_key_len = max((len(k) for k in self.keys), default=0)
+
+    def _hits(self, bgs: set[str]) -> list[np.ndarray]:
+        """The postings of each of `bgs` that some key has."""
+        if self.store is not None:
+            return self.store.bigram_postings(bgs)
+        return [self.postings[bg] for bg in bgs if bg in self.postings]
+
+    def _contained(self, name: str) -> list[int]:
+        """The ids of the keys that occur in `name`."""
+        if self.store is not None:
+            return self.store.contained(name, self.max_key_len)
+        n, found = len(name), []
+        for i in range(n):
+            for j in range(i + 1, min(n, i + self.max_key_len) + 1):
+                kid = self.key_ids.get(name[i:j])
+                if kid is not None:
+                    found.append(kid)
+        return found
+
+    def _substring_score(self, name: str, key: str) -> float:
+        # Prefer shorter, more specific keys
+        return 0.75 + 0.25 * (min(len(name), len(key)) / max(len(name), len(key)))
+
+    def _scan(self, name: str) -> tuple[Optional[str], float]:
+        """Unpruned linear scan, kept for degenerate queries."""
+        best_key, best_score = None, 0.0
+        for key in self.keys:
+            if name in key or key in name:
+                score = self._substring_score(name, key)
+            else:
+                score = _dice(name, key)
+            if score > best_score:
+                best_score, best_key = score, key
+        return best_key, best_score
+
+    def best_match(self, name: str, threshold: float) -> tuple[Optional[str], float]:
+        """Return (best_key, best_score) for an already-normalised name."""
+        if len(name) < 2 or not 0.0 < threshold <= 1.0 or not self.keys:
+            return self._scan(name)
+
+        q_bgs = _bigrams(name)
+        q = len(q_bgs)
+        scores: dict[int, float] = {}
+
+        hits = self._hits(q_bgs)
+        if hits:
+            shared = np.bincount(np.concatenate(hits), minlength=len(self.keys))
+            # Dice ≥ threshold implies at least `need` shared bigrams; anything
+            # below that can only qualify through the substring shortcut.
+            need = max(1, math.ceil(threshold * q / (2 - threshold) - 1e-9))
+            ids = np.flatnonzero(shared >= need)
+            dice = 2 * shared[ids] / (q + self.key_sizes[ids])
+            keep = dice >= threshold
+            scores.update(zip(ids[keep].tolist(), dice[keep].tolist()))
+            # A key containing the whole query shares all q of its bigrams
+            for kid in np.flatnonzero(shared == q).tolist():
+                if name in self.keys[kid]:
+                    scores[kid] = self._substring_score(name, self.keys[kid])
+
+        # Keys contained in the query, however short, take the substring score
+        for kid in self._contained(name):
+            scores[kid] = self._substring_score(name, self.keys[kid])
+
+        best_key, best_score = None, 0.0
+        for kid in sorted(scores):
+            if scores[kid] > best_score:
+                best_score, best_key = scores[kid], self.keys[kid]
+        return best_key, best_score
+
+
+_INGREDIENT_INDEX = _BigramIndex(INGREDIENT_DB)
+
+
 def fuzzy_match(name: str, threshold: float = 0.45) -> Optional[str]:
     """Return best-matching key from INGREDIENT_DB, or None if below threshold."""
     name = name.lower().strip()
     if name in INGREDIENT_DB:
         return name
-    best_key, best_score = None, 0.0
-    for key in INGREDIENT_DB:
-        # Substring shortcut — fast path
-        if name in key or key in name:
-            # Prefer shorter, more specific keys
-            score = 0.75 + 0.25 * (min(len(name), len(key)) / max(len(name), len(key)))
-        else:
-            score = _dice(name, key)
-        if score > best_score:
-            best_score, best_key = score, key
+    best_key, best_score = _INGREDIENT_INDEX.best_match(name, threshold)
     return best_key if best_score >= threshold else None
 
 
@@ -711,7 +816,7 @@ def fuzzy_match(name: str, threshold: float = 0.45) -> Optional[str]:
 # 8.  INGREDIENT PARSER
 # ─────────────────────────────────────────────────────────────────────────────
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ParsedIngredient:
     name: str             # raw token
     matched_key: Optional[str]
@@ -764,57 +869,258 @@ def parse_ingredients(text: str) -> list[ParsedIngredient]:
 # 9.  COOKING METHOD & DISH DETECTION
 # ─────────────────────────────────────────────────────────────────────────────
 
+class _PhraseIndex:
+    """
+    Aho-Corasick automaton over every dish key, alias, category keyword and
+    cooking phrase, compiled once per table set.
+
+    `find` reports all phrases occurring in a text in one pass; the resolver
+    methods then apply the same longest-match and priority rules the old
+    per-table substring scans used, including their tie-breaks on table order.
+    """
+
+    def __init__(self) -> None:
+        self.goto: list[dict[str, int]] = [{}]
+        self.fail: list[int] = [0]
+        self.out: list[tuple[str, ...]] = [()]
+
+        # Ranks reproduce the old scan orders: longest first, then table order
+        self.cooking_rank = {
+            p: r for r, p in enumerate(sorted(COOKING_MULTIPLIERS, key=lambda p: -len(p)))
+        }
+        self.template_rank = {
+            k: r for r, k in enumerate(sorted(DISH_TEMPLATES, key=lambda k: -len(k)))
+        }
+        self.alias_rank = {
+            a: r for r, a in enumerate(sorted(DISH_ALIASES, key=lambda a: -len(a)))
+            if DISH_ALIASES[a] in DISH_TEMPLATES
+        }
+        self.template_order = {k: i for i, k in enumerate(DISH_TEMPLATES)}
+        self.alias_order = {a: i for i, a in enumerate(DISH_ALIASES)}
+        self.category_of: dict[str, int] = {}
+        for i, keywords in enumerate(CATEGORY_KEYWORDS.values()):
+            for kw in keywords:
+                self.category_of.setdefault(kw, i)
+        self.categories = list(CATEGORY_KEYWORDS)
+
+        phrases = (
+            set(self.cooking_rank) | set(self.template_order)
+            | set(self.alias_order) | set(self.category_of)
+        )
+        for phrase in phrases:
+            self._add(phrase)
+        self._link()
+
+    def _add(self, phrase: str) -> None:
+        state = 0
+        for ch in phrase:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(())
+            state = nxt
+        self.out[state] += (phrase,)
+
+    def _link(self) -> None:
+        # Breadth-first failure links; each state inherits its fallback's outputs
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for ch, nxt in self.goto[state].items():
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] += self.out[self.fail[nxt]]
+                queue.append(nxt)
+
+    def find(self, text: str) -> set[str]:
+        """Return every known phrase that occurs as a substring of text."""
+        goto, fail, out = self.goto, self.fail, self.out
+        found: set[str] = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+    def cooking_multiplier(self, found: set[str]) -> float:
+        hits = [p for p in found if p in self.cooking_rank]
+        if not hits:
+            return 1.0
+        return COOKING_MULTIPLIERS[min(hits, key=self.cooking_rank.__getitem__)]
+
+    def dish(self, found: set[str]) -> Optional[str]:
+        # Direct template key first — longest match wins (more specific)
+        hits = [k for k in found if k in self.template_rank]
+        if hits:
+            return min(hits, key=self.template_rank.__getitem__)
+        # Alias as fallback — longest alias first to prefer specific over generic
+        hits = [a for a in found if a in self.alias_rank]
+        if hits:
+            return DISH_ALIASES[min(hits, key=self.alias_rank.__getitem__)]
+        return None
+
+    def dishes(self, found: set[str]) -> list[str]:
+        """Every template hit plus every alias hit's canonical, in table order."""
+        templates = sorted(
+            (k for k in found if k in self.template_order), key=self.template_order.__getitem__
+        )
+        aliases = sorted(
+            (a for a in found if a in self.alias_rank), key=self.alias_order.__getitem__
+        )
+        return templates + [DISH_ALIASES[a] for a in aliases]
+
+    def category(self, found: set[str]) -> str:
+        hits = [self.category_of[kw] for kw in found if kw in self.category_of]
+        return self.categories[min(hits)] if hits else "default"
+
+
+_PHRASE_INDEX = _PhraseIndex()
+
+
 def _detect_cooking_method(text: str) -> float:
     """Return calorie multiplier based on cooking method keywords."""
-    text = text.lower()
-    for phrase, mult in sorted(COOKING_MULTIPLIERS.items(), key=lambda kv: -len(kv[0])):
-        if phrase in text:
-            return mult
-    return 1.0
+    return _PHRASE_INDEX.cooking_multiplier(_PHRASE_INDEX.find(text.lower()))
 
 
 def _detect_dish(text: str) -> Optional[str]:
     """Return best dish template key if description matches a known dish."""
-    text = _clean_text(text)
-    # Direct template key lookup first — longest match wins (more specific)
-    matches = [(key, len(key)) for key in DISH_TEMPLATES if key in text]
-    if matches:
-        return max(matches, key=lambda x: x[1])[0]
-    # Alias lookup as fallback — longest alias first to prefer specific over generic
-    for alias, canonical in sorted(DISH_ALIASES.items(), key=lambda kv: -len(kv[0])):
-        if alias in text and canonical in DISH_TEMPLATES:
-            return canonical
-    return None
+    return _PHRASE_INDEX.dish(_PHRASE_INDEX.find(_clean_text(text)))
 
 
 def _detect_category(text: str) -> str:
-    text = text.lower()
-    for cat, keywords in CATEGORY_KEYWORDS.items():
-        if any(kw in text for kw in keywords):
-            return cat
-    return "default"
+    return _PHRASE_INDEX.category(_PHRASE_INDEX.find(text.lower()))
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # 10.  MACRO CALCULATOR
 # ─────────────────────────────────────────────────────────────────────────────
 
-def _calc_from_ingredients(
-    ingredients: list[tuple[str, float]],  # (ingredient_key, grams)
+MACRO_FIELDS: tuple[str, ...] = ("cal", "pro", "carb", "fat", "fiber")
+
+
+class _MacroTable:
+    """
+    INGREDIENT_DB as a dense (ingredients × MACRO_FIELDS) matrix with an
+    integer id map, plus every DISH_TEMPLATES total computed once at load.
+
+    Sums run row by row in input order, so totals are bit-for-bit the values
+    the old per-field Python loop produced.
+    """
+
+    def __init__(self) -> None:
+        store_matrix = getattr(INGREDIENT_DB, "macro_matrix", None)
+        if store_matrix is not None:
+            # Compiled FoodStore: gather straight from the mapped float32 columns
+            self.ids = INGREDIENT_DB.ids
+            self.matrix = store_matrix
+            self.decimals: Optional[int] = INGREDIENT_DB.decimals
+        else:
+            self.ids = {k: i for i, k in enumerate(INGREDIENT_DB)}
+            self.decimals = None
+            self.matrix = np.array(
+                [[info[f] for f in MACRO_FIELDS] for info in INGREDIENT_DB.values()],
+                dtype=np.float64,
+            ).reshape(-1, len(MACRO_FIELDS))
+        self.templates: dict[str, np.ndarray] = {
+            key: self.totals(items) for key, items in DISH_TEMPLATES.items()
+        }
+
+    def rows(self, ids: np.ndarray) -> np.ndarray:
+        """float64 macro rows for the given ids."""
+        rows = self.matrix[ids]
+        if self.decimals is not None:
+            # float32 store values snapped back to their source decimals, so
+            # sums match what the same table would give as float64
+            rows = np.round(rows.astype(np.float64), self.decimals)
+        return rows
+
+    def gather(self, ingredients: list[tuple[str, float]]) -> tuple[np.ndarray, np.ndarray]:
+        """Map (ingredient_key, grams) pairs to row ids; unknown keys are dropped."""
+        ids, grams = [], []
+        for key, g in ingredients:
+            kid = self.ids.get(key)
+            if kid is not None:
+                ids.append(kid)
+                grams.append(g)
+        return np.asarray(ids, dtype=np.intp), np.asarray(grams, dtype=np.float64)
+
+    def totals(self, ingredients: list[tuple[str, float]]) -> np.ndarray:
+        """Unrounded, uncooked macro vector for an ingredient list."""
+        ids, grams = self.gather(ingredients)
+        return (self.rows(ids) * (grams / 100.0)[:, None]).sum(axis=0)
+
+    def totals_many(self, groups: list[list[tuple[str, float]]]) -> np.ndarray:
+        """Unrounded, uncooked macro vectors (one row per group) in one pass."""
+        ids, grams, owners = [], [], []
+        for row, ingredients in enumerate(groups):
+            for key, g in ingredients:
+                kid = self.ids.get(key)
+                if kid is not None:
+                    ids.append(kid)
+                    grams.append(g)
+                    owners.append(row)
+        weighted = self.rows(np.asarray(ids, dtype=np.intp)) * (
+            np.asarray(grams, dtype=np.float64) / 100.0
+        )[:, None]
+        owner_ids = np.asarray(owners, dtype=np.intp)
+        return np.stack(
+            [
+                np.bincount(owner_ids, weights=weighted[:, j], minlength=len(groups))
+                for j in range(len(MACRO_FIELDS))
+            ],
+            axis=1,
+        )
+
+
+_MACRO_TABLE = _MacroTable()
+
+
+def rebuild_indexes() -> None:
+    """
+    Recompile every structure derived from the ingredient and dish tables
+    (fuzzy-match index, phrase automaton, macro matrix, template totals)
+    and drop every cached estimate.
+    Call after INGREDIENT_DB, DISH_TEMPLATES, DISH_ALIASES,
+    CATEGORY_KEYWORDS or COOKING_MULTIPLIERS are modified.
+    """
+    global _INGREDIENT_INDEX, _PHRASE_INDEX, _MACRO_TABLE
+    _INGREDIENT_INDEX = _BigramIndex(INGREDIENT_DB)
+    _PHRASE_INDEX = _PhraseIndex()
+    _MACRO_TABLE = _MacroTable()
+    # Cached estimates were computed against the old tables
+    _RESULT_CACHE.clear()
+
+
+def load_food_store(path: str) -> int:
+    """
+    Replace INGREDIENT_DB and INGREDIENT_UNIT_OVERRIDES with a compiled,
+    memory-mapped food table (see app.services.food_store) and rebuild the
+    derived indexes.  Returns the number of foods loaded.
+    """
+    global INGREDIENT_DB, INGREDIENT_UNIT_OVERRIDES
+    from app.services.food_store import FoodStore
+
+    store = FoodStore(path)
+    if store.fields != MACRO_FIELDS:
+        raise ValueError(f"Food table fields {store.fields} do not match {MACRO_FIELDS}")
+    INGREDIENT_DB = store
+    INGREDIENT_UNIT_OVERRIDES = store.unit_overrides
+    rebuild_indexes()
+    return len(store)
+
+
+def _round_macros(
+    totals: np.ndarray,
     cooking_mult: float = 1.0,
 ) -> tuple[float, float, float, float, float]:
-    """Return (cal, pro, carb, fat, fiber) for ingredient list."""
-    cal = pro = carb = fat = fiber = 0.0
-    for key, grams in ingredients:
-        info = INGREDIENT_DB.get(key)
-        if not info:
-            continue
-        f = grams / 100.0
-        cal   += info["cal"]   * f
-        pro   += info["pro"]   * f
-        carb  += info["carb"]  * f
-        fat   += info["fat"]   * f
-        fiber += info["fiber"] * f
+    cal, pro, carb, fat, fiber = totals.tolist()
     return (
         round(cal * cooking_mult, 1),
         round(pro, 1),
@@ -824,6 +1130,14 @@ def _calc_from_ingredients(
     )
 
 
+def _calc_from_ingredients(
+    ingredients: list[tuple[str, float]],  # (ingredient_key, grams)
+    cooking_mult: float = 1.0,
+) -> tuple[float, float, float, float, float]:
+    """Return (cal, pro, carb, fat, fiber) for ingredient list."""
+    return _round_macros(_MACRO_TABLE.totals(ingredients), cooking_mult)
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # 11.  CONFIDENCE SCORING
 # ─────────────────────────────────────────────────────────────────────────────
@@ -846,7 +1160,7 @@ def _score_confidence(parsed: list[ParsedIngredient]) -> float:
 # 12.  MAIN ENTRY POINT
 # ─────────────────────────────────────────────────────────────────────────────
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class NutritionResult:
     calories:  float
     protein_g: float
@@ -855,11 +1169,295 @@ class NutritionResult:
     fiber_g:   float
     confidence: float           # 0–1  (≥0.7 = reliable, <0.4 = fallback used)
     method:    str              # "template" | "parsed" | "fallback" | "hybrid"
-    ingredients: list[ParsedIngredient] = field(default_factory=list)
+    ingredients: tuple[ParsedIngredient, ...] = ()
     dish_matched: Optional[str] = None
 
+    def scaled(self, servings: float) -> NutritionEstimate:
+        """This result at `servings` portions; itself when servings == 1."""
+        return self if servings == 1.0 else ScaledNutrition(self, servings)
+
+
+class ScaledNutrition:
+    """
+    Read-only view of a per-serving NutritionResult at a number of servings.
+
+    Holds only the base result and the factor; macros are scaled and rounded
+    (as the per-serving engine rounds) when read, so cached results are
+    shared without copying.
+    """
+
+    __slots__ = ("base", "servings")
+
+    def __init__(self, base: NutritionResult, servings: float) -> None:
+        object.__setattr__(self, "base", base)
+        object.__setattr__(self, "servings", servings)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    @property
+    def calories(self) -> float:
+        return round(self.base.calories * self.servings, 1)
+
+    @property
+    def protein_g(self) -> float:
+        return round(self.base.protein_g * self.servings, 1)
+
+    @property
+    def carbs_g(self) -> float:
+        return round(self.base.carbs_g * self.servings, 1)
+
+    @property
+    def fat_g(self) -> float:
+        return round(self.base.fat_g * self.servings, 1)
+
+    @property
+    def fiber_g(self) -> float:
+        return round(self.base.fiber_g * self.servings, 1)
+
+    @property
+    def confidence(self) -> float:
+        return self.base.confidence
+
+    @property
+    def method(self) -> str:
+        return self.base.method
+
+    @property
+    def ingredients(self) -> tuple[ParsedIngredient, ...]:
+        return self.base.ingredients
+
+    @property
+    def dish_matched(self) -> Optional[str]:
+        return self.base.dish_matched
+
+    def scaled(self, servings: float) -> NutritionEstimate:
+        return self if servings == 1.0 else ScaledNutrition(self.base, self.servings * servings)
+
+    def __repr__(self) -> str:
+        return f"ScaledNutrition({self.base!r}, servings={self.servings!r})"
+
+
+# What the public entry points return: a cached result or a scaled view of one
+NutritionEstimate = Union[NutritionResult, ScaledNutrition]
+
+
+# ── JSON serialisation ───────────────────────────────────────────────────────
+# Writes the response body straight from the slots, skipping the
+# intermediate dicts a JSONResponse would build and re-walk.
+
+_json_str = json.encoder.encode_basestring_ascii
+
+
+def _json_num(v: float) -> str:
+    v = float(v)
+    return repr(v) if math.isfinite(v) else "null"
+
+
+def _json_opt_str(v: Optional[str]) -> str:
+    return "null" if v is None else _json_str(v)
+
+
+def _ingredient_json(ing: ParsedIngredient) -> str:
+    return (
+        f'{{"name":{_json_str(ing.name)},'
+        f'"matched_key":{_json_opt_str(ing.matched_key)},'
+        f'"amount_g":{_json_num(ing.amount_g)},'
+        f'"confidence":{_json_num(ing.confidence)}}}'
+    )
+
+
+def _estimate_json(result: NutritionEstimate) -> str:
+    ingredients = ",".join(_ingredient_json(ing) for ing in result.ingredients)
+    return (
+        f'{{"calories":{_json_num(result.calories)},'
+        f'"protein_g":{_json_num(result.protein_g)},'
+        f'"carbs_g":{_json_num(result.carbs_g)},'
+        f'"fat_g":{_json_num(result.fat_g)},'
+        f'"fiber_g":{_json_num(result.fiber_g)},'
+        f'"confidence":{_json_num(result.confidence)},'
+        f'"method":{_json_str(result.method)},'
+        f'"dish_matched":{_json_opt_str(result.dish_matched)},'
+        f'"ingredients":[{ingredients}]}}'
+    )
+
+
+def nutrition_json(result: NutritionEstimate) -> bytes:
+    """Serialise one estimate to a JSON object (as bytes)."""
+    return _estimate_json(result).encode("ascii")
+
+
+def nutrition_batch_json(results: list[NutritionEstimate]) -> bytes:
+    """Serialise estimates to {"results": [...]} (as bytes)."""
+    return ('{"results":[' + ",".join(map(_estimate_json, results)) + "]}").encode("ascii")
+
+
+class _ResultCache:
+    """
+    Bounded LRU cache with a TTL for per-serving rule-engine results, keyed
+    on the cleaned description text.  Servings are applied on read, so one
+    entry serves every portion size.  Thread-safe.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: float) -> None:
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[str, tuple[float, NutritionResult]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key: str) -> Optional[NutritionResult]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, result = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: str, result: NutritionResult) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), result)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size":        len(self._data),
+                "maxsize":     self.maxsize,
+                "ttl_seconds": self.ttl_seconds,
+                "hits":        self.hits,
+                "misses":      self.misses,
+                "evictions":   self.evictions,
+                "expirations": self.expirations,
+                "hit_rate":    round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+# Sized from NUTRITION_RESULT_CACHE_* at start-up; until then (scripts,
+# benchmarks) it keeps nothing
+_RESULT_CACHE = _ResultCache(0, 0.0)
+
 
-def estimate_nutrition(description: str, servings: float = 1.0) -> NutritionResult:
+def configure_result_cache(maxsize: int, ttl_seconds: float) -> None:
+    """Replace the rule-engine result cache with an empty one of this size and TTL."""
+    global _RESULT_CACHE
+    _RESULT_CACHE = _ResultCache(maxsize, ttl_seconds)
+
+
+def result_cache_stats() -> dict:
+    """Size and hit/miss/eviction counters of the rule-engine result cache."""
+    return _RESULT_CACHE.stats()
+
+
+def _estimate_rule_batch(texts: list[str]) -> list[NutritionResult]:
+    """
+    Rule-based estimates for cleaned, non-empty texts at one serving each.
+
+    Text analysis (phrase scan, ingredient parsing) runs per text; the macro
+    arithmetic for every template and parsed hit in the batch is then done
+    with one set of matrix operations.
+    """
+    results: list[Optional[NutritionResult]] = [None] * len(texts)
+    tpl_rows: list[tuple[int, str, float]] = []                            # (row, dish_key, mult)
+    parsed_rows: list[tuple[int, list[ParsedIngredient], float, float]] = []  # (row, parsed, mult, conf)
+    parsed_groups: list[list[tuple[str, float]]] = []
+
+    for i, text in enumerate(texts):
+        # One automaton pass finds every dish, alias, category and cooking phrase
+        found = _PHRASE_INDEX.find(text)
+        cooking_mult = _PHRASE_INDEX.cooking_multiplier(found)
+
+        # ── Path 1: dish template ────────────────────────────────────────────
+        dish_key = _PHRASE_INDEX.dish(found)
+        if dish_key:
+            tpl_rows.append((i, dish_key, cooking_mult))
+            continue
+
+        # ── Path 2: ingredient parsing ───────────────────────────────────────
+        parsed = parse_ingredients(text)
+        resolved = [(p.matched_key, p.amount_g) for p in parsed if p.matched_key]
+        if resolved:
+            conf = _score_confidence(parsed)
+            if conf >= 0.35:
+                parsed_rows.append((i, parsed, cooking_mult, conf))
+                parsed_groups.append(resolved)
+                continue
+
+        # ── Path 3: category fallback ────────────────────────────────────────
+        category = _PHRASE_INDEX.category(found)
+        fb = CATEGORY_FALLBACKS.get(category, CATEGORY_FALLBACKS["default"])
+        results[i] = NutritionResult(
+            *[round(float(v), 1) for v in fb],
+            confidence = 0.25,
+            method     = "fallback",
+            ingredients = tuple(parsed),
+        )
+
+    # Template totals are precomputed — only the cooking multiplier applies
+    if tpl_rows:
+        totals = np.stack([_MACRO_TABLE.templates[key] for _, key, _ in tpl_rows])
+        for (i, key, mult), row in zip(tpl_rows, totals):
+            cal, pro, carb, fat, fiber = _round_macros(row, mult)
+            results[i] = NutritionResult(
+                calories   = cal,
+                protein_g  = pro,
+                carbs_g    = carb,
+                fat_g      = fat,
+                fiber_g    = fiber,
+                confidence = 0.82,
+                method     = "template",
+                dish_matched = key,
+            )
+
+    if parsed_rows:
+        totals = _MACRO_TABLE.totals_many(parsed_groups)
+        for (i, parsed, mult, conf), row in zip(parsed_rows, totals):
+            cal, pro, carb, fat, fiber = _round_macros(row, mult)
+            results[i] = NutritionResult(
+                calories   = cal,
+                protein_g  = pro,
+                carbs_g    = carb,
+                fat_g      = fat,
+                fiber_g    = fiber,
+                confidence = conf,
+                method     = "parsed",
+                ingredients = tuple(parsed),
+            )
+
+    return results
+
+
+def _estimate_rule_cached(texts: list[str]) -> list[NutritionResult]:
+    """_estimate_rule_batch behind the result cache; only misses are computed."""
+    results = [_RESULT_CACHE.get(text) for text in texts]
+    misses = [i for i, r in enumerate(results) if r is None]
+    if misses:
+        fresh = _estimate_rule_batch([texts[i] for i in misses])
+        for i, result in zip(misses, fresh):
+            _RESULT_CACHE.put(texts[i], result)
+            results[i] = result
+    return results
+
+
+def estimate_nutrition(description: str, servings: float = 1.0) -> NutritionEstimate:
     """
     Estimate nutrition for a meal description.
 
@@ -873,107 +1471,50 @@ def estimate_nutrition(description: str, servings: float = 1.0) -> NutritionResu
         return NutritionResult(*[v * servings for v in fb],
                                confidence=0.1, method="fallback")
 
-    text = _clean_text(description)
-    cooking_mult = _detect_cooking_method(text)
-
-    # ── Path 1: dish template ────────────────────────────────────────────────
-    dish_key = _detect_dish(text)
-    if dish_key:
-        template = DISH_TEMPLATES[dish_key]
-        cal, pro, carb, fat, fiber = _calc_from_ingredients(template, cooking_mult)
-        # Scale to servings
-        return NutritionResult(
-            calories   = round(cal   * servings, 1),
-            protein_g  = round(pro   * servings, 1),
-            carbs_g    = round(carb  * servings, 1),
-            fat_g      = round(fat   * servings, 1),
-            fiber_g    = round(fiber * servings, 1),
-            confidence = 0.82,
-            method     = "template",
-            dish_matched = dish_key,
-        )
-
-    # ── Path 2: ingredient parsing ───────────────────────────────────────────
-    parsed = parse_ingredients(text)
-    if parsed:
-        resolved = [(p.matched_key, p.amount_g) for p in parsed if p.matched_key]
-        if resolved:
-            cal, pro, carb, fat, fiber = _calc_from_ingredients(resolved, cooking_mult)
-            conf = _score_confidence(parsed)
-            if conf >= 0.35:
-                return NutritionResult(
-                    calories   = round(cal   * servings, 1),
-                    protein_g  = round(pro   * servings, 1),
-                    carbs_g    = round(carb  * servings, 1),
-                    fat_g      = round(fat   * servings, 1),
-                    fiber_g    = round(fiber * servings, 1),
-                    confidence = conf,
-                    method     = "parsed",
-                    ingredients = parsed,
-                )
-
-    # ── Path 3: category fallback ────────────────────────────────────────────
-    category = _detect_category(text)
-    fb = CATEGORY_FALLBACKS.get(category, CATEGORY_FALLBACKS["default"])
-    return NutritionResult(
-        calories   = round(fb[0] * servings, 1),
-        protein_g  = round(fb[1] * servings, 1),
-        carbs_g    = round(fb[2] * servings, 1),
-        fat_g      = round(fb[3] * servings, 1),
-        fiber_g    = round(fb[4] * servings, 1),
-        confidence = 0.25,
-        method     = "fallback",
-        ingredients = parsed,
-    )
+    return _estimate_rule_cached([_clean_text(description)])[0].scaled(servings)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # 13.  SMART SUGGESTIONS  (history-based)
 # ─────────────────────────────────────────────────────────────────────────────
 
-def suggest_dishes(history: list[str], limit: int = 5) -> list[str]:
-    """
-    Rank dish suggestions by:
-      1. Frequency in user history
-      2. Most common dishes globally (fallback)
-    """
-    freq: dict[str, int] = {}
-    for desc in history:
-        text = _clean_text(desc)
-        for key in DISH_TEMPLATES:
-            if key in text:
-                freq[key] = freq.get(key, 0) + 1
-        for alias, canonical in DISH_ALIASES.items():
-            if alias in text and canonical in DISH_TEMPLATES:
-                freq[canonical] = freq.get(canonical, 0) + 1
-
-    # Default popularity ranking (most common globally)
-    DEFAULT_POPULAR = [
-        "chicken rice", "fried rice", "pasta bolognese", "grilled chicken",
-        "scrambled eggs", "oatmeal", "chicken stir fry", "caesar salad",
-        "eggs on toast", "chicken soup",
-    ]
+# Default popularity ranking (most common globally)
+POPULAR_DISHES: tuple[str, ...] = (
+    "chicken rice", "fried rice", "pasta bolognese", "grilled chicken",
+    "scrambled eggs", "oatmeal", "chicken stir fry", "caesar salad",
+    "eggs on toast", "chicken soup",
+)
+
+
+def dishes_in(description: str) -> list[str]:
+    """Dish template keys mentioned in a description (alias hits canonicalised)."""
+    return _PHRASE_INDEX.dishes(_PHRASE_INDEX.find(_clean_text(description)))
+
 
+def fill_suggestions(ranked: list[str], limit: int = 5) -> list[str]:
+    """Take history-ranked dishes first, then pad with POPULAR_DISHES."""
     seen: set[str] = set()
     result: list[str] = []
-
-    # History-driven suggestions first
-    for dish in sorted(freq, key=lambda k: -freq[k]):
+    for dish in (*ranked, *POPULAR_DISHES):
         if dish not in seen:
             result.append(dish)
             seen.add(dish)
         if len(result) == limit:
-            return result
+            break
+    return result
 
-    # Fill remainder with popular defaults
-    for dish in DEFAULT_POPULAR:
-        if dish not in seen:
-            result.append(dish)
-            seen.add(dish)
-        if len(result) == limit:
-            return result
 
-    return result
+def suggest_dishes(history: list[str], limit: int = 5) -> list[str]:
+    """
+    Rank dish suggestions by:
+      1. Frequency in user history
+      2. Most common dishes globally (fallback)
+    """
+    freq: dict[str, int] = {}
+    for desc in history:
+        for dish in dishes_in(desc):
+            freq[dish] = freq.get(dish, 0) + 1
+    return fill_suggestions(sorted(freq, key=lambda k: -freq[k]), limit)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -999,101 +1540,176 @@ Respond ONLY with valid JSON matching this schema exactly:
 }"""
 
 
+_GPT_MODEL = "gpt-4o-mini"
+
+# Persistent GPT answer cache, created on first use (needs app settings)
+_GPT_CACHE = None
+
+
+def _gpt_cache():
+    global _GPT_CACHE
+    if _GPT_CACHE is None:
+        from app.core.cache import PersistentCache
+        from app.core.config import settings
+        _GPT_CACHE = PersistentCache(
+            namespace=f"alfred:nutrition:{_GPT_MODEL}:v1",
+            ttl_seconds=settings.GPT_CACHE_TTL_SECONDS,
+            negative_ttl_seconds=settings.GPT_CACHE_NEGATIVE_TTL_SECONDS,
+            sqlite_path=settings.GPT_CACHE_SQLITE_PATH,
+        )
+    return _GPT_CACHE
+
+
+def gpt_cache_stats() -> dict:
+    """Hit/miss/coalescing counters of the GPT fallback cache (empty until used)."""
+    return _GPT_CACHE.stats() if _GPT_CACHE is not None else {}
+
+
+def _gpt_text(v) -> Optional[str]:
+    """A GPT answer's string field as str, whatever JSON type it came back as."""
+    return None if v is None else str(v)
+
+
+def _result_from_gpt(data: dict) -> NutritionResult:
+    """Build a NutritionResult from a GPT JSON answer (1 serving)."""
+    ingredients = []
+    for ing in data.get("ingredients", []):
+        name = _gpt_text(ing.get("name")) or ""
+        ingredients.append(ParsedIngredient(
+            name=name,
+            matched_key=fuzzy_match(name),
+            amount_g=float(ing.get("amount_g", 100)),
+            confidence=0.5,
+        ))
+
+    return NutritionResult(
+        calories     = round(float(data.get("calories",  0)), 1),
+        protein_g    = round(float(data.get("protein_g", 0)), 1),
+        carbs_g      = round(float(data.get("carbs_g",   0)), 1),
+        fat_g        = round(float(data.get("fat_g",     0)), 1),
+        fiber_g      = round(float(data.get("fiber_g",   0)), 1),
+        confidence   = 0.65,
+        method       = "ai",
+        dish_matched = _gpt_text(data.get("dish_name")),
+        ingredients  = tuple(ingredients),
+    )
+
+
 async def _gpt_nutrition(description: str) -> Optional[NutritionResult]:
     """
     Ask GPT-4o-mini for nutrition of an unknown dish (1 serving).
     Returns None if the API key is missing or the call fails.
+
+    Answers are cached persistently by cleaned description, failures are
+    negatively cached for a short while, and concurrent identical misses
+    share one outbound call.
     """
     import json as _json
     try:
-        from openai import AsyncOpenAI
         from app.core.config import settings
+        from app.core.llm_client import get_llm_client
         from app.core.logging import logger
+        cache = _gpt_cache()
     except ImportError:
         return None
 
     if not getattr(settings, "OPENAI_API_KEY", None):
         return None
 
-    try:
-        client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-        resp = await client.chat.completions.create(
-            model="gpt-4o-mini",
-            response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": _GPT_SYSTEM},
-                {"role": "user",   "content": f'Meal: "{description}"'},
-            ],
-            max_tokens=400,
-            temperature=0.1,
-        )
-        data = _json.loads(resp.choices[0].message.content)
-
-        ingredients = [
-            ParsedIngredient(
-                name=ing.get("name", ""),
-                matched_key=fuzzy_match(ing.get("name", "")),
-                amount_g=float(ing.get("amount_g", 100)),
-                confidence=0.5,
-            )
-            for ing in data.get("ingredients", [])
-        ]
-
-        return NutritionResult(
-            calories     = round(float(data.get("calories",  0)), 1),
-            protein_g    = round(float(data.get("protein_g", 0)), 1),
-            carbs_g      = round(float(data.get("carbs_g",   0)), 1),
-            fat_g        = round(float(data.get("fat_g",     0)), 1),
-            fiber_g      = round(float(data.get("fiber_g",   0)), 1),
-            confidence   = 0.65,
-            method       = "ai",
-            dish_matched = data.get("dish_name"),
-            ingredients  = ingredients,
-        )
-    except Exception as exc:
+    async def _fetch() -> Optional[dict]:
         try:
-            logger.warning(f"GPT nutrition fallback failed: {exc}")
-        except Exception:
-            pass
-        return None
+            resp = await get_llm_client().chat.completions.create(
+                model=_GPT_MODEL,
+                response_format={"type": "json_object"},
+                messages=[
+                    {"role": "system", "content": _GPT_SYSTEM},
+                    {"role": "user",   "content": f'Meal: "{description}"'},
+                ],
+                max_tokens=400,
+                temperature=0.1,
+            )
+            data = _json.loads(resp.choices[0].message.content)
+            _result_from_gpt(data)  # reject malformed answers before caching
+            return data
+        except Exception as exc:
+            try:
+                logger.warning(f"GPT nutrition fallback failed: {exc}")
+            except Exception:
+                pass
+            return None
+
+    data = await cache.get_or_fetch(_clean_text(description).strip(), _fetch)
+    return _result_from_gpt(data) if data is not None else None
+
+
+async def _rule_estimates(texts: list[str]) -> list[NutritionResult]:
+    """_estimate_rule_cached, run on the nutrition executor when one is started."""
+    try:
+        from app.services.nutrition_executor import get_nutrition_executor
+        executor = get_nutrition_executor()
+    except ImportError:
+        executor = None
+    if executor is None:
+        return _estimate_rule_cached(texts)
+    return await executor.estimate(texts)
+
+
+# Upper bound on concurrent GPT calls issued by one batch
+_GPT_BATCH_CONCURRENCY = 8
+
+
+async def estimate_nutrition_batch(
+    descriptions: list[str],
+    servings: Union[float, list[float]] = 1.0,
+) -> list[NutritionEstimate]:
+    """
+    Estimate many meal descriptions at once; results keep the input order.
+
+    Descriptions are cleaned and deduplicated, the rule-based engine runs
+    once over the unique texts, and only the low-confidence leftovers
+    (method == 'fallback') are sent to GPT, concurrently.  `servings` is
+    either one value for every item or a list aligned with `descriptions`.
+    """
+    if isinstance(servings, (int, float)):
+        per_item = [float(servings)] * len(descriptions)
+    else:
+        per_item = list(servings)
+        if len(per_item) != len(descriptions):
+            raise ValueError("servings must be a number or match descriptions in length")
+
+    keys = [_clean_text(d) if d else "" for d in descriptions]
+    first_seen: dict[str, int] = {}
+    for i, key in enumerate(keys):
+        first_seen.setdefault(key, i)
+
+    texts = [key for key in first_seen if key]
+    base = dict(zip(texts, await _rule_estimates(texts)))
+    if "" in first_seen:
+        base[""] = estimate_nutrition("")
+
+    leftovers = [key for key, result in base.items() if result.method == "fallback"]
+    if leftovers:
+        semaphore = asyncio.Semaphore(_GPT_BATCH_CONCURRENCY)
+
+        async def _ask(key: str) -> Optional[NutritionResult]:
+            async with semaphore:
+                return await _gpt_nutrition(descriptions[first_seen[key]])
+
+        answers = await asyncio.gather(*(_ask(key) for key in leftovers))
+        for key, gpt in zip(leftovers, answers):
+            if gpt:
+                base[key] = gpt
+
+    return [base[key].scaled(s) for key, s in zip(keys, per_item)]
 
 
 async def estimate_nutrition_async(
     description: str,
     servings: float = 1.0,
-) -> NutritionResult:
+) -> NutritionEstimate:
     """
     Async entry point used by the meals endpoint.
     Runs the rule-based engine first; falls back to GPT only when
     confidence is too low (method == 'fallback').
     """
-    result = estimate_nutrition(description, servings=1.0)
-
-    if result.method == "fallback":
-        gpt = await _gpt_nutrition(description)
-        if gpt:
-            return NutritionResult(
-                calories     = round(gpt.calories   * servings, 1),
-                protein_g    = round(gpt.protein_g  * servings, 1),
-                carbs_g      = round(gpt.carbs_g    * servings, 1),
-                fat_g        = round(gpt.fat_g      * servings, 1),
-                fiber_g      = round(gpt.fiber_g    * servings, 1),
-                confidence   = gpt.confidence,
-                method       = gpt.method,
-                dish_matched = gpt.dish_matched,
-                ingredients  = gpt.ingredients,
-            )
-
-    # Rule-based path — apply servings scaling
-    # (estimate_nutrition was called with servings=1.0 above)
-    return NutritionResult(
-        calories     = round(result.calories   * servings, 1),
-        protein_g    = round(result.protein_g  * servings, 1),
-        carbs_g      = round(result.carbs_g    * servings, 1),
-        fat_g        = round(result.fat_g      * servings, 1),
-        fiber_g      = round(result.fiber_g    * servings, 1),
-        confidence   = result.confidence,
-        method       = result.method,
-        dish_matched = result.dish_matched,
-        ingredients  = result.ingredients,
-    )
+    return (await estimate_nutrition_batch([description], servings))[0]
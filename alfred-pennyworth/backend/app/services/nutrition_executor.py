@@ -0,0 +1,237 @@
+"""
+Runs the rule-based nutrition engine off the event loop.
+
+NUTRITION_EXECUTOR selects where estimates are computed:
+
+  inline   on the event loop, as before (scripts, debugging)
+  thread   a small thread pool; the loop stays responsive while the
+           regex/fuzzy work runs (NumPy sections release the GIL)
+  process  a spawn-based process pool whose workers import the engine and
+           map FOOD_STORE_PATH once at start-up, then stay warm
+
+Result-cache lookups stay on the loop; only misses are dispatched.  A miss
+goes out at once while a worker is idle.  When every worker is busy, misses
+queue (identical texts once) and leave as one job of at most
+NUTRITION_BATCH_MAX_ITEMS texts as soon as a worker frees up, or after
+NUTRITION_BATCH_WINDOW_MS at the latest.  Under load, many short requests
+share one round-trip, and a lone request never waits for the window.
+
+Process workers hold their own copy of the tables: call rebuild_indexes()
+or load_food_store() at runtime and they will not see it until restarted.
+"""
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.services import nutrition
+from app.services.nutrition import NutritionResult
+
+MODES = ("inline", "thread", "process")
+
+
+def _init_worker(food_store_path: str) -> None:
+    """Process-pool initializer: map the food table and compile the indexes."""
+    if food_store_path:
+        nutrition.load_food_store(food_store_path)
+    nutrition._estimate_rule_batch(["warm up"])
+
+
+def _run_batch(texts: list[str]) -> list[NutritionResult]:
+    return nutrition._estimate_rule_batch(texts)
+
+
+def _warm() -> bool:
+    return True
+
+
+class NutritionExecutor:
+    """Micro-batching dispatcher in front of an inline, thread or process pool."""
+
+    def __init__(
+        self,
+        mode: str = "thread",
+        workers: int = 2,
+        max_batch: int = 64,
+        window_ms: float = 2.0,
+        food_store_path: str = "",
+    ) -> None:
+        if mode not in MODES:
+            raise ValueError(f"NUTRITION_EXECUTOR must be one of {MODES}, got {mode!r}")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.max_batch = max(1, max_batch)
+        self.window_s = max(0.0, window_ms) / 1000.0
+        self.food_store_path = food_store_path
+        self._pool: Optional[Executor] = None
+        self._pending: dict[str, asyncio.Future] = {}
+        self._pending_since = 0.0
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.inflight_batches = self.inflight_items = 0
+        self.dispatches = self.items = self.coalesced = self.max_queue_depth = 0
+        self._wait_s = self._run_s = 0.0
+
+    # -- lifecycle ----------------------------------------------------------
+
+    async def start(self) -> None:
+        if self.mode == "thread":
+            self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="nutrition")
+        elif self.mode == "process":
+            self._pool = ProcessPoolExecutor(
+                self.workers,
+                # spawn, not fork: the parent already runs an event loop and threads
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.food_store_path,),
+            )
+            # One concurrent job per worker so every process starts (and warms) now
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(
+                *(loop.run_in_executor(self._pool, _warm) for _ in range(self.workers))
+            )
+        logger.info(f"Nutrition executor ready (mode={self.mode}, workers={self.workers})")
+
+    async def stop(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for fut in self._pending.values():
+            if not fut.done():
+                fut.set_exception(RuntimeError("nutrition executor stopped"))
+        self._pending = {}
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await asyncio.to_thread(pool.shutdown, True, cancel_futures=True)
+
+    # -- dispatch -----------------------------------------------------------
+
+    async def estimate(self, texts: list[str]) -> list[NutritionResult]:
+        """Per-serving rule estimates for cleaned texts (same as _estimate_rule_cached)."""
+        if self._pool is None:
+            return nutrition._estimate_rule_cached(texts)
+
+        cache = nutrition._RESULT_CACHE
+        results = [cache.get(text) for text in texts]
+        waiting: dict[str, asyncio.Future] = {}
+        for text, result in zip(texts, results):
+            if result is None and text not in waiting:
+                waiting[text] = self._enqueue(text)
+        if waiting:
+            # Shield: futures are shared with other requests in the same batch
+            done = await asyncio.gather(*(asyncio.shield(f) for f in waiting.values()))
+            fresh = dict(zip(waiting, done))
+            results = [r if r is not None else fresh[t] for t, r in zip(texts, results)]
+        return results
+
+    def _enqueue(self, text: str) -> asyncio.Future:
+        fut = self._pending.get(text)
+        if fut is not None:
+            self.coalesced += 1
+            return fut
+        loop = asyncio.get_running_loop()
+        if not self._pending:
+            self._pending_since = time.perf_counter()
+        fut = loop.create_future()
+        self._pending[text] = fut
+        self.max_queue_depth = max(self.max_queue_depth, len(self._pending))
+        if len(self._pending) >= self.max_batch or self.inflight_batches < self.workers:
+            self._dispatch()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window_s, self._dispatch)
+        return fut
+
+    def _dispatch(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending or self._pool is None:
+            return
+        batch, self._pending = self._pending, {}
+        texts = list(batch)
+        started = time.perf_counter()
+        self._wait_s += started - self._pending_since
+        self.dispatches += 1
+        self.items += len(texts)
+        self.inflight_batches += 1
+        self.inflight_items += len(texts)
+
+        job = asyncio.get_running_loop().run_in_executor(self._pool, _run_batch, texts)
+
+        def _complete(job: asyncio.Future) -> None:
+            self.inflight_batches -= 1
+            self.inflight_items -= len(texts)
+            self._run_s += time.perf_counter() - started
+            if self._pending:
+                # A worker just freed up; send whatever queued meanwhile
+                self._dispatch()
+            if job.cancelled():
+                exc: Optional[BaseException] = RuntimeError("nutrition job cancelled")
+            else:
+                exc = job.exception()
+            if exc is not None:
+                logger.error(f"Nutrition executor batch failed: {exc}")
+                for fut in batch.values():
+                    if not fut.done():
+                        fut.set_exception(exc)
+                return
+            for text, result in zip(texts, job.result()):
+                nutrition._RESULT_CACHE.put(text, result)
+                fut = batch[text]
+                if not fut.done():
+                    fut.set_result(result)
+
+        job.add_done_callback(_complete)
+
+    # -- metrics ------------------------------------------------------------
+
+    def stats(self) -> dict:
+        return {
+            "mode":              self.mode,
+            "workers":           self.workers if self._pool is not None else 0,
+            "queue_depth":       len(self._pending),
+            "max_queue_depth":   self.max_queue_depth,
+            "inflight_batches":  self.inflight_batches,
+            "inflight_items":    self.inflight_items,
+            "dispatches":        self.dispatches,
+            "items":             self.items,
+            "coalesced":         self.coalesced,
+            "avg_batch_size":    round(self.items / self.dispatches, 2) if self.dispatches else 0.0,
+            "avg_queue_wait_ms": round(self._wait_s * 1000 / self.dispatches, 3) if self.dispatches else 0.0,
+            "avg_run_ms":        round(self._run_s * 1000 / self.dispatches, 3) if self.dispatches else 0.0,
+        }
+
+
+_executor: Optional[NutritionExecutor] = None
+
+
+def get_nutrition_executor() -> Optional[NutritionExecutor]:
+    """The started executor, or None (estimates then run inline)."""
+    return _executor
+
+
+async def start_nutrition_executor() -> NutritionExecutor:
+    global _executor
+    executor = NutritionExecutor(
+        mode=settings.NUTRITION_EXECUTOR,
+        workers=settings.NUTRITION_EXECUTOR_WORKERS,
+        max_batch=settings.NUTRITION_BATCH_MAX_ITEMS,
+        window_ms=settings.NUTRITION_BATCH_WINDOW_MS,
+        food_store_path=settings.FOOD_STORE_PATH,
+    )
+    await executor.start()
+    _executor = executor
+    return executor
+
+
+async def stop_nutrition_executor() -> None:
+    global _executor
+    if _executor is not None:
+        executor, _executor = _executor, None
+        await executor.stop()
+
+
+def nutrition_executor_stats() -> dict:
+    return _executor.stats() if _executor is not None else {"mode": "inline"}
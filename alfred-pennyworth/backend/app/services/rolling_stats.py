@@ -0,0 +1,415 @@
+"""
+Streaming rolling statistics for the signal detector baselines.
+
+Every sleep, meal and activity write updates a per-user, per-day bucket in
+Redis in O(1):
+
+  sleep_quality, sleep_duration, meal_hour
+      Welford state (count, mean, M2) of the day's samples
+  daily_calories, daily_burn
+      the day's running total
+
+A baseline over the last PATTERN_DETECTION_WINDOW_DAYS calendar days
+(today included) merges at most that many buckets.  Sample metrics use
+Chan's parallel form of Welford; daily metrics run Welford over the day
+totals.  Buckets that fall out of the window are simply skipped and then
+deleted, so the window is exact to the day.  Nothing decays.
+
+Buckets live in one hash per user.  A user's hash is built from the
+database the first time it is read and rebuilt after
+ROLLING_STATS_RESEED_HOURS, when its marker key expires.  Each write runs
+as one Lua script, so concurrent writers never lose one another's
+updates, and is identified by its row ("m42" for meal 42), so none is
+counted twice:
+
+  * with the marker set, a write is applied unless its row is already in
+    the user's set of counted rows;
+  * while a build is running (its token set before it reads the tables)
+    a write is queued; the build then stores the hash, marks every row it
+    read as counted and replays the queued writes it did not read, all in
+    one script, before it sets the marker;
+  * with neither, the write is skipped: the next build reads the row.
+
+A row committed after the build's read is thus replayed, and one it read
+is not counted again, so the window stays exact through a racing write.
+A build that lost its token (to a newer build, or after BUILD_SECONDS)
+stores nothing, and its users' baselines come from the window instead.
+When Redis is unreachable, current_baselines returns None and callers
+fall back to stored or live baselines.
+"""
+import math
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.redis_client import mark_redis_down, redis_client
+from app.models.activity import Activity
+from app.models.meal import Meal
+from app.models.sleep import Sleep
+from app.services.baselines import METRICS, Baseline
+
+SAMPLE_METRICS = ("sleep_quality", "sleep_duration", "meal_hour")
+DAILY_METRICS = ("daily_calories", "daily_burn")
+
+# How long a build may take before its queued writes are given up
+BUILD_SECONDS = 300
+
+# apply(key, args, first): add the (field, kind, value) triples of args,
+# from index `first`, to the buckets in key, the same way _apply does
+_APPLY_LUA = """
+local function apply(key, args, first)
+    for i = first, #args, 3 do
+        local field, x = args[i], tonumber(args[i + 2])
+        if args[i + 1] == 'd' then
+            redis.call('HINCRBYFLOAT', key, field, x)
+        else
+            local n, mean, m2 = 0, 0.0, 0.0
+            local v = redis.call('HGET', key, field)
+            if v then
+                local a, b, c = string.match(v, '(%S+) (%S+) (%S+)')
+                n, mean, m2 = tonumber(a), tonumber(b), tonumber(c)
+            end
+            n = n + 1
+            local delta = x - mean
+            mean = mean + delta / n
+            m2 = m2 + delta * (x - mean)
+            redis.call('HSET', key, field, string.format('%d %.17g %.17g', n, mean, m2))
+        end
+    end
+end
+"""
+
+# KEYS: hash, marker, build token, queue, counted rows
+# ARGV: hash TTL, row id, then (field, kind, value) triples
+# 1 if applied, 2 if queued for a running build, 0 if skipped
+_RECORD_LUA = _APPLY_LUA + """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    if redis.call('SADD', KEYS[5], ARGV[2]) == 0 then return 0 end
+    apply(KEYS[1], ARGV, 3)
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+    redis.call('EXPIRE', KEYS[5], ARGV[1])
+    return 1
+end
+if redis.call('EXISTS', KEYS[3]) == 1 then
+    redis.call('RPUSH', KEYS[4], table.concat(ARGV, ' ', 2))
+    redis.call('EXPIRE', KEYS[4], redis.call('TTL', KEYS[3]))
+    return 2
+end
+return 0
+"""
+
+# KEYS: as _RECORD_LUA
+# ARGV: hash TTL, marker TTL, build token, number of buckets, then
+# (field, value) per bucket, then the ids of the rows the build read
+# 1 if stored, 0 if the token was lost or another build got there first
+_BUILD_LUA = _APPLY_LUA + """
+if redis.call('EXISTS', KEYS[2]) == 1 or redis.call('GET', KEYS[3]) ~= ARGV[3] then
+    return 0
+end
+redis.call('DEL', KEYS[1], KEYS[5])
+local buckets = tonumber(ARGV[4])
+for i = 5, 4 + 2 * buckets, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+for i = 5 + 2 * buckets, #ARGV do
+    redis.call('SADD', KEYS[5], ARGV[i])
+end
+for _, entry in ipairs(redis.call('LRANGE', KEYS[4], 0, -1)) do
+    local args = {}
+    for word in string.gmatch(entry, '%S+') do args[#args + 1] = word end
+    if redis.call('SADD', KEYS[5], args[1]) == 1 then apply(KEYS[1], args, 2) end
+end
+redis.call('DEL', KEYS[3], KEYS[4])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('EXPIRE', KEYS[5], ARGV[1])
+redis.call('SET', KEYS[2], '1', 'EX', ARGV[2])
+return 1
+"""
+
+# (field, value): a sample for a SAMPLE_METRICS bucket or an addend for a DAILY_METRICS one
+Change = Tuple[str, float]
+Welford = Tuple[int, float, float]
+
+
+def _key(user_id: int) -> str:
+    return f"alfred:wstats:{user_id}"
+
+
+def _seeded_key(user_id: int) -> str:
+    return f"alfred:wstats:{user_id}:seeded"
+
+
+def _keys(user_id: int) -> List[str]:
+    """What _RECORD_LUA and _BUILD_LUA take: hash, marker, build token, queue, counted rows."""
+    return [
+        _key(user_id), _seeded_key(user_id), f"alfred:wstats:{user_id}:building",
+        f"alfred:wstats:{user_id}:queue", f"alfred:wstats:{user_id}:rows",
+    ]
+
+
+def _hash_ttl() -> int:
+    return (settings.PATTERN_DETECTION_WINDOW_DAYS + 1) * 86400
+
+
+def _utc(dt: datetime) -> datetime:
+    # The database hands timestamps back in UTC; bucket request-time values the same way
+    return dt.astimezone(timezone.utc) if dt.tzinfo is not None else dt
+
+
+def _field(metric: str, day: date) -> str:
+    return f"{metric}:{day.toordinal()}"
+
+
+def _first_day(now: datetime) -> int:
+    return _utc(now).date().toordinal() - settings.PATTERN_DETECTION_WINDOW_DAYS + 1
+
+
+# ---------------------------------------------------------------------------
+# Welford
+# ---------------------------------------------------------------------------
+
+def _add(state: Welford, x: float) -> Welford:
+    n, mean, m2 = state
+    n += 1
+    delta = x - mean
+    mean += delta / n
+    return n, mean, m2 + delta * (x - mean)
+
+
+def _merge(a: Welford, b: Welford) -> Welford:
+    na, mean_a, m2_a = a
+    nb, mean_b, m2_b = b
+    if not nb:
+        return a
+    if not na:
+        return b
+    n = na + nb
+    delta = mean_b - mean_a
+    return n, mean_a + delta * nb / n, m2_a + m2_b + delta * delta * na * nb / n
+
+
+def _baseline(state: Welford) -> Optional[Baseline]:
+    n, mean, m2 = state
+    if not n:
+        return None
+    # Population std, as np.std gives
+    return Baseline(mean=mean, std=math.sqrt(max(m2, 0.0) / n), n=n)
+
+
+def _decode(value: str) -> Welford:
+    n, mean, m2 = value.split()
+    return int(n), float(mean), float(m2)
+
+
+def _apply(buckets: Dict[str, str], changes: Iterable[Change]) -> Dict[str, str]:
+    """New encoded values for the fields `changes` touches."""
+    updated: Dict[str, str] = {}
+    for field, value in changes:
+        current = updated.get(field, buckets.get(field))
+        if field.split(":", 1)[0] in DAILY_METRICS:
+            updated[field] = repr((float(current) if current else 0.0) + value)
+        else:
+            n, mean, m2 = _add(_decode(current) if current else (0, 0.0, 0.0), value)
+            updated[field] = f"{n} {mean!r} {m2!r}"
+    return updated
+
+
+# ---------------------------------------------------------------------------
+# What each record contributes
+# ---------------------------------------------------------------------------
+
+def sleep_changes(sleep_start: datetime, duration_minutes, quality_score) -> List[Change]:
+    day = _utc(sleep_start).date()
+    changes = []
+    if quality_score is not None:
+        changes.append((_field("sleep_quality", day), float(quality_score)))
+    if duration_minutes is not None:
+        changes.append((_field("sleep_duration", day), float(duration_minutes)))
+    return changes
+
+
+def meal_changes(meal_time: datetime, calories) -> List[Change]:
+    meal_time = _utc(meal_time)
+    day = meal_time.date()
+    return [
+        (_field("daily_calories", day), float(calories or 0)),
+        (_field("meal_hour", day), meal_time.hour + meal_time.minute / 60),
+    ]
+
+
+def activity_changes(start_time: datetime, calories_burned) -> List[Change]:
+    return [(_field("daily_burn", _utc(start_time).date()), float(calories_burned or 0))]
+
+
+# ---------------------------------------------------------------------------
+# Writes
+# ---------------------------------------------------------------------------
+
+async def _record(user_id: int, row: str, changes: List[Change]) -> None:
+    if not changes:
+        return
+    args: List = [_hash_ttl(), row]
+    for field, value in changes:
+        args += [field, "d" if field.split(":", 1)[0] in DAILY_METRICS else "s", repr(value)]
+    try:
+        script = redis_client().register_script(_RECORD_LUA)
+        await script(keys=_keys(user_id), args=args)
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+        logger.warning(f"Rolling stats update skipped for user {user_id}: {exc}")
+
+
+async def record_sleep(
+    user_id: int, sleep_id: int, sleep_start: datetime, duration_minutes, quality_score
+) -> None:
+    """Count a newly logged sleep record.  Never raises."""
+    await _record(user_id, f"s{sleep_id}", sleep_changes(sleep_start, duration_minutes, quality_score))
+
+
+async def record_meal(user_id: int, meal_id: int, meal_time: datetime, calories) -> None:
+    """Count a newly logged meal.  Never raises."""
+    await _record(user_id, f"m{meal_id}", meal_changes(meal_time, calories))
+
+
+async def record_activity(user_id: int, activity_id: int, start_time: datetime, calories_burned) -> None:
+    """Count a newly logged activity.  Never raises."""
+    await _record(user_id, f"a{activity_id}", activity_changes(start_time, calories_burned))
+
+
+# ---------------------------------------------------------------------------
+# Reads
+# ---------------------------------------------------------------------------
+
+async def _seed(user_ids: Sequence[int], db: AsyncSession, now: datetime) -> List[int]:
+    """
+    Build the hashes of `user_ids` from the tables, three queries for all of
+    them.  Returns the users whose build lost its token.
+    """
+    redis = redis_client()
+    token = uuid.uuid4().hex
+    pipe = redis.pipeline(transaction=False)
+    for user_id in user_ids:
+        pipe.set(_keys(user_id)[2], token, ex=BUILD_SECONDS)
+    await pipe.execute()
+
+    first_day = _first_day(now)
+    # One spare day so nothing on the first calendar day is missed in any tz
+    cutoff = now - timedelta(days=settings.PATTERN_DETECTION_WINDOW_DAYS + 1)
+    changes: Dict[int, List[Change]] = {uid: [] for uid in user_ids}
+    rows: Dict[int, List[str]] = {uid: [] for uid in user_ids}
+    sleep_rows = await db.execute(
+        select(Sleep.user_id, Sleep.id, Sleep.sleep_start, Sleep.duration_minutes, Sleep.quality_score)
+        .where(Sleep.user_id.in_(user_ids), Sleep.sleep_start >= cutoff)
+    )
+    for user_id, row_id, start, duration, quality in sleep_rows.all():
+        rows[user_id].append(f"s{row_id}")
+        if _utc(start).toordinal() >= first_day:
+            changes[user_id] += sleep_changes(start, duration, quality)
+    meal_rows = await db.execute(
+        select(Meal.user_id, Meal.id, Meal.meal_time, Meal.calories)
+        .where(Meal.user_id.in_(user_ids), Meal.meal_time >= cutoff)
+    )
+    for user_id, row_id, meal_time, calories in meal_rows.all():
+        rows[user_id].append(f"m{row_id}")
+        if _utc(meal_time).toordinal() >= first_day:
+            changes[user_id] += meal_changes(meal_time, calories)
+    activity_rows = await db.execute(
+        select(Activity.user_id, Activity.id, Activity.start_time, Activity.calories_burned)
+        .where(Activity.user_id.in_(user_ids), Activity.start_time >= cutoff)
+    )
+    for user_id, row_id, start, burned in activity_rows.all():
+        rows[user_id].append(f"a{row_id}")
+        if _utc(start).toordinal() >= first_day:
+            changes[user_id] += activity_changes(start, burned)
+
+    script = redis.register_script(_BUILD_LUA)
+    marker_ttl = int(settings.ROLLING_STATS_RESEED_HOURS * 3600)
+    pipe = redis.pipeline(transaction=False)
+    for user_id in user_ids:
+        buckets = _apply({}, changes[user_id])
+        args: List = [_hash_ttl(), marker_ttl, token, len(buckets)]
+        for field, value in buckets.items():
+            args += [field, value]
+        await script(keys=_keys(user_id), args=args + rows[user_id], client=pipe)
+    built = await pipe.execute()
+
+    # Lost to a newer build, unless that one has finished since
+    pipe = redis.pipeline(transaction=False)
+    for user_id in user_ids:
+        pipe.exists(_seeded_key(user_id))
+    seeded = await pipe.execute()
+    return [uid for uid, ok, done in zip(user_ids, built, seeded) if not ok and not done]
+
+
+def window_baselines(buckets: Dict[str, str], now: datetime) -> Tuple[Dict[str, Optional[Baseline]], List[str]]:
+    """Merge the in-window buckets; also returns the fields that fell out of it."""
+    first_day = _first_day(now)
+    samples: Dict[str, Welford] = {m: (0, 0.0, 0.0) for m in SAMPLE_METRICS}
+    days: Dict[str, Welford] = {m: (0, 0.0, 0.0) for m in DAILY_METRICS}
+    expired = []
+    for field in sorted(buckets, key=lambda f: int(f.rsplit(":", 1)[1])):
+        metric, day = field.rsplit(":", 1)
+        if int(day) < first_day:
+            expired.append(field)
+        elif metric in DAILY_METRICS:
+            days[metric] = _add(days[metric], float(buckets[field]))
+        elif metric in SAMPLE_METRICS:
+            samples[metric] = _merge(samples[metric], _decode(buckets[field]))
+    merged = {**samples, **days}
+    return {metric: _baseline(merged[metric]) for metric in METRICS}, expired
+
+
+async def current_baselines_many(
+    user_ids: Sequence[int], now: datetime, db: AsyncSession,
+) -> Optional[Dict[int, Dict[str, Optional[Baseline]]]]:
+    """
+    Every METRICS baseline over the current window for each of `user_ids`
+    (None where there are no samples), or None if Redis is down.  Users
+    without a hash are built together; the rest is two pipelines.
+    """
+    try:
+        redis = redis_client()
+        pipe = redis.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.exists(_seeded_key(user_id))
+        unseeded = [uid for uid, seeded in zip(user_ids, await pipe.execute()) if not seeded]
+        unbuilt = set(await _seed(unseeded, db, now)) if unseeded else set()
+
+        pipe = redis.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.hgetall(_key(user_id))
+        hashes = await pipe.execute()
+
+        result: Dict[int, Dict[str, Optional[Baseline]]] = {}
+        pipe = redis.pipeline(transaction=False)
+        for user_id, buckets in zip(user_ids, hashes):
+            if user_id in unbuilt:
+                # Left to the window; its hash may be half-built
+                result[user_id] = {}
+                continue
+            result[user_id], expired = window_baselines(buckets, now)
+            if expired:
+                pipe.hdel(_key(user_id), *expired)
+        await pipe.execute()
+        return result
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+        logger.warning(f"Rolling stats unavailable for {len(user_ids)} users: {exc}")
+        return None
+
+
+async def current_baselines(
+    user_id: int, now: datetime, db: AsyncSession,
+) -> Optional[Dict[str, Optional[Baseline]]]:
+    """
+    Every METRICS baseline over the current window (None where there are no
+    samples), or None if Redis is down.
+    """
+    current = await current_baselines_many([user_id], now, db)
+    return None if current is None else current[user_id]
@@ -0,0 +1,323 @@
+"""
+Batched signal detection over many users at once.
+
+detect_signals_batch runs the rule detectors of signal_detector (meal gap,
+poor sleep, low energy, recovery, dehydration) as NumPy operations over a
+WindowBatch, so a sweep over every active user is a handful of array passes
+instead of one Python pass per user.  Each detector yields a severity and
+confidence per user (NaN where it did not fire) with the same thresholds as
+its per-user version.
+
+Only each user's winning signal is materialised, by the same builder the
+per-user detector calls (meal_gap_signal, poor_sleep_signal, ...), so
+message texts and data stay identical to detect_signals.  detect_anomaly is not part of the batch;
+it needs the user's model and stays per user.
+"""
+from dataclasses import dataclass
+from typing import Callable, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.alfred_agent import Signal
+from app.services.baselines import Baseline
+from app.services.signal_detector import (
+    dehydration_signal,
+    low_energy_signal,
+    meal_gap_signal,
+    poor_sleep_signal,
+    recovery_signal,
+)
+from app.services.wellness_window import (
+    DAY_SECONDS,
+    LAST_NIGHT_HOURS,
+    RECENT_HOURS,
+    WindowBatch,
+    day_ordinals,
+)
+
+# The baselines the rule detectors read
+BATCH_METRICS = ("sleep_quality", "sleep_duration", "daily_burn")
+
+
+@dataclass(frozen=True, slots=True)
+class BaselineColumns:
+    """One metric's baseline for every user of a batch; n == 0 means none."""
+    mean: np.ndarray
+    std: np.ndarray
+    n: np.ndarray
+
+    def get(self, i: int) -> Optional[Baseline]:
+        if not self.n[i]:
+            return None
+        return Baseline(mean=float(self.mean[i]), std=float(self.std[i]), n=int(self.n[i]))
+
+
+# ---------------------------------------------------------------------------
+# Segment helpers
+# ---------------------------------------------------------------------------
+
+def _owner(offsets: np.ndarray) -> np.ndarray:
+    """The user index of every row of a table."""
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+
+def _sum(owner: np.ndarray, values: np.ndarray, n_users: int) -> np.ndarray:
+    return np.bincount(owner, weights=values, minlength=n_users)
+
+
+def _last(offsets: np.ndarray, column: np.ndarray) -> np.ndarray:
+    """Each user's last value in the table (NaN for users without rows)."""
+    has = np.diff(offsets) > 0
+    out = np.full(len(offsets) - 1, np.nan)
+    out[has] = column[offsets[1:][has] - 1]
+    return out
+
+
+def _stats(owner: np.ndarray, values: np.ndarray, n_users: int) -> BaselineColumns:
+    """
+    Population mean / std per user, bit for bit as np.mean / np.std give
+    (so rounded texts agree with detect_signals).  `owner` must be sorted.
+
+    np.mean sums pairwise, which bincount and reduceat do not reproduce;
+    a row-wise sum over a (users × length) block does, so users are summed
+    in one block per distinct row count.
+    """
+    n = np.bincount(owner, minlength=n_users)
+    starts = np.concatenate(([0], np.cumsum(n)[:-1]))
+    mean = np.full(n_users, np.nan)
+    std = np.full(n_users, np.nan)
+    for length in np.unique(n[n > 0]).tolist():
+        users = np.flatnonzero(n == length)
+        block = values[starts[users, None] + np.arange(length)]
+        mean[users] = block.sum(axis=1) / length
+        std[users] = np.sqrt(((block - mean[users, None]) ** 2).sum(axis=1) / length)
+    return BaselineColumns(mean=mean, std=std, n=n)
+
+
+# ---------------------------------------------------------------------------
+# Baselines
+# ---------------------------------------------------------------------------
+
+def _present_stats(owner: np.ndarray, column: np.ndarray, n_users: int) -> BaselineColumns:
+    present = ~np.isnan(column)
+    return _stats(owner[present], column[present], n_users)
+
+
+def _daily_stats(owner: np.ndarray, times: np.ndarray, values: np.ndarray, n_users: int) -> BaselineColumns:
+    # One key per (user, UTC day); user-major, so unique keeps users together
+    keys = owner * 10_000_000 + day_ordinals(times)
+    days, day_idx = np.unique(keys, return_inverse=True)
+    totals = np.bincount(day_idx, weights=np.nan_to_num(values), minlength=len(days))
+    return _stats(days // 10_000_000, totals, n_users)
+
+
+def batch_baselines(
+    batch: WindowBatch,
+    stored: Optional[Sequence[Mapping[str, Optional[Baseline]]]] = None,
+) -> dict[str, BaselineColumns]:
+    """
+    BATCH_METRICS for every user: computed from the batch, then replaced by
+    the user's entry in `stored` (see load_baselines) wherever it has one,
+    exactly as a BaselineProvider would.
+    """
+    n = len(batch)
+    sleep_owner = _owner(batch.sleep_offsets)
+    columns = {
+        "sleep_quality": _present_stats(sleep_owner, batch.sleep.quality_score, n),
+        "sleep_duration": _present_stats(sleep_owner, batch.sleep.duration_minutes, n),
+        "daily_burn": _daily_stats(
+            _owner(batch.activity_offsets), batch.activities.start,
+            batch.activities.calories_burned, n,
+        ),
+    }
+    if stored is not None:
+        for metric, col in columns.items():
+            for i, baselines in enumerate(stored):
+                if metric in baselines:
+                    b = baselines[metric]
+                    col.mean[i], col.std[i], col.n[i] = (np.nan, np.nan, 0) if b is None else (b.mean, b.std, b.n)
+    return columns
+
+
+# ---------------------------------------------------------------------------
+# Detectors: (severity, confidence) per user, NaN where nothing fired
+# ---------------------------------------------------------------------------
+
+def _scored(fired: np.ndarray, severity: np.ndarray, confidence: np.ndarray, *inputs):
+    """
+    Severity and confidence where the detector fired, plus the per-user inputs
+    its signal builder takes (arrays, or BaselineColumns).
+    """
+    return np.where(fired, severity, np.nan), np.where(fired, confidence, np.nan), inputs
+
+
+def batch_meal_gap(batch: WindowBatch):
+    hours_since = (batch.now_ts - _last(batch.meal_offsets, batch.meals.time)) / 3600
+    with np.errstate(invalid="ignore"):
+        fired = hours_since >= 4
+    severity = np.minimum(1.0, (hours_since - 4) / 4)
+    return _scored(fired, severity, np.minimum(0.95, 0.70 + severity * 0.25), hours_since)
+
+
+def batch_poor_sleep(batch: WindowBatch, baselines: Mapping[str, BaselineColumns]):
+    n = len(batch)
+    sleep = batch.sleep
+    owner = _owner(batch.sleep_offsets)
+
+    # Last night: the latest-starting session that ended within LAST_NIGHT_HOURS
+    ended = np.flatnonzero(sleep.end >= batch.now_ts - LAST_NIGHT_HOURS * 3600)
+    last = np.full(n, -1, dtype=np.int64)
+    np.maximum.at(last, owner[ended], ended)
+    has = last >= 0
+    q = np.full(n, np.nan)
+    d = np.full(n, np.nan)
+    q[has] = sleep.quality_score[last[has]]
+    d[has] = sleep.duration_minutes[last[has]]
+
+    min_samples = settings.MIN_SAMPLES_FOR_PREDICTION
+    qb, db = baselines["sleep_quality"], baselines["sleep_duration"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        q_base = ~np.isnan(q) & (qb.n >= min_samples)
+        z_q = (qb.mean - q) / np.maximum(qb.std, 0.5)
+        quality_issue = np.where(q_base, (z_q > 0.8) | (q < 5), q < 5)
+        quality_sev = np.where(q_base, np.minimum(1.0, z_q / 2), 0.6)
+
+        d_base = ~np.isnan(d) & (db.n >= min_samples)
+        z_d = (db.mean - d) / np.maximum(db.std, 15.0)
+        duration_issue = np.where(d_base, (z_d > 0.8) | (d < 360), d < 360)
+        duration_sev = np.where(d_base, np.minimum(1.0, z_d / 2), 0.65)
+
+        parts = quality_issue.astype(np.int64) + duration_issue
+        severity = (
+            np.where(quality_issue, quality_sev, 0.0) + np.where(duration_issue, duration_sev, 0.0)
+        ) / parts
+    return _scored(parts > 0, severity, np.minimum(0.92, 0.68 + severity * 0.24), q, d, qb, db)
+
+
+def batch_low_energy(batch: WindowBatch, baselines: Mapping[str, BaselineColumns]):
+    n = len(batch)
+    q = _last(batch.sleep_offsets, batch.sleep.quality_score)
+    d = _last(batch.sleep_offsets, batch.sleep.duration_minutes)
+
+    qb = baselines["sleep_quality"]
+    with np.errstate(invalid="ignore"):
+        deficit = np.maximum(0.0, (qb.mean - q) / np.maximum(qb.mean, 1))
+        quality_term = np.where(
+            qb.n >= settings.MIN_SAMPLES_FOR_PREDICTION, deficit * 0.5, np.where(q < 5, 0.4, 0.0)
+        )
+        score = np.where(np.isnan(q), 0.0, quality_term)
+        score = score + np.where(d < 360, 0.3, 0.0)
+
+    owner = _owner(batch.activity_offsets)
+    recent = batch.activities.start >= batch.now_ts - RECENT_HOURS * 3600
+    count = np.bincount(owner[recent], minlength=n)
+    calories = _sum(owner[recent], np.nan_to_num(batch.activities.calories_burned[recent]), n)
+    minutes = _sum(owner[recent], np.nan_to_num(batch.activities.duration_minutes[recent]), n)
+    score = score + np.where((count > 0) & ((calories > 600) | (minutes > 90)), 0.3, 0.0)
+
+    severity = np.minimum(1.0, score)
+    return _scored(
+        score >= 0.45, severity, np.minimum(0.88, 0.60 + severity * 0.28),
+        q, d, qb, count, calories, minutes,
+    )
+
+
+def batch_recovery_needed(batch: WindowBatch, baselines: Mapping[str, BaselineColumns]):
+    n = len(batch)
+    activities = batch.activities
+    owner = _owner(batch.activity_offsets)
+
+    day_start = (batch.now_ts // DAY_SECONDS) * DAY_SECONDS
+    today = (activities.start >= day_start) & (activities.start < day_start + DAY_SECONDS)
+    today_load = _sum(owner[today], np.nan_to_num(activities.calories_burned[today]), n)
+
+    burn = baselines["daily_burn"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = (today_load - burn.mean) / np.maximum(burn.std, 50.0)
+        fired = (
+            (np.diff(batch.activity_offsets) >= settings.MIN_SAMPLES_FOR_PREDICTION)
+            & (burn.n >= 3)
+            & (z >= 1.0)
+        )
+        last_quality = _last(batch.sleep_offsets, batch.sleep.quality_score)
+        poor_recovery = last_quality < 6
+    severity = np.minimum(1.0, z / 3)
+    severity = np.where(poor_recovery, np.minimum(1.0, severity + 0.2), severity)
+    return _scored(
+        fired, severity, np.minimum(0.90, 0.65 + severity * 0.25), today_load, burn, last_quality
+    )
+
+
+def batch_dehydration(batch: WindowBatch):
+    n = len(batch)
+    since = batch.now_ts - RECENT_HOURS * 3600
+
+    meal_owner = _owner(batch.meal_offsets)
+    recent = batch.meals.time >= since
+    water = np.nan_to_num(batch.meals.water_ml[recent])
+    logged = np.bincount(meal_owner[recent][water > 0], minlength=n) > 0
+    total_water = _sum(meal_owner[recent], water, n)
+
+    activity_owner = _owner(batch.activity_offsets)
+    active = batch.activities.start >= since
+    minutes = _sum(activity_owner[active], np.nan_to_num(batch.activities.duration_minutes[active]), n)
+    target = 2000 + minutes * 8
+
+    deficit = np.maximum(0.0, (target - total_water) / target)
+    severity = np.minimum(1.0, deficit)
+    return _scored(
+        logged & (deficit >= 0.35), severity, np.minimum(0.85, 0.60 + severity * 0.25),
+        total_water, minutes,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+
+# In detect_signals order, so ties go to the same detector
+_DETECTORS: List[tuple[Callable, Callable[..., Optional[Signal]]]] = [
+    (lambda batch, baselines: batch_meal_gap(batch), meal_gap_signal),
+    (batch_poor_sleep, poor_sleep_signal),
+    (batch_low_energy, low_energy_signal),
+    (batch_recovery_needed, recovery_signal),
+    (lambda batch, baselines: batch_dehydration(batch), dehydration_signal),
+]
+
+
+def _input(column, i: int):
+    if isinstance(column, BaselineColumns):
+        return column.get(i)
+    value = column[i]
+    if np.issubdtype(column.dtype, np.integer):
+        return int(value)
+    return None if np.isnan(value) else float(value)
+
+
+def detect_signals_batch(
+    batch: WindowBatch,
+    baselines: Optional[Mapping[str, BaselineColumns]] = None,
+) -> List[Optional[Signal]]:
+    """
+    The strongest rule-based signal for every user of the batch (None where
+    nothing fired), in the order of batch.user_ids.
+
+    `baselines` come from batch_baselines; without them every baseline is
+    computed from the batch.
+    """
+    if baselines is None:
+        baselines = batch_baselines(batch)
+
+    scores = [detector(batch, baselines) for detector, _ in _DETECTORS]
+    severity = np.stack([s for s, _, _ in scores], axis=1)
+    confidence = np.stack([c for _, c, _ in scores], axis=1)
+    strength = np.nan_to_num(severity * confidence, nan=-np.inf)
+
+    # Only the winners become Signals, built by the same code as detect_signals
+    winners = np.argmax(strength, axis=1)
+    results: List[Optional[Signal]] = [None] * len(batch)
+    for i in np.flatnonzero(np.isfinite(strength[np.arange(len(batch)), winners])):
+        k = winners[i]
+        results[i] = _DETECTORS[k][1](*(_input(column, i) for column in scores[k][2]))
+    return results
@@ -1,48 +1,105 @@
 """
 Signal Detector Service - ML-based pattern detection for wellness signals.
 
-Uses numpy for statistical analysis and sklearn for anomaly detection.
+Uses numpy for statistical analysis and, with the default ANOMALY_BACKEND,
+sklearn for anomaly detection.
 Works on 14-day rolling windows with a minimum of 7 samples before making predictions.
 """
 from __future__ import annotations
 
-from datetime import datetime, timezone
-from typing import List, Dict, Optional
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
 
 import numpy as np
 
 from app.core.config import settings
 from app.core.logging import logger
 from app.services.alfred_agent import Signal, SignalType
+from app.services.anomaly_models import fit_anomaly_model, load_anomaly_model
+from app.services.baselines import Baseline, BaselineProvider
+from app.services import streaming_anomaly
+from app.services.wellness_window import DAY_SECONDS, EPOCH_ORDINAL, WellnessWindow, day_ordinals
 
 
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
-def _to_utc(dt: datetime) -> datetime:
-    """Ensure a datetime is timezone-aware in UTC."""
-    if dt.tzinfo is None:
-        return dt.replace(tzinfo=timezone.utc)
-    return dt
+def _value(column: np.ndarray, i: int) -> Optional[float]:
+    """One cell of a window column; None where nothing was logged."""
+    v = column[i]
+    return None if np.isnan(v) else float(v)
 
 
-def _hours_ago(dt: datetime, now: datetime) -> float:
-    return (now - _to_utc(dt)).total_seconds() / 3600
+# ---------------------------------------------------------------------------
+# Daily feature matrix
+# ---------------------------------------------------------------------------
+
+ANOMALY_FEATURES = ("sleep_duration", "sleep_quality", "meal_calories", "activity_calories")
+# Smallest spread the streaming anomaly backends measure each feature against
+ANOMALY_SCALE_FLOOR = (15.0, 0.5, 100.0, 50.0)
+
+# Used for days without a sleep record (or with a missing / zero value)
+_DEFAULT_SLEEP_MINUTES = 420.0
+_DEFAULT_SLEEP_QUALITY = 7.0
+
+
+def _or_default(values: np.ndarray, default: float) -> np.ndarray:
+    # Same as `value or default`: missing and zero both take the default
+    return np.where(np.isnan(values) | (values == 0), default, values)
+
+
+def daily_feature_matrix(window: WellnessWindow) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Per-day wellness features in one pass over the window.
+
+    Returns (days, X): the sorted UTC day ordinals that have any record, and
+    a (len(days) × ANOMALY_FEATURES) float matrix.  The sleep columns come
+    from each day's latest sleep; the calorie columns are per-day sums.
+    """
+    sleep, activities, meals = window.sleep, window.activities, window.meals
+    sleep_days = day_ordinals(sleep.start)
+    activity_days = day_ordinals(activities.start)
+    meal_days = day_ordinals(meals.time)
+
+    days, inverse = np.unique(
+        np.concatenate([sleep_days, activity_days, meal_days]), return_inverse=True
+    )
+    n_sleep, n_act = len(sleep_days), len(activity_days)
+    sleep_idx = inverse[:n_sleep]
+    activity_idx = inverse[n_sleep:n_sleep + n_act]
+    meal_idx = inverse[n_sleep + n_act:]
+
+    X = np.empty((len(days), len(ANOMALY_FEATURES)), dtype=np.float64)
+    X[:, 0] = _DEFAULT_SLEEP_MINUTES
+    X[:, 1] = _DEFAULT_SLEEP_QUALITY
+    if n_sleep:
+        # Sleep is sorted by start: the first occurrence in reverse is each day's latest
+        rows, last = np.unique(sleep_idx[::-1], return_index=True)
+        latest = n_sleep - 1 - last
+        X[rows, 0] = _or_default(sleep.duration_minutes[latest], _DEFAULT_SLEEP_MINUTES)
+        X[rows, 1] = _or_default(sleep.quality_score[latest], _DEFAULT_SLEEP_QUALITY)
+    X[:, 2] = np.bincount(meal_idx, weights=np.nan_to_num(meals.calories), minlength=len(days))
+    X[:, 3] = np.bincount(
+        activity_idx, weights=np.nan_to_num(activities.calories_burned), minlength=len(days)
+    )
+    return days, X
 
 
 # ---------------------------------------------------------------------------
 # Individual signal detectors
 # ---------------------------------------------------------------------------
 
-def detect_meal_gap(meals: List[Dict], now: datetime) -> Optional[Signal]:
+def detect_meal_gap(window: WellnessWindow) -> Optional[Signal]:
     """Trigger when the last meal was more than 4 hours ago."""
-    if not meals:
+    if not len(window.meals):
         return None
+    return meal_gap_signal((window.now_ts - window.meals.time[-1]) / 3600)
 
-    last_meal_time = _to_utc(meals[0]["meal_time"])
-    hours_since = _hours_ago(last_meal_time, now)
 
+def meal_gap_signal(hours_since: float) -> Optional[Signal]:
     if hours_since < 4:
         return None
 
@@ -59,42 +116,47 @@ def detect_meal_gap(meals: List[Dict], now: datetime) -> Optional[Signal]:
     )
 
 
-def detect_poor_sleep(sleep_records: List[Dict], now: datetime) -> Optional[Signal]:
+def detect_poor_sleep(
+    window: WellnessWindow,
+    baselines: Optional[BaselineProvider] = None,
+) -> Optional[Signal]:
     """
     Detect poor sleep using a 14-day rolling baseline.
 
     Triggers when last night's quality or duration is more than 1 stddev
     below the user's personal rolling mean.
     """
-    if not sleep_records:
-        return None
-
     # Only consider sessions that ended within the last 18 hours (last night / this morning)
-    recent = [
-        s for s in sleep_records
-        if _hours_ago(_to_utc(s["sleep_end"]), now) <= 18
-    ]
-    if not recent:
+    if window.last_night is None:
         return None
 
-    last = recent[0]
-    last_quality = last.get("quality_score")
-    last_duration = last.get("duration_minutes")
+    last_quality = _value(window.sleep.quality_score, window.last_night)
+    last_duration = _value(window.sleep.duration_minutes, window.last_night)
 
     if last_quality is None and last_duration is None:
         return None
 
-    # Build rolling baseline from all records (up to 14-day window)
-    qualities = [s["quality_score"] for s in sleep_records if s.get("quality_score") is not None]
-    durations = [s["duration_minutes"] for s in sleep_records if s.get("duration_minutes") is not None]
+    # Rolling baseline (stored nightly, else from all records in the window)
+    if baselines is None:
+        baselines = BaselineProvider.live(window)
+    return poor_sleep_signal(
+        last_quality, last_duration, baselines.get("sleep_quality"), baselines.get("sleep_duration")
+    )
 
+
+def poor_sleep_signal(
+    last_quality: Optional[float],
+    last_duration: Optional[float],
+    quality_base: Optional[Baseline],
+    duration_base: Optional[Baseline],
+) -> Optional[Signal]:
     issues = []
     severity_parts = []
 
     # --- Quality check ---
-    if last_quality is not None and len(qualities) >= settings.MIN_SAMPLES_FOR_PREDICTION:
-        q_arr = np.array(qualities, dtype=float)
-        q_mean, q_std = q_arr.mean(), max(q_arr.std(), 0.5)
+    if (last_quality is not None and quality_base is not None
+            and quality_base.n >= settings.MIN_SAMPLES_FOR_PREDICTION):
+        q_mean, q_std = quality_base.mean, max(quality_base.std, 0.5)
         z_quality = (q_mean - last_quality) / q_std  # positive = below average
         if z_quality > 0.8 or last_quality < 5:
             issues.append(f"quality score {last_quality:.1f} (your avg: {q_mean:.1f})")
@@ -105,9 +167,9 @@ def detect_poor_sleep(sleep_records: List[Dict], now: datetime) -> Optional[Sign
 
     # --- Duration check ---
     IDEAL_MINUTES = 450  # 7.5 hours
-    if last_duration is not None and len(durations) >= settings.MIN_SAMPLES_FOR_PREDICTION:
-        d_arr = np.array(durations, dtype=float)
-        d_mean, d_std = d_arr.mean(), max(d_arr.std(), 15.0)
+    if (last_duration is not None and duration_base is not None
+            and duration_base.n >= settings.MIN_SAMPLES_FOR_PREDICTION):
+        d_mean, d_std = duration_base.mean, max(duration_base.std, 15.0)
         z_duration = (d_mean - last_duration) / d_std
         if z_duration > 0.8 or last_duration < 360:
             hours = last_duration / 60
@@ -138,41 +200,57 @@ def detect_poor_sleep(sleep_records: List[Dict], now: datetime) -> Optional[Sign
 
 
 def detect_low_energy(
-    sleep_records: List[Dict],
-    activities_24h: List[Dict],
-    now: datetime,
+    window: WellnessWindow,
+    baselines: Optional[BaselineProvider] = None,
 ) -> Optional[Signal]:
     """
     Infer low energy from a combination of:
       - Sleep quality deficit vs rolling mean
       - High activity load in the last 24 hours
     """
-    score = 0.0  # higher = more likely low energy
+    # Sleep contribution (the latest session)
+    q = d = quality_base = None
+    if len(window.sleep):
+        q = _value(window.sleep.quality_score, -1)
+        d = _value(window.sleep.duration_minutes, -1)
+        if q is not None:
+            if baselines is None:
+                baselines = BaselineProvider.live(window)
+            quality_base = baselines.get("sleep_quality")
 
-    # Sleep contribution
-    if sleep_records:
-        last = sleep_records[0]
-        q = last.get("quality_score")
-        d = last.get("duration_minutes")
+    # Activity load contribution
+    recent = window.activities_24h
+    return low_energy_signal(
+        q, d, quality_base,
+        activity_count=recent.stop - recent.start,
+        total_calories=float(np.nansum(window.activities.calories_burned[recent])),
+        total_minutes=float(np.nansum(window.activities.duration_minutes[recent])),
+    )
 
-        qualities = [s["quality_score"] for s in sleep_records if s.get("quality_score") is not None]
-        if q is not None:
-            if len(qualities) >= settings.MIN_SAMPLES_FOR_PREDICTION:
-                q_mean = np.mean(qualities)
-                deficit_ratio = max(0.0, (q_mean - q) / max(q_mean, 1))
-                score += deficit_ratio * 0.5
-            elif q < 5:
-                score += 0.4
 
-        if d is not None and d < 360:
-            score += 0.3
+def low_energy_signal(
+    q: Optional[float],
+    d: Optional[float],
+    quality_base: Optional[Baseline],
+    activity_count: int,
+    total_calories: float,
+    total_minutes: float,
+) -> Optional[Signal]:
+    score = 0.0  # higher = more likely low energy
 
-    # Activity load contribution
-    if activities_24h:
-        total_calories = sum(a.get("calories_burned") or 0 for a in activities_24h)
-        total_minutes = sum(a.get("duration_minutes") or 0 for a in activities_24h)
-        if total_calories > 600 or total_minutes > 90:
-            score += 0.3
+    if q is not None:
+        if quality_base is not None and quality_base.n >= settings.MIN_SAMPLES_FOR_PREDICTION:
+            q_mean = quality_base.mean
+            deficit_ratio = max(0.0, (q_mean - q) / max(q_mean, 1))
+            score += deficit_ratio * 0.5
+        elif q < 5:
+            score += 0.4
+
+    if d is not None and d < 360:
+        score += 0.3
+
+    if activity_count and (total_calories > 600 or total_minutes > 90):
+        score += 0.3
 
     if score < 0.45:
         return None
@@ -186,16 +264,15 @@ def detect_low_energy(
         severity=severity,
         data={
             "energy_deficit_score": round(score, 2),
-            "activity_count_24h": len(activities_24h),
+            "activity_count_24h": activity_count,
         },
         reasoning=f"Energy deficit score is {score:.2f} based on recent sleep and activity load.",
     )
 
 
 def detect_recovery_needed(
-    activities: List[Dict],
-    sleep_records: List[Dict],
-    now: datetime,
+    window: WellnessWindow,
+    baselines: Optional[BaselineProvider] = None,
 ) -> Optional[Signal]:
     """
     Trigger when recent activity load is anomalously high relative to the
@@ -203,35 +280,40 @@ def detect_recovery_needed(
 
     Uses z-score on daily calorie burn over the rolling window.
     """
+    activities = window.activities
     if len(activities) < settings.MIN_SAMPLES_FOR_PREDICTION:
         return None
 
-    # Group activities by day and sum calories
-    day_calories: Dict[str, float] = {}
-    for a in activities:
-        day = _to_utc(a["start_time"]).date().isoformat()
-        day_calories[day] = day_calories.get(day, 0.0) + (a.get("calories_burned") or 0)
-
-    if len(day_calories) < 3:
+    # Daily calorie burn baseline (stored nightly, else grouped from the window)
+    if baselines is None:
+        baselines = BaselineProvider.live(window)
+    burn_base = baselines.get("daily_burn")
+    if burn_base is None or burn_base.n < 3:
         return None
 
-    values = np.array(list(day_calories.values()), dtype=float)
-    today_key = now.date().isoformat()
-    today_load = day_calories.get(today_key, 0.0)
+    # Today's activities are one contiguous run of the sorted start times
+    day_start = float((window.today - EPOCH_ORDINAL) * DAY_SECONDS)
+    lo, hi = np.searchsorted(activities.start, [day_start, day_start + DAY_SECONDS], side="left")
+    today_load = float(np.nansum(activities.calories_burned[lo:hi]))
+
+    last_quality = _value(window.sleep.quality_score, -1) if len(window.sleep) else None
+    return recovery_signal(today_load, burn_base, last_quality)
+
 
-    mean_load = values.mean()
-    std_load = max(values.std(), 50.0)
+def recovery_signal(
+    today_load: float,
+    burn_base: Baseline,
+    last_quality: Optional[float],
+) -> Optional[Signal]:
+    mean_load = burn_base.mean
+    std_load = max(burn_base.std, 50.0)
     z = (today_load - mean_load) / std_load
 
     if z < 1.0:
         return None
 
     # Check if sleep recovery is also poor
-    poor_recovery = False
-    if sleep_records:
-        last_quality = sleep_records[0].get("quality_score")
-        if last_quality is not None and last_quality < 6:
-            poor_recovery = True
+    poor_recovery = last_quality is not None and last_quality < 6
 
     severity = min(1.0, z / 3)
     if poor_recovery:
@@ -257,20 +339,24 @@ def detect_recovery_needed(
     )
 
 
-def detect_dehydration(meals_today: List[Dict], activities_24h: List[Dict]) -> Optional[Signal]:
+def detect_dehydration(window: WellnessWindow) -> Optional[Signal]:
     """
     Estimate dehydration risk from logged water intake and activity sweat loss.
     Only triggers when water_ml data is actually present.
     """
-    water_entries = [m.get("water_ml") or 0 for m in meals_today]
-    if not any(w > 0 for w in water_entries):
+    water_entries = np.nan_to_num(window.meals.water_ml[window.meals_24h])
+    if not (water_entries > 0).any():
         # No water data logged — can't make a meaningful call
         return None
 
-    total_water_ml = sum(water_entries)
+    return dehydration_signal(
+        total_water_ml=float(water_entries.sum()),
+        activity_minutes=float(np.nansum(window.activities.duration_minutes[window.activities_24h])),
+    )
 
+
+def dehydration_signal(total_water_ml: float, activity_minutes: float) -> Optional[Signal]:
     # Adjust target upward for heavy activity
-    activity_minutes = sum(a.get("duration_minutes") or 0 for a in activities_24h)
     target_ml = 2000 + activity_minutes * 8  # ~8 ml extra per active minute
 
     deficit_ratio = max(0.0, (target_ml - total_water_ml) / target_ml)
@@ -298,64 +384,46 @@ def detect_dehydration(meals_today: List[Dict], activities_24h: List[Dict]) -> O
 
 
 def detect_anomaly(
-    sleep_records: List[Dict],
-    activities: List[Dict],
-    meals: List[Dict],
+    window: WellnessWindow,
+    user_id: Optional[int] = None,
+    fit_missing: bool = True,
 ) -> Optional[Signal]:
     """
     Use sklearn IsolationForest on a 4-feature daily wellness matrix
     [sleep_duration, sleep_quality, meal_calories, activity_calories] to
     detect days that are anomalous relative to the 14-day baseline.
 
+    With a user_id, today is scored against the user's model from the
+    nightly retrain (see anomaly_models); without one, or when no fresh
+    model exists, the forest is fitted on this window instead (with
+    fit_missing=False, nothing is detected then).  The streaming
+    ANOMALY_BACKENDs score today against the earlier days without sklearn
+    (see streaming_anomaly).
+
     Requires MIN_SAMPLES_FOR_PREDICTION days of data.
     """
-    try:
-        from sklearn.ensemble import IsolationForest
-        from sklearn.preprocessing import StandardScaler
-    except ImportError:
-        logger.warning("scikit-learn not available — skipping anomaly detection")
-        return None
-
-    # Build per-day feature matrix
-    all_dates = set()
-    for r in sleep_records:
-        all_dates.add(_to_utc(r["sleep_start"]).date())
-    for a in activities:
-        all_dates.add(_to_utc(a["start_time"]).date())
-    for m in meals:
-        all_dates.add(_to_utc(m["meal_time"]).date())
-
-    if len(all_dates) < settings.MIN_SAMPLES_FOR_PREDICTION:
-        return None
-
-    def day_features(d) -> List[float]:
-        s = [r for r in sleep_records if _to_utc(r["sleep_start"]).date() == d]
-        a = [x for x in activities if _to_utc(x["start_time"]).date() == d]
-        m = [x for x in meals if _to_utc(x["meal_time"]).date() == d]
-        return [
-            float(s[0]["duration_minutes"]) if s and s[0].get("duration_minutes") else 420.0,
-            float(s[0]["quality_score"]) if s and s[0].get("quality_score") else 7.0,
-            float(sum(x.get("calories") or 0 for x in m)),
-            float(sum(x.get("calories_burned") or 0 for x in a)),
-        ]
-
-    sorted_dates = sorted(all_dates)
-    X = np.array([day_features(d) for d in sorted_dates])
+    _, X = daily_feature_matrix(window)
 
     if X.shape[0] < settings.MIN_SAMPLES_FOR_PREDICTION:
         return None
 
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+    if settings.ANOMALY_BACKEND != "isolation_forest":
+        return _streaming_anomaly_signal(settings.ANOMALY_BACKEND, X)
 
-    clf = IsolationForest(contamination=0.1, random_state=42)
-    clf.fit(X_scaled)
+    model = load_anomaly_model(user_id, ANOMALY_FEATURES) if user_id is not None else None
+    if model is None:
+        if not fit_missing:
+            return None
+        try:
+            model = fit_anomaly_model(X, ANOMALY_FEATURES)
+        except ImportError:
+            logger.warning("scikit-learn not available — skipping anomaly detection")
+            return None
 
     # Score today (last row) — more negative = more anomalous
-    today_score = clf.score_samples(X_scaled[[-1]])[0]
-    today_pred = clf.predict(X_scaled[[-1]])[0]  # -1 = anomaly
+    today_score = model.score_samples(X[-1])[0]
 
-    if today_pred != -1:
+    if not model.is_anomaly(today_score):
         return None
 
     # Anomaly score → severity (score ranges roughly -0.7 to +0.5)
@@ -369,7 +437,7 @@ def detect_anomaly(
         severity=severity,
         data={
             "anomaly_score": round(float(today_score), 3),
-            "features": ["sleep_duration", "sleep_quality", "meal_calories", "activity_calories"],
+            "features": list(ANOMALY_FEATURES),
         },
         reasoning=(
             f"Today's wellness profile is statistically anomalous "
@@ -378,6 +446,31 @@ def detect_anomaly(
     )
 
 
+_SCORE_NAMES = {"mahalanobis": "Mahalanobis distance", "robust_z": "robust z-score"}
+
+
+def _streaming_anomaly_signal(backend: str, X: np.ndarray) -> Optional[Signal]:
+    score = streaming_anomaly.score_latest(backend, X, ANOMALY_SCALE_FLOOR)
+    severity = streaming_anomaly.severity(backend, score)
+    if severity < 0.3:
+        return None
+
+    return Signal(
+        signal_type=SignalType.STRESS_HIGH,
+        confidence=min(0.82, 0.60 + severity * 0.22),
+        severity=severity,
+        data={
+            "anomaly_score": round(score, 3),
+            "anomaly_backend": backend,
+            "features": list(ANOMALY_FEATURES),
+        },
+        reasoning=(
+            f"Today's wellness profile is statistically anomalous "
+            f"({_SCORE_NAMES[backend]}: {score:.3f}) compared to your 14-day baseline."
+        ),
+    )
+
+
 # ---------------------------------------------------------------------------
 # Main entry point
 # ---------------------------------------------------------------------------
@@ -390,43 +483,166 @@ def pick_strongest_signal(signals: List[Optional[Signal]]) -> Optional[Signal]:
     return max(candidates, key=lambda s: s.severity * s.confidence)
 
 
+# ---------------------------------------------------------------------------
+# Detector registry
+# ---------------------------------------------------------------------------
+
+# Cost classes: detectors run cheapest first
+CHEAP, MODERATE, EXPENSIVE = 0, 1, 2
+
+# Latency histogram upper bounds, in milliseconds (plus one overflow bucket)
+LATENCY_BUCKETS_MS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 50.0, 100.0, 500.0)
+
+
+class DetectorStats:
+    """Per-detector counters: runs, hits, pruned runs and a latency histogram."""
+
+    __slots__ = ("runs", "hits", "skipped", "memoised", "total_s", "buckets")
+
+    def __init__(self) -> None:
+        self.runs = 0
+        self.hits = 0
+        self.skipped = 0
+        self.memoised = 0
+        self.total_s = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, elapsed_s: float, hit: bool) -> None:
+        self.runs += 1
+        self.hits += hit
+        self.total_s += elapsed_s
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, elapsed_s * 1000)] += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "runs":        self.runs,
+            "hits":        self.hits,
+            "skipped":     self.skipped,
+            "memoised":    self.memoised,
+            "hit_rate":    round(self.hits / self.runs, 4) if self.runs else 0.0,
+            "avg_ms":      round(self.total_s * 1000 / self.runs, 3) if self.runs else 0.0,
+            "latency_ms":  {
+                **{f"le_{b:g}": n for b, n in zip(LATENCY_BUCKETS_MS, self.buckets)},
+                "inf": self.buckets[-1],
+            },
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class Detector:
+    name: str
+    cost: int
+    # The best severity × confidence the detector can return
+    max_strength: float
+    run: Callable[[WellnessWindow, BaselineProvider, Optional[int]], Optional[Signal]]
+    # Registration order; breaks strength ties the way pick_strongest_signal does
+    order: int
+    stats: DetectorStats
+    # False when the result depends only on the records, not on window.now
+    time_dependent: bool = True
+
+
+DETECTORS: List[Detector] = []
+_RUN_ORDER: List[Detector] = []
+
+
+def register_detector(
+    name: str,
+    cost: int,
+    max_strength: float,
+    run: Callable[[WellnessWindow, BaselineProvider, Optional[int]], Optional[Signal]],
+    time_dependent: bool = True,
+) -> Detector:
+    """
+    Add a detector to detect_signals; `run` takes (window, baselines, user_id).
+    Results of detectors that are not time_dependent may be memoised between
+    data writes (see detection_cache).
+    """
+    if any(d.name == name for d in DETECTORS):
+        raise ValueError(f"detector {name!r} is already registered")
+    detector = Detector(
+        name, cost, max_strength, run, len(DETECTORS), DetectorStats(), time_dependent
+    )
+    DETECTORS.append(detector)
+    _RUN_ORDER[:] = sorted(DETECTORS, key=lambda d: (d.cost, d.order))
+    return detector
+
+
+def detector_stats() -> dict:
+    return {
+        d.name: {"cost": d.cost, "max_strength": d.max_strength, **d.stats.snapshot()}
+        for d in DETECTORS
+    }
+
+
+register_detector("meal_gap", CHEAP, 0.95, lambda w, b, u: detect_meal_gap(w))
+register_detector("poor_sleep", MODERATE, 0.92, lambda w, b, u: detect_poor_sleep(w, b))
+register_detector("low_energy", MODERATE, 0.88, lambda w, b, u: detect_low_energy(w, b))
+register_detector("recovery_needed", MODERATE, 0.90, lambda w, b, u: detect_recovery_needed(w, b))
+register_detector("dehydration", CHEAP, 0.85, lambda w, b, u: detect_dehydration(w))
+# Scores the latest day with data against the user's model: unchanged until new records arrive
+register_detector("anomaly", EXPENSIVE, 0.82, lambda w, b, u: detect_anomaly(w, u), time_dependent=False)
+
+
+def _reissued(signal: Optional[Signal]) -> Optional[Signal]:
+    # A memoised signal is detected again now
+    if signal is None:
+        return None
+    return Signal(signal.type, signal.confidence, signal.severity, signal.data, signal.reasoning)
+
+
 def detect_signals(
-    meals: List[Dict],
-    sleep_records: List[Dict],
-    activities: List[Dict],
-    now: datetime,
+    window: WellnessWindow,
+    user_id: Optional[int] = None,
+    baselines: Optional[BaselineProvider] = None,
+    memo: Optional[Dict[str, Optional[Signal]]] = None,
 ) -> Optional[Signal]:
     """
-    Run all detectors and return the single most important signal.
+    Run the registered detectors and return the single most important signal.
 
-    Data expectations:
-      - meals: sorted desc by meal_time, covering PATTERN_DETECTION_WINDOW_DAYS
-      - sleep_records: sorted desc by sleep_start, same window
-      - activities: sorted desc by start_time, same window
+    `window` should cover PATTERN_DETECTION_WINDOW_DAYS up to window.now.
+    `baselines` are the user's current baselines (baselines.load_baselines);
+    without them every baseline is computed from the window.  `memo` holds
+    the results of detectors that are not time-dependent from an earlier
+    call on the same records; they are reused from it, or stored in it.
+
+    Detectors run cheapest first, and one whose max_strength cannot beat the
+    best signal so far is skipped, so the result is the one running all of
+    them would give.
     """
-    from datetime import timedelta
-
-    meals_today = [
-        m for m in meals
-        if _hours_ago(_to_utc(m["meal_time"]), now) <= 24
-    ]
-    activities_24h = [
-        a for a in activities
-        if _hours_ago(_to_utc(a["start_time"]), now) <= 24
-    ]
-
-    signals = [
-        detect_meal_gap(meals, now),
-        detect_poor_sleep(sleep_records, now),
-        detect_low_energy(sleep_records, activities_24h, now),
-        detect_recovery_needed(activities, sleep_records, now),
-        detect_dehydration(meals_today, activities_24h),
-        detect_anomaly(sleep_records, activities, meals),
-    ]
-
-    chosen = pick_strongest_signal(signals)
+    if baselines is None:
+        baselines = BaselineProvider.live(window)
+
+    chosen: Optional[Signal] = None
+    best_strength, best_order = -1.0, -1
+    detected = []
+    for detector in _RUN_ORDER:
+        if chosen is not None and (
+            detector.max_strength < best_strength
+            or (detector.max_strength == best_strength and detector.order > best_order)
+        ):
+            detector.stats.skipped += 1
+            continue
+
+        memoisable = memo is not None and not detector.time_dependent
+        if memoisable and detector.name in memo:
+            detector.stats.memoised += 1
+            signal = _reissued(memo[detector.name])
+        else:
+            t0 = time.perf_counter()
+            signal = detector.run(window, baselines, user_id)
+            detector.stats.record(time.perf_counter() - t0, signal is not None)
+            if memoisable:
+                memo[detector.name] = signal
+        if signal is None:
+            continue
+
+        detected.append(signal.type)
+        strength = signal.severity * signal.confidence
+        if strength > best_strength or (strength == best_strength and detector.order < best_order):
+            chosen, best_strength, best_order = signal, strength, detector.order
+
     if chosen:
-        detected = [s.type for s in signals if s is not None]
         logger.info(f"Signals detected: {detected}. Chose: {chosen.type} (sev={chosen.severity:.2f}, conf={chosen.confidence:.2f})")
     else:
         logger.info("No signals detected above threshold.")
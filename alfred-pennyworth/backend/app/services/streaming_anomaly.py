@@ -0,0 +1,122 @@
+"""
+Anomaly scoring without scikit-learn, selected by ANOMALY_BACKEND.
+
+  isolation_forest — the scaler + IsolationForest from anomaly_models
+                     (fitted nightly, or on the fly).  Needs scikit-learn
+                     to fit.
+  mahalanobis      — squared Mahalanobis distance of the latest day from
+                     the mean and covariance of the days before it.
+  robust_z         — root mean square of per-feature robust z-scores
+                     (median / MAD) of the latest day against the days
+                     before it.
+
+The two streaming backends score against the baseline days only, not a
+model trained with the scored day included.  On the request path the
+baseline moments are computed from the window's earlier days each time
+(RollingMoments.from_rows); scoring one day is a few small array
+operations: microseconds, no model file and no import cost.
+RollingMoments.push / pop are Welford updates for sliding a baseline one
+day at a time without recomputing it, as the agreement benchmark does
+over every day of a user's history.
+
+Each backend flags the day when its score passes a threshold.  Severity
+starts at SEVERITY_AT_THRESHOLD and reaches 1.0 at twice the threshold,
+the same range as detect_anomaly's isolation severities on flagged days.
+The thresholds are calibrated against the IsolationForest path on the
+synthetic population; see benchmarks/anomaly_agreement.py for the
+agreement and accuracy figures.
+"""
+from typing import Sequence
+
+import numpy as np
+
+BACKENDS = ("isolation_forest", "mahalanobis", "robust_z")
+STREAMING_BACKENDS = ("mahalanobis", "robust_z")
+
+# Score at which each backend flags a day (~ the forest's flag rate)
+THRESHOLDS = {"mahalanobis": 9.5, "robust_z": 2.5}
+SEVERITY_AT_THRESHOLD = 0.85
+
+# Weight moved from the off-diagonal covariances to the variances; two
+# weeks of days are too few for a stable 4 × 4 inverse otherwise
+_SHRINKAGE = 0.1
+# MAD → standard deviation for normally distributed data
+_MAD_TO_STD = 1.4826
+
+
+class RollingMoments:
+    """Count, mean and co-moment matrix of a set of rows, updated one row at a time."""
+
+    __slots__ = ("n", "mean", "m2")
+
+    def __init__(self, n_features: int) -> None:
+        self.n = 0
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros((n_features, n_features))
+
+    @classmethod
+    def from_rows(cls, X: np.ndarray) -> "RollingMoments":
+        moments = cls(X.shape[1])
+        if len(X):
+            moments.n = len(X)
+            moments.mean = X.mean(axis=0)
+            centred = X - moments.mean
+            moments.m2 = centred.T @ centred
+        return moments
+
+    def push(self, x: np.ndarray) -> None:
+        self.n += 1
+        delta = x - self.mean
+        self.mean = self.mean + delta / self.n
+        self.m2 = self.m2 + np.outer(delta, x - self.mean)
+
+    def pop(self, x: np.ndarray) -> None:
+        """Remove a row that was pushed (or included in from_rows) earlier."""
+        if self.n <= 1:
+            self.__init__(len(self.mean))
+            return
+        old_mean = self.mean
+        self.n -= 1
+        self.mean = old_mean - (x - old_mean) / self.n
+        self.m2 = self.m2 - np.outer(x - self.mean, x - old_mean)
+
+    def covariance(self) -> np.ndarray:
+        return self.m2 / max(self.n - 1, 1)
+
+    def distance(self, x: np.ndarray, scale_floor: np.ndarray) -> float:
+        """
+        Squared Mahalanobis distance of x from the rows, with the covariance
+        shrunk towards its diagonal and every variance at least scale_floor².
+        """
+        cov = self.covariance()
+        variances = np.diag(cov)
+        cov = (1 - _SHRINKAGE) * cov
+        cov[np.diag_indices_from(cov)] = variances + scale_floor ** 2
+        delta = x - self.mean
+        return float(delta @ np.linalg.solve(cov, delta))
+
+
+def robust_z(baseline: np.ndarray, x: np.ndarray, scale_floor: np.ndarray) -> float:
+    """RMS of x's per-feature robust z-scores against the baseline rows."""
+    median = np.median(baseline, axis=0)
+    spread = np.median(np.abs(baseline - median), axis=0) * _MAD_TO_STD
+    z = (x - median) / np.maximum(spread, scale_floor)
+    return float(np.sqrt(np.mean(z * z)))
+
+
+def severity(backend: str, score: float) -> float:
+    """0.0 below the backend's threshold, else SEVERITY_AT_THRESHOLD … 1.0."""
+    threshold = THRESHOLDS[backend]
+    if not score > threshold:
+        return 0.0
+    return min(1.0, SEVERITY_AT_THRESHOLD + (1 - SEVERITY_AT_THRESHOLD) * (score - threshold) / threshold)
+
+
+def score_latest(backend: str, X: np.ndarray, scale_floor: Sequence[float]) -> float:
+    """Score the last row of a daily feature matrix against the rows before it."""
+    floor = np.asarray(scale_floor, dtype=np.float64)
+    if backend == "mahalanobis":
+        return RollingMoments.from_rows(X[:-1]).distance(X[-1], floor)
+    if backend == "robust_z":
+        return robust_z(X[:-1], X[-1], floor)
+    raise ValueError(f"ANOMALY_BACKEND must be one of {BACKENDS}, got {backend!r}")
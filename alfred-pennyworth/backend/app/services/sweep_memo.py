@@ -0,0 +1,213 @@
+"""
+What the intervention sweep keeps of each user between runs.
+
+Most users the sweep reads have logged nothing since its last run.  For
+every user it detected from the tables, the sweep keeps a memo in Redis,
+under the data version it read before the tables (detection_cache) and
+until the end of the UTC day:
+
+  * the user's BATCH_METRICS baselines, which the streaming statistics
+    only change on a new record or a new day;
+  * the results of the detectors that depend only on the records
+    (register_detector's time_dependent=False), by name;
+  * the rows the time-dependent detectors can still read before the day
+    ends: the latest meal and night, the last 24 hours of meals and
+    activities, the nights that ended in the last 18 hours, and the start
+    of every activity in the window (recovery counts them).
+
+On the next run a user whose version and day are unchanged costs two
+Redis reads: the time-dependent detectors run again on those rows at the
+new `now`, cut at the new window start, which is what the tables would
+give; the data-only results are reused for the day, as detection_cache
+reuses them.  The window query, the baselines and the data-only
+detectors are skipped.  Users without a memo, and those whose memo lacks a data-only
+result the new rule signal no longer rules out, take the full path.
+
+A memo is only kept when every BATCH_METRICS baseline came from the
+streaming statistics; the window fallback moves with `now`.  When Redis
+is unreachable there is no memo and every user takes the full path.
+"""
+import json
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timedelta
+from typing import Dict, List, Mapping, Optional
+
+import numpy as np
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.redis_client import mark_redis_down, redis_client
+from app.services.alfred_agent import Signal, SignalType
+from app.services.baselines import Baseline
+from app.services.signal_batch import BATCH_METRICS
+from app.services.wellness_window import (
+    DAY_SECONDS,
+    EPOCH_ORDINAL,
+    LAST_NIGHT_HOURS,
+    ActivityColumns,
+    MealColumns,
+    SleepColumns,
+    WellnessWindow,
+    epoch_seconds,
+)
+
+
+def _key(user_id: int) -> str:
+    return f"alfred:swmemo:{user_id}"
+
+
+@dataclass(slots=True)
+class SweepMemo:
+    version: str
+    # UTC day ordinal the memo was taken on
+    day: int
+    baselines: Dict[str, Optional[Baseline]]
+    meals: MealColumns
+    sleep: SleepColumns
+    activities: ActivityColumns
+    # Results of the data-only detectors, by detector name
+    memo: Dict[str, Optional[Signal]] = field(default_factory=dict)
+
+    def window_at(self, now: datetime) -> WellnessWindow:
+        """The kept rows seen at `now`, without those older than the window."""
+        since = now - timedelta(days=settings.PATTERN_DETECTION_WINDOW_DAYS)
+        return WellnessWindow(self.meals, self.sleep, self.activities, now).at(now, since)
+
+
+def from_window(
+    version: str,
+    window: WellnessWindow,
+    baselines: Mapping[str, Optional[Baseline]],
+    memo: Dict[str, Optional[Signal]],
+) -> Optional[SweepMemo]:
+    """The memo of a window just detected on; None if a baseline came from the window."""
+    if any(metric not in baselines for metric in BATCH_METRICS):
+        return None
+    meals, sleep, activities = window.meals, window.sleep, window.activities
+
+    # Meals and activities by time: the last 24 hours, and the latest meal
+    first_meal = min(window.meals_24h.start, max(len(meals) - 1, 0))
+    first_activity = window.activities_24h.start
+    nights = sleep.end >= window.now_ts - LAST_NIGHT_HOURS * 3600
+    nights[-1:] = True
+    # Older activities only count
+    unread = np.full(first_activity, np.nan)
+
+    return SweepMemo(
+        version=version,
+        day=window.today,
+        baselines={metric: baselines[metric] for metric in BATCH_METRICS},
+        meals=MealColumns(
+            meals.time[first_meal:], meals.calories[first_meal:], meals.water_ml[first_meal:]
+        ),
+        sleep=SleepColumns(
+            sleep.start[nights], sleep.end[nights],
+            sleep.duration_minutes[nights], sleep.quality_score[nights],
+        ),
+        activities=ActivityColumns(
+            activities.start,
+            np.concatenate([unread, activities.calories_burned[first_activity:]]),
+            np.concatenate([unread, activities.duration_minutes[first_activity:]]),
+        ),
+        memo=dict(memo),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Encoding
+# ---------------------------------------------------------------------------
+
+def _signal(signal: Optional[Signal]) -> Optional[Dict]:
+    if signal is None:
+        return None
+    return {
+        "type": signal.type.value, "confidence": signal.confidence,
+        "severity": signal.severity, "data": signal.data, "reasoning": signal.reasoning,
+    }
+
+
+def _columns(columns) -> List[List[float]]:
+    return [getattr(columns, f.name).tolist() for f in fields(columns)]
+
+
+def _encode(entry: SweepMemo) -> str:
+    return json.dumps({
+        "version": entry.version,
+        "day": entry.day,
+        "baselines": {
+            metric: None if b is None else [b.mean, b.std, b.n]
+            for metric, b in entry.baselines.items()
+        },
+        "meals": _columns(entry.meals),
+        "sleep": _columns(entry.sleep),
+        "activities": _columns(entry.activities),
+        "memo": {name: _signal(signal) for name, signal in entry.memo.items()},
+    }, default=float)
+
+
+def _decode(raw: str) -> SweepMemo:
+    data = json.loads(raw)
+
+    def columns(columns_cls, values):
+        return columns_cls(*(np.asarray(v, dtype=np.float64) for v in values))
+
+    return SweepMemo(
+        version=data["version"],
+        day=data["day"],
+        baselines={
+            metric: None if b is None else Baseline(mean=b[0], std=b[1], n=b[2])
+            for metric, b in data["baselines"].items()
+        },
+        meals=columns(MealColumns, data["meals"]),
+        sleep=columns(SleepColumns, data["sleep"]),
+        activities=columns(ActivityColumns, data["activities"]),
+        memo={
+            name: None if s is None else Signal(
+                SignalType(s["type"]), s["confidence"], s["severity"], s["data"], s["reasoning"]
+            )
+            for name, s in data["memo"].items()
+        },
+    )
+
+
+# ---------------------------------------------------------------------------
+# Redis
+# ---------------------------------------------------------------------------
+
+async def load(versions: Mapping[int, str], now: datetime) -> Dict[int, SweepMemo]:
+    """The memos of the users of `versions` taken today under that version.  Never raises."""
+    user_ids = list(versions)
+    if not user_ids:
+        return {}
+    try:
+        raw = await redis_client().mget([_key(uid) for uid in user_ids])
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+        logger.warning(f"Sweep memos unavailable for {len(user_ids)} users: {exc}")
+        return {}
+    today = int(epoch_seconds(now) // DAY_SECONDS) + EPOCH_ORDINAL
+    memos: Dict[int, SweepMemo] = {}
+    for user_id, value in zip(user_ids, raw):
+        if value is None:
+            continue
+        entry = _decode(value)
+        if entry.version == versions[user_id] and entry.day == today:
+            memos[user_id] = entry
+    return memos
+
+
+async def store(memos: Mapping[int, SweepMemo], now: datetime) -> None:
+    """Keep `memos` until the end of the UTC day.  Never raises."""
+    if not memos:
+        return
+    # The memos are only read on the day they were taken
+    ttl = max(1, DAY_SECONDS - int(epoch_seconds(now) % DAY_SECONDS))
+    try:
+        pipe = redis_client().pipeline(transaction=False)
+        for user_id, entry in memos.items():
+            pipe.set(_key(user_id), _encode(entry), ex=ttl)
+        await pipe.execute()
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+        logger.warning(f"Sweep memos not stored for {len(memos)} users: {exc}")
@@ -0,0 +1,282 @@
+"""
+Data access for signal detection and intervention generation.
+
+Every query selects only the columns that WellnessWindow, the detectors
+and the generator read; no ORM objects are built.  Each step is a single
+statement, so one round trip on one connection: the tables it reads are
+combined with UNION ALL (_union), each keeping columns of its own so none
+has to share a type with another table's, and split apart again
+(_split).  The caller's session is used when one is passed;
+/interventions/generate passes its request session, so a request holds
+one connection throughout.
+
+  fetch_window / fetch_batch — meals, sleep and activities of the detection
+      window, returned as a WellnessWindow / WindowBatch, with each user's
+      latest meals and nights for the generator (Patterns);
+  fetch_contexts — upcoming calendar and the last day's interventions,
+      joined with those patterns into the tuples the generator takes (and
+      the patterns read here for users the sweep did not load);
+  fetch_gate_rows — what intervention_gate rebuilds a user's gate state,
+      and the profile the generator reads, from when Redis has none.
+
+Both /interventions/generate (one user) and the periodic sweep (a chunk of
+users) read through here.
+"""
+import heapq
+from collections import namedtuple
+from datetime import datetime, timedelta
+from operator import attrgetter
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import Integer, cast, func, literal_column, null, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.activity import Activity
+from app.models.calendar_event import CalendarEvent
+from app.models.intervention import Intervention
+from app.models.meal import Meal
+from app.models.sleep import Sleep
+from app.models.user import User
+from app.services.interventions import (
+    PATTERN_ROWS, RECENT_INTERVENTIONS, calendar_entry, intervention_entry,
+    meal_entry, sleep_entry,
+)
+from app.services.wellness_window import WellnessWindow, WindowBatch
+
+# (calendar, meals, sleep, recent interventions) of one user
+Context = Tuple[List[Dict], List[Dict], List[Dict], List[Dict]]
+# (latest meals, latest nights) of one user, newest first
+Patterns = Tuple[List[Dict], List[Dict]]
+
+# What intervention_gate reads, and keeps for user_data()
+_GATE_COLUMNS = (
+    User.id, User.timezone, User.quiet_hours_start, User.quiet_hours_end,
+    User.max_interventions_per_day, User.intervention_cooldown_hours,
+    User.intervention_confidence_threshold,
+    User.dietary_preferences, User.fitness_goals,
+)
+
+
+async def _rows(db: Optional[AsyncSession], statement) -> List[Any]:
+    """The rows of `statement`, on `db` or one pooled session."""
+    if db is None:
+        async with AsyncSessionLocal() as session:
+            return await _rows(session, statement)
+    return (await db.execute(statement)).all()
+
+
+def _union(*parts: Select):
+    """
+    `parts` as one UNION ALL statement.  A row of part p carries p in its
+    "part" column and its values in p's own columns; the columns of the
+    other parts are NULL, cast to their types, so no column mixes tables.
+    """
+    columns = [(p, column) for p, part in enumerate(parts) for column in part.selected_columns]
+    nulls = [
+        null() if column.type._isnull else cast(null(), column.type)
+        for _, column in columns
+    ]
+    return union_all(*(
+        part.with_only_columns(
+            literal_column(str(p), Integer).label("part"),
+            *(
+                (column if owner == p else nulls[i]).label(f"c{i}")
+                for i, (owner, column) in enumerate(columns)
+            ),
+        )
+        for p, part in enumerate(parts)
+    ))
+
+
+def _split(rows: Sequence[Any], *parts: Select) -> List[List[Any]]:
+    """The rows of a _union of `parts`, one list per part, named like its columns."""
+    layout, start = [], 1
+    for part in parts:
+        names = part.selected_columns.keys()
+        layout.append((namedtuple("Row", names)._make, start, start + len(names)))
+        start += len(names)
+    split: List[List[Any]] = [[] for _ in parts]
+    for row in rows:
+        make, first, last = layout[row.part]
+        split[row.part].append(make(row[first:last]))
+    return split
+
+
+async def _fetch(db: Optional[AsyncSession], *parts: Select) -> List[List[Any]]:
+    """The rows of each of `parts`, read in one round trip."""
+    return _split(await _rows(db, _union(*parts)), *parts)
+
+
+def _cutoff(now: datetime) -> datetime:
+    return now - timedelta(days=settings.PATTERN_DETECTION_WINDOW_DAYS)
+
+
+# ---------------------------------------------------------------------------
+# Users
+# ---------------------------------------------------------------------------
+
+async def fetch_active_user_ids(
+    user_ids: Sequence[int], db: Optional[AsyncSession] = None
+) -> Set[int]:
+    rows = await _rows(db, select(User.id).where(User.id.in_(user_ids), User.is_active.is_(True)))
+    return {row.id for row in rows}
+
+
+# ---------------------------------------------------------------------------
+# Detection window
+# ---------------------------------------------------------------------------
+
+def _window_parts(user_ids: Sequence[int], cutoff: datetime) -> Tuple[Select, Select, Select]:
+    # meal_type and description are only for the generator's patterns
+    return (
+        select(Meal.user_id, Meal.meal_time, Meal.calories, Meal.water_ml,
+               Meal.meal_type, Meal.description)
+        .where(Meal.user_id.in_(user_ids), Meal.meal_time >= cutoff),
+        select(Sleep.user_id, Sleep.sleep_start, Sleep.sleep_end,
+               Sleep.duration_minutes, Sleep.quality_score)
+        .where(Sleep.user_id.in_(user_ids), Sleep.sleep_start >= cutoff),
+        select(Activity.user_id, Activity.start_time, Activity.calories_burned,
+               Activity.duration_minutes)
+        .where(Activity.user_id.in_(user_ids), Activity.start_time >= cutoff),
+    )
+
+
+def _pattern_parts(user_ids: Sequence[int], cutoff: datetime) -> Tuple[Select, Select]:
+    """Each user's PATTERN_ROWS latest meals and nights of the window, as _window_parts reads them."""
+    def latest(table, time_column, *columns):
+        rank = func.row_number().over(
+            partition_by=table.user_id, order_by=time_column.desc()
+        ).label("rank")
+        ranked = (
+            select(table.user_id, time_column, *columns, rank)
+            .where(table.user_id.in_(user_ids), time_column >= cutoff)
+            .subquery()
+        )
+        return select(ranked).where(ranked.c.rank <= PATTERN_ROWS)
+
+    return (
+        latest(Meal, Meal.meal_time, Meal.calories, Meal.water_ml, Meal.meal_type, Meal.description),
+        latest(Sleep, Sleep.sleep_start, Sleep.sleep_end, Sleep.duration_minutes, Sleep.quality_score),
+    )
+
+
+def _patterns(meals: Sequence[Any], sleep: Sequence[Any]) -> Dict[int, Patterns]:
+    """Each user's PATTERN_ROWS latest meals and nights of the window, newest first."""
+    rows: Dict[int, Tuple[List[Any], List[Any]]] = {}
+    for slot, table in enumerate((meals, sleep)):
+        for row in table:
+            rows.setdefault(row.user_id, ([], []))[slot].append(row)
+    by_meal_time, by_sleep_start = attrgetter("meal_time"), attrgetter("sleep_start")
+    return {
+        uid: (
+            [meal_entry(m) for m in heapq.nlargest(PATTERN_ROWS, user_meals, key=by_meal_time)],
+            [sleep_entry(s) for s in heapq.nlargest(PATTERN_ROWS, user_sleep, key=by_sleep_start)],
+        )
+        for uid, (user_meals, user_sleep) in rows.items()
+    }
+
+
+async def fetch_window(
+    user_id: int, now: datetime, db: Optional[AsyncSession] = None
+) -> Tuple[WellnessWindow, Patterns]:
+    """The user's PATTERN_DETECTION_WINDOW_DAYS up to `now`, and their patterns."""
+    meals, sleep, activities = await _fetch(db, *_window_parts([user_id], _cutoff(now)))
+    window = WellnessWindow.from_rows(meals, sleep, activities, now=now)
+    return window, _patterns(meals, sleep).get(user_id, ([], []))
+
+
+async def fetch_batch(
+    user_ids: Sequence[int], now: datetime, db: Optional[AsyncSession] = None
+) -> Tuple[WindowBatch, Dict[int, Patterns]]:
+    """The windows of all `user_ids`, and the patterns of those with any rows."""
+    meals, sleep, activities = await _fetch(db, *_window_parts(user_ids, _cutoff(now)))
+    return WindowBatch.from_rows(user_ids, meals, sleep, activities, now), _patterns(meals, sleep)
+
+
+# ---------------------------------------------------------------------------
+# Generator context
+# ---------------------------------------------------------------------------
+
+async def fetch_contexts(
+    patterns: Dict[int, Optional[Patterns]], now: datetime, db: Optional[AsyncSession] = None
+) -> Dict[int, Context]:
+    """
+    What the generator is given besides the signal, for each user of
+    `patterns` (from fetch_window / fetch_batch, which already read them;
+    where they are None they are read here, in the same statement).
+    """
+    user_ids = list(patterns)
+    if not user_ids:
+        return {}
+    unread = [uid for uid, p in patterns.items() if p is None]
+
+    rank = func.row_number().over(
+        partition_by=Intervention.user_id, order_by=Intervention.created_at.desc()
+    ).label("rank")
+    ranked = (
+        select(Intervention.user_id, Intervention.created_at, Intervention.type,
+               Intervention.title, Intervention.user_response, rank)
+        .where(Intervention.user_id.in_(user_ids),
+               Intervention.created_at >= now - timedelta(hours=24))
+        .subquery()
+    )
+    calendar, recent, *latest = await _fetch(
+        db,
+        select(CalendarEvent.user_id, CalendarEvent.title, CalendarEvent.start_time,
+               CalendarEvent.end_time, CalendarEvent.duration_minutes)
+        .where(
+            CalendarEvent.user_id.in_(user_ids),
+            CalendarEvent.start_time >= now,
+            CalendarEvent.start_time <= now + timedelta(days=1),
+        ),
+        select(ranked).where(ranked.c.rank <= RECENT_INTERVENTIONS),
+        *(_pattern_parts(unread, _cutoff(now)) if unread else ()),
+    )
+    if unread:
+        read = _patterns(*latest)
+        patterns = {uid: read.get(uid, ([], [])) if p is None else p for uid, p in patterns.items()}
+
+    contexts: Dict[int, Context] = {
+        uid: ([], meals, sleep, []) for uid, (meals, sleep) in patterns.items()
+    }
+    for row in sorted(calendar, key=attrgetter("start_time")):
+        contexts[row.user_id][0].append(calendar_entry(row))
+    for row in sorted(recent, key=attrgetter("rank")):
+        contexts[row.user_id][3].append(intervention_entry(row))
+    return contexts
+
+
+# ---------------------------------------------------------------------------
+# Intervention gate
+# ---------------------------------------------------------------------------
+
+async def fetch_gate_rows(
+    user_ids: Sequence[int], now: datetime, db: Optional[AsyncSession] = None
+) -> Tuple[Dict[int, Any], Dict[int, List[datetime]], Dict[int, datetime]]:
+    """
+    Gate preferences and profile of `user_ids`, the times of their
+    interventions in the last 24 hours (every local day that has started
+    within them) and the time of their latest one (for cooldowns longer
+    than a day).
+    """
+    users, recent, latest = await _fetch(
+        db,
+        select(*_GATE_COLUMNS).where(User.id.in_(user_ids)),
+        select(Intervention.user_id, Intervention.created_at)
+        .where(Intervention.user_id.in_(user_ids),
+               Intervention.created_at >= now - timedelta(hours=24)),
+        select(Intervention.user_id, func.max(Intervention.created_at).label("created_at"))
+        .where(Intervention.user_id.in_(user_ids))
+        .group_by(Intervention.user_id),
+    )
+    sent: Dict[int, List[datetime]] = {}
+    for row in recent:
+        sent.setdefault(row.user_id, []).append(row.created_at)
+    return (
+        {row.id: row for row in users},
+        sent,
+        {row.user_id: row.created_at for row in latest},
+    )
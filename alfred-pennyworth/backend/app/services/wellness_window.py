@@ -0,0 +1,335 @@
+"""
+Columnar view of one user's detection window (meals, sleep, activities).
+
+Each table holds NumPy columns sorted ascending by its main timestamp.
+Timestamps are UTC epoch seconds (float64): naive datetimes are taken as
+UTC, as the detectors always did.  Numeric fields are float64 with NaN
+where the row has no value, so 0 and "not logged" stay distinct.
+
+The slices every detector used to recompute are computed once, by binary
+search on the sorted timestamps.  meals_24h and activities_24h hold what
+happened in the last 24 hours, and last_night is the latest sleep that
+ended within the last 18.
+
+Build a window straight from query results with from_rows.  It takes ORM
+instances or projected rows, reading attributes by column name.
+from_records does the same for the plain dicts older callers pass.
+
+WindowBatch concatenates the windows of many users, with per-user offsets
+into each table, for the batched detectors in signal_batch.
+"""
+from dataclasses import dataclass, fields
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Iterable, Optional, Sequence
+
+import numpy as np
+
+DAY_SECONDS = 86400
+# date.toordinal() of the day containing epoch second 0
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# detect_signals' look-back for "today" and for last night's sleep
+RECENT_HOURS = 24
+LAST_NIGHT_HOURS = 18
+
+
+def epoch_seconds(dt: datetime) -> float:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def day_ordinals(ts: np.ndarray) -> np.ndarray:
+    """UTC calendar day of each epoch second, as date.toordinal() numbers."""
+    return np.floor_divide(ts, DAY_SECONDS).astype(np.int64) + EPOCH_ORDINAL
+
+
+def _columns(
+    rows: Sequence[Any],
+    time_fields: Sequence[str],
+    value_fields: Sequence[str],
+    get: Callable[[Any, str], Any],
+    owner: Optional[np.ndarray] = None,
+) -> list[np.ndarray]:
+    """
+    Timestamp columns, then value columns, all sorted by the first timestamp.
+
+    With `owner` (a user index per row) rows are sorted by owner first, and
+    the sorted owner column is appended last.
+    """
+    n = len(rows)
+    cols = [
+        np.fromiter((epoch_seconds(get(r, name)) for r in rows), dtype=np.float64, count=n)
+        for name in time_fields
+    ]
+    for name in value_fields:
+        cols.append(np.fromiter(
+            (np.nan if (v := get(r, name)) is None else v for r in rows),
+            dtype=np.float64, count=n,
+        ))
+    if owner is None:
+        order = np.argsort(cols[0], kind="stable")
+    else:
+        order = np.lexsort((cols[0], owner))
+        cols.append(owner)
+    return [c[order] for c in cols]
+
+
+def _slice(columns, sl: slice):
+    return type(columns)(*(getattr(columns, f.name)[sl] for f in fields(columns)))
+
+
+def _concat(columns_cls, tables: Sequence[Any]):
+    return columns_cls(*(
+        np.concatenate([getattr(t, f.name) for t in tables]) if tables else np.empty(0)
+        for f in fields(columns_cls)
+    ))
+
+
+def _offsets(owner: np.ndarray, n_users: int) -> np.ndarray:
+    offsets = np.zeros(n_users + 1, dtype=np.int64)
+    np.cumsum(np.bincount(owner, minlength=n_users), out=offsets[1:])
+    return offsets
+
+
+def _attr(row: Any, name: str) -> Any:
+    return getattr(row, name, None)
+
+
+def _key(row: dict, name: str) -> Any:
+    return row.get(name)
+
+
+@dataclass(frozen=True, slots=True)
+class MealColumns:
+    time: np.ndarray
+    calories: np.ndarray
+    water_ml: np.ndarray
+
+    TIME_FIELDS = ("meal_time",)
+    VALUE_FIELDS = ("calories", "water_ml")
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+
+@dataclass(frozen=True, slots=True)
+class SleepColumns:
+    start: np.ndarray
+    end: np.ndarray
+    duration_minutes: np.ndarray
+    quality_score: np.ndarray
+
+    TIME_FIELDS = ("sleep_start", "sleep_end")
+    VALUE_FIELDS = ("duration_minutes", "quality_score")
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+
+@dataclass(frozen=True, slots=True)
+class ActivityColumns:
+    start: np.ndarray
+    calories_burned: np.ndarray
+    duration_minutes: np.ndarray
+
+    TIME_FIELDS = ("start_time",)
+    VALUE_FIELDS = ("calories_burned", "duration_minutes")
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+
+class WellnessWindow:
+    """One user's meals, sleep and activities up to `now`, as columns."""
+
+    __slots__ = (
+        "meals", "sleep", "activities", "now", "now_ts",
+        "meals_24h", "activities_24h", "last_night",
+    )
+
+    def __init__(
+        self,
+        meals: MealColumns,
+        sleep: SleepColumns,
+        activities: ActivityColumns,
+        now: datetime,
+    ) -> None:
+        self.meals = meals
+        self.sleep = sleep
+        self.activities = activities
+        self.now = now
+        self.now_ts = epoch_seconds(now)
+
+        recent = self.now_ts - RECENT_HOURS * 3600
+        self.meals_24h = slice(int(np.searchsorted(meals.time, recent, side="left")), len(meals))
+        self.activities_24h = slice(
+            int(np.searchsorted(activities.start, recent, side="left")), len(activities)
+        )
+
+        # Sleep is sorted by start, so the latest start among the sessions that
+        # ended recently is the highest index among them
+        by_end = np.argsort(sleep.end, kind="stable")
+        first = int(np.searchsorted(sleep.end[by_end], self.now_ts - LAST_NIGHT_HOURS * 3600, side="left"))
+        self.last_night: Optional[int] = int(by_end[first:].max()) if first < len(by_end) else None
+
+    def at(self, now: datetime, since: Optional[datetime] = None) -> "WellnessWindow":
+        """
+        The same records seen at `now`, without those that start before
+        `since` (what a fresh query with that cutoff would return).
+        """
+        if since is None:
+            return WellnessWindow(self.meals, self.sleep, self.activities, now)
+        cutoff = epoch_seconds(since)
+
+        def trimmed(columns, times):
+            return _slice(columns, slice(int(np.searchsorted(times, cutoff, side="left")), None))
+
+        return WellnessWindow(
+            trimmed(self.meals, self.meals.time),
+            trimmed(self.sleep, self.sleep.start),
+            trimmed(self.activities, self.activities.start),
+            now,
+        )
+
+    @property
+    def today(self) -> int:
+        """Today's UTC day ordinal."""
+        return int(self.now_ts // DAY_SECONDS) + EPOCH_ORDINAL
+
+    @classmethod
+    def from_rows(
+        cls,
+        meals: Iterable[Any],
+        sleep: Iterable[Any],
+        activities: Iterable[Any],
+        now: datetime,
+    ) -> "WellnessWindow":
+        """From ORM instances or projected rows (attributes named like the columns)."""
+        return cls._build(list(meals), list(sleep), list(activities), now, _attr)
+
+    @classmethod
+    def from_records(
+        cls,
+        meals: Iterable[dict],
+        sleep_records: Iterable[dict],
+        activities: Iterable[dict],
+        now: datetime,
+    ) -> "WellnessWindow":
+        """From dicts keyed like the columns, in any order."""
+        return cls._build(list(meals), list(sleep_records), list(activities), now, _key)
+
+    @classmethod
+    def _build(cls, meals, sleep, activities, now, get) -> "WellnessWindow":
+        def table(columns_cls, rows):
+            return columns_cls(*_columns(rows, columns_cls.TIME_FIELDS, columns_cls.VALUE_FIELDS, get))
+
+        return cls(
+            table(MealColumns, meals),
+            table(SleepColumns, sleep),
+            table(ActivityColumns, activities),
+            now,
+        )
+
+
+class WindowBatch:
+    """
+    The windows of many users at one `now`, concatenated.
+
+    Each table is one set of columns sorted by user and then by time.  The
+    rows of user i are [offsets[i], offsets[i + 1]) in meal_offsets,
+    sleep_offsets and activity_offsets, in the order of user_ids.
+    """
+
+    __slots__ = (
+        "user_ids", "meals", "sleep", "activities",
+        "meal_offsets", "sleep_offsets", "activity_offsets", "now", "now_ts",
+    )
+
+    def __init__(
+        self,
+        user_ids: Sequence[int],
+        meals: MealColumns,
+        sleep: SleepColumns,
+        activities: ActivityColumns,
+        meal_offsets: np.ndarray,
+        sleep_offsets: np.ndarray,
+        activity_offsets: np.ndarray,
+        now: datetime,
+    ) -> None:
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.meals = meals
+        self.sleep = sleep
+        self.activities = activities
+        self.meal_offsets = meal_offsets
+        self.sleep_offsets = sleep_offsets
+        self.activity_offsets = activity_offsets
+        self.now = now
+        self.now_ts = epoch_seconds(now)
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def window(self, i: int) -> WellnessWindow:
+        """User i's window, as views into the batch columns."""
+        return WellnessWindow(
+            _slice(self.meals, slice(self.meal_offsets[i], self.meal_offsets[i + 1])),
+            _slice(self.sleep, slice(self.sleep_offsets[i], self.sleep_offsets[i + 1])),
+            _slice(self.activities, slice(self.activity_offsets[i], self.activity_offsets[i + 1])),
+            self.now,
+        )
+
+    @classmethod
+    def from_rows(
+        cls,
+        user_ids: Sequence[int],
+        meals: Iterable[Any],
+        sleep: Iterable[Any],
+        activities: Iterable[Any],
+        now: datetime,
+    ) -> "WindowBatch":
+        """
+        From rows of any of the users (ORM instances or projected rows with a
+        user_id), e.g. one query per table for a whole batch.  Rows of other
+        users are ignored.
+        """
+        index = {int(uid): i for i, uid in enumerate(user_ids)}
+
+        def table(columns_cls, rows):
+            rows = [r for r in rows if r.user_id in index]
+            owner = np.fromiter((index[r.user_id] for r in rows), dtype=np.int64, count=len(rows))
+            *cols, owner = _columns(rows, columns_cls.TIME_FIELDS, columns_cls.VALUE_FIELDS, _attr, owner)
+            return columns_cls(*cols), _offsets(owner, len(index))
+
+        meal_cols, meal_offsets = table(MealColumns, meals)
+        sleep_cols, sleep_offsets = table(SleepColumns, sleep)
+        activity_cols, activity_offsets = table(ActivityColumns, activities)
+        return cls(
+            user_ids, meal_cols, sleep_cols, activity_cols,
+            meal_offsets, sleep_offsets, activity_offsets, now,
+        )
+
+    @classmethod
+    def from_windows(cls, user_ids: Sequence[int], windows: Sequence[WellnessWindow]) -> "WindowBatch":
+        """Concatenate per-user windows, which must share one `now`."""
+        if len(user_ids) != len(windows):
+            raise ValueError("user_ids and windows must have the same length")
+        if len({w.now_ts for w in windows}) > 1:
+            raise ValueError("all windows in a batch must share the same now")
+
+        def offsets(tables):
+            out = np.zeros(len(tables) + 1, dtype=np.int64)
+            np.cumsum([len(t) for t in tables], out=out[1:])
+            return out
+
+        meals = [w.meals for w in windows]
+        sleep = [w.sleep for w in windows]
+        activities = [w.activities for w in windows]
+        return cls(
+            user_ids,
+            _concat(MealColumns, meals),
+            _concat(SleepColumns, sleep),
+            _concat(ActivityColumns, activities),
+            offsets(meals), offsets(sleep), offsets(activities),
+            windows[0].now if windows else datetime.now(timezone.utc),
+        )
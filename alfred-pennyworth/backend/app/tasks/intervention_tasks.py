@@ -1,15 +1,86 @@
 """
 Celery tasks for intervention generation.
+
+check_and_generate_interventions runs every INTERVENTION_SWEEP_INTERVAL_MINUTES
+and only fans out: it pages the active users, cuts them into fixed-size
+chunks and runs generate_interventions_for_chunk over them as one group.
+Chunks that have not started by the next sweep expire.  The work itself is
+in app.services.intervention_sweep.
 """
+import asyncio
+from datetime import datetime, timezone
+from typing import List, Optional
+
 from app.core.celery_app import celery_app
 from app.core.logging import logger
 
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _run(coro):
+    """
+    Run a coroutine on this worker process's event loop.  The loop outlives
+    the task, so the shared async clients (database pool, Redis, OpenAI)
+    stay bound to one loop.
+    """
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+    return _loop.run_until_complete(coro)
+
 
 @celery_app.task
 def check_and_generate_interventions():
     """Periodic task to check all users and generate interventions."""
     logger.info("Checking for needed interventions...")
-    # TODO: Implement user loop and intervention generation
-    return {"status": "completed"}
+    try:
+        return _run(_dispatch_sweep())
+    except Exception as exc:
+        logger.error(f"Intervention sweep dispatch failed: {exc}", exc_info=True)
+        return {"status": "error", "detail": str(exc)}
+
+
+async def _dispatch_sweep() -> dict:
+    from celery import group
+
+    from app.core.config import settings
+    from app.services import intervention_sweep
+
+    now = datetime.now(timezone.utc)
+    sweep_id = intervention_sweep.new_sweep_id(now)
+    size = settings.INTERVENTION_SWEEP_CHUNK_SIZE
+
+    chunks: List[List[int]] = []
+    pending: List[int] = []
+    async for page in intervention_sweep.active_user_id_pages(settings.INTERVENTION_SWEEP_PAGE_SIZE):
+        pending.extend(page)
+        while len(pending) >= size:
+            chunks.append(pending[:size])
+            del pending[:size]
+    if pending:
+        chunks.append(pending)
+
+    users = sum(len(chunk) for chunk in chunks)
+    await intervention_sweep.start_sweep(sweep_id, users, len(chunks), now)
+    if chunks:
+        group(
+            generate_interventions_for_chunk.s(chunk, sweep_id, index)
+            for index, chunk in enumerate(chunks)
+        ).apply_async(expires=settings.INTERVENTION_SWEEP_INTERVAL_MINUTES * 60)
+
+    logger.info(f"Sweep {sweep_id}: {users} users in {len(chunks)} chunks dispatched")
+    return {"status": "dispatched", "sweep_id": sweep_id, "users": users, "chunks": len(chunks)}
+
+
+@celery_app.task
+def generate_interventions_for_chunk(user_ids: List[int], sweep_id: str, index: int):
+    """Detect signals and generate interventions for one chunk of users."""
+    from app.services.intervention_sweep import run_chunk
+
+    try:
+        return _run(run_chunk(user_ids, sweep_id, index))
+    except Exception as exc:
+        logger.error(f"Sweep {sweep_id} chunk {index} failed: {exc}", exc_info=True)
+        return {"status": "error", "chunk": index, "detail": str(exc)}
 
 ################################################################################
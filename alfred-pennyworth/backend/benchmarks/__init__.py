@@ -0,0 +1,10 @@
+"""
+Benchmark harnesses for the backend services.
+
+Run from the backend directory with the usual environment (.env) in place:
+
+    python -m benchmarks.nutrition_bench --output before.json
+    python -m benchmarks.nutrition_bench --compare before.json
+    python -m benchmarks.signal_bench --users 100,1000 --days 7,14,30
+    python -m benchmarks.anomaly_agreement --users 100 --days 28
+"""
@@ -0,0 +1,252 @@
+"""
+Agreement and accuracy of the streaming anomaly backends against the
+IsolationForest path (see app.services.streaming_anomaly).
+
+Every complete day of every synthetic user (see wellness_population) is
+scored the way detect_anomaly scores "today": against the 14 days that end
+on it.  The forest is fitted on those days and scores the last one; the
+streaming backends score it against the days before it, the Mahalanobis
+baseline sliding one day at a time through RollingMoments.push / pop.
+
+Reported per backend:
+
+  flag rate, and per streaming backend its agreement with the forest's
+  decisions (accuracy, Cohen's kappa, Jaccard of the flagged days), rank
+  correlation of the scores and severity difference on days both flag;
+  precision / recall / F1 against the injected anomalies;
+  latency of one score, and the import time of scikit-learn, which only
+  the forest needs.
+
+    python -m benchmarks.anomaly_agreement --users 100 --days 28 --output agreement.json
+"""
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services import streaming_anomaly
+from app.services.anomaly_models import fit_anomaly_model
+from app.services.signal_detector import ANOMALY_FEATURES, ANOMALY_SCALE_FLOOR, daily_feature_matrix
+from benchmarks.harness import git_revision, latency_summary
+from benchmarks.wellness_population import DEFAULT_NOW, build_population
+
+WINDOW_DAYS = 14
+
+
+def _isolation_severity(model, X: np.ndarray) -> float:
+    # detect_anomaly's decision and severity for the last row of X
+    score = model.score_samples(X[-1])[0]
+    if not model.is_anomaly(score):
+        return 0.0
+    severity = min(1.0, max(0.0, (-score - 0.1) / 0.5))
+    return severity if severity >= 0.3 else 0.0
+
+
+def _ranks(values: np.ndarray) -> np.ndarray:
+    return np.argsort(np.argsort(values, kind="stable"), kind="stable").astype(np.float64)
+
+
+def _spearman(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.corrcoef(_ranks(a), _ranks(b))[0, 1])
+
+
+def _kappa(a: np.ndarray, b: np.ndarray) -> float:
+    observed = np.mean(a == b)
+    expected = a.mean() * b.mean() + (1 - a.mean()) * (1 - b.mean())
+    return float((observed - expected) / (1 - expected)) if expected < 1 else 1.0
+
+
+def _accuracy(flags: np.ndarray, truth: np.ndarray) -> dict:
+    tp = int(np.sum(flags & truth))
+    precision = tp / max(int(flags.sum()), 1)
+    recall = tp / max(int(truth.sum()), 1)
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": round(precision, 3), "recall": round(recall, 3), "f1": round(f1, 3)}
+
+
+def _import_seconds(module: str) -> Optional[float]:
+    """Cold import time of `module` in a fresh interpreter that already has numpy."""
+    code = (
+        f"import numpy, time; t = time.perf_counter(); import {module}; "
+        f"print(time.perf_counter() - t)"
+    )
+    try:
+        out = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True, timeout=120
+        )
+        return round(float(out.stdout.strip()), 3)
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Scoring
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _score_user(user, now: datetime, days: int, out: dict, timings: dict) -> None:
+    today = now.date().toordinal()
+    injected = {today - (days - 1 - day) for day, _ in user.anomalies}
+    ordinals, X = daily_feature_matrix(user.window(now))
+    floor = np.asarray(ANOMALY_SCALE_FLOOR)
+
+    moments = streaming_anomaly.RollingMoments(X.shape[1])
+    lo = hi = 0                                 # rows [lo, hi) are in `moments`
+    for t, day in enumerate(ordinals):
+        if day >= today:
+            break                               # today is not complete yet
+        first = int(np.searchsorted(ordinals, day - WINDOW_DAYS + 1))
+        t0 = time.perf_counter_ns()
+        while hi < t:
+            moments.push(X[hi])
+            hi += 1
+        while lo < first:
+            moments.pop(X[lo])
+            lo += 1
+        sliding = moments.distance(X[t], floor)
+        timings["mahalanobis_sliding"].append(time.perf_counter_ns() - t0)
+
+        Xw = X[first:t + 1]
+        if len(Xw) < settings.MIN_SAMPLES_FOR_PREDICTION:
+            continue
+
+        scores = {}
+        for backend in streaming_anomaly.STREAMING_BACKENDS:
+            t0 = time.perf_counter_ns()
+            scores[backend] = streaming_anomaly.score_latest(backend, Xw, ANOMALY_SCALE_FLOOR)
+            timings[backend].append(time.perf_counter_ns() - t0)
+        out["sliding_error"] = max(
+            out["sliding_error"], abs(sliding - scores["mahalanobis"]) / max(scores["mahalanobis"], 1.0)
+        )
+
+        t0 = time.perf_counter_ns()
+        model = fit_anomaly_model(Xw, ANOMALY_FEATURES)
+        timings["isolation_forest_fit"].append(time.perf_counter_ns() - t0)
+        t0 = time.perf_counter_ns()
+        forest_severity = _isolation_severity(model, Xw)
+        timings["isolation_forest"].append(time.perf_counter_ns() - t0)
+
+        out["truth"].append(day in injected)
+        out["isolation_forest"].append(forest_severity)
+        out["isolation_score"].append(-model.score_samples(Xw[-1])[0])
+        for backend, score in scores.items():
+            out[backend].append(streaming_anomaly.severity(backend, score))
+            out[f"{backend}_score"].append(score)
+
+
+def run(args) -> dict:
+    # Late in the day, so that every earlier day is complete
+    now = DEFAULT_NOW.replace(hour=23, minute=30)
+    population = build_population(
+        args.users, args.days, args.density, args.anomaly_rate, args.seed, now
+    )
+    backends = streaming_anomaly.BACKENDS
+    out = {"truth": [], "isolation_score": [], "sliding_error": 0.0}
+    out.update({b: [] for b in backends})
+    out.update({f"{b}_score": [] for b in streaming_anomaly.STREAMING_BACKENDS})
+    timings = {name: [] for name in (*backends, "isolation_forest_fit", "mahalanobis_sliding")}
+    for user in population:
+        _score_user(user, now, args.days, out, timings)
+
+    truth = np.asarray(out["truth"])
+    severities = {b: np.asarray(out[b]) for b in backends}
+    flags = {b: s > 0 for b, s in severities.items()}
+    forest = flags["isolation_forest"]
+
+    results = {}
+    for backend in backends:
+        result = {
+            "flag_rate": round(float(flags[backend].mean()), 4),
+            "vs_injected": _accuracy(flags[backend], truth),
+            "latency": latency_summary(timings[backend]),
+        }
+        if backend != "isolation_forest":
+            both = flags[backend] & forest
+            either = flags[backend] | forest
+            result["vs_isolation_forest"] = {
+                "agreement": round(float(np.mean(flags[backend] == forest)), 4),
+                "kappa": round(_kappa(flags[backend], forest), 3),
+                "jaccard": round(float(both.sum() / max(either.sum(), 1)), 3),
+                "score_spearman": round(
+                    _spearman(np.asarray(out[f"{backend}_score"]), np.asarray(out["isolation_score"])), 3
+                ),
+                "severity_mae_both_flagged": round(float(np.mean(np.abs(
+                    severities[backend][both] - severities["isolation_forest"][both]
+                ))), 3) if both.any() else None,
+            }
+        results[backend] = result
+    results["isolation_forest"]["fit_latency"] = latency_summary(timings["isolation_forest_fit"])
+    results["mahalanobis"]["sliding_latency"] = latency_summary(timings["mahalanobis_sliding"])
+    results["mahalanobis"]["sliding_max_rel_error"] = float(f"{out['sliding_error']:.3g}")
+
+    return {
+        "meta": {
+            "timestamp":    datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git":          git_revision(),
+            "python":       platform.python_version(),
+            "numpy":        np.__version__,
+            "machine":      platform.machine(),
+            "users":        args.users,
+            "days":         args.days,
+            "density":      args.density,
+            "anomaly_rate": args.anomaly_rate,
+            "seed":         args.seed,
+        },
+        "scored_days": len(truth),
+        "injected_days": int(truth.sum()),
+        # The streaming backends need nothing beyond numpy
+        "import_s": {"isolation_forest": _import_seconds("sklearn.ensemble")},
+        "backends": results,
+    }
+
+
+def _print_report(report: dict) -> None:
+    print(f"{report['scored_days']} days scored, {report['injected_days']} with an injected anomaly")
+    print(f"sklearn.ensemble import: {report['import_s']['isolation_forest']} s")
+    print(f"{'backend':<18}{'flagged':>9}{'agree':>8}{'kappa':>8}{'rho':>7}"
+          f"{'prec':>7}{'recall':>8}{'p50 µs':>10}")
+    for name, r in report["backends"].items():
+        vs = r.get("vs_isolation_forest", {})
+        print(f"{name:<18}{r['flag_rate']:>9.1%}{vs.get('agreement', 1.0):>8.1%}"
+              f"{vs.get('kappa', 1.0):>8.2f}{vs.get('score_spearman', 1.0):>7.2f}"
+              f"{r['vs_injected']['precision']:>7.2f}{r['vs_injected']['recall']:>8.2f}"
+              f"{r['latency']['p50_us']:>10.1f}")
+    forest = report["backends"]["isolation_forest"]
+    print(f"forest fit p50 {forest['fit_latency']['p50_us'] / 1000:.1f} ms; "
+          f"sliding Mahalanobis p50 "
+          f"{report['backends']['mahalanobis']['sliding_latency']['p50_us']:.1f} µs")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Compare the streaming anomaly backends with IsolationForest on synthetic users."
+    )
+    parser.add_argument("--users", type=int, default=100, help="population size")
+    parser.add_argument("--days", type=int, default=28, help="history length in days")
+    parser.add_argument("--density", type=float, default=0.8, help="share of life that gets logged")
+    parser.add_argument("--anomaly-rate", type=float, default=0.05,
+                        help="share of user-days with an injected anomaly")
+    parser.add_argument("--seed", type=int, default=20240601, help="population seed")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+
+    report = run(args)
+    _print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""
+Measurement helpers shared by the benchmark harnesses.
+"""
+import gc
+import subprocess
+import sys
+import tracemalloc
+from typing import Callable, Optional
+
+import numpy as np
+
+
+def latency_summary(samples_ns: list[int]) -> dict:
+    if not samples_ns:
+        return {"calls": 0}
+    arr = np.asarray(samples_ns, dtype=np.float64) / 1000.0
+    return {
+        "calls":            len(samples_ns),
+        "throughput_per_s": round(len(arr) / (arr.sum() / 1e6), 1),
+        "mean_us":          round(float(arr.mean()), 2),
+        "p50_us":           round(float(np.percentile(arr, 50)), 2),
+        "p99_us":           round(float(np.percentile(arr, 99)), 2),
+        "max_us":           round(float(arr.max()), 2),
+    }
+
+
+def gc_counts() -> list[int]:
+    return [gen["collections"] for gen in gc.get_stats()]
+
+
+def memory_profile(run: Callable[[], None]) -> dict:
+    """Traced peak and retained memory of one untimed pass."""
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    try:
+        run()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    gc.collect()
+    return {
+        "peak_kib":        round(peak / 1024, 1),
+        "retained_kib":    round(current / 1024, 1),
+        "retained_blocks": sys.getallocatedblocks() - blocks_before,
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5, check=True,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
@@ -0,0 +1,269 @@
+"""
+Benchmark harness for app.services.nutrition.
+
+Scenarios (the GPT fallback is never called):
+  engine  — estimate_nutrition() with the result cache disabled, i.e. the
+            full rule engine on every call
+  cached  — estimate_nutrition() against a warm result cache
+  batch   — the vectorised batch core over the cleaned corpus in chunks
+
+For each scenario it reports throughput, p50/p99 latency overall and per
+engine path (template / parsed / fallback) and per corpus kind, GC
+collections per 1000 calls, and traced peak memory.  Results are written
+as JSON; pass --compare with an earlier file to flag regressions.
+
+    python -m benchmarks.nutrition_bench --output after.json --compare before.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+
+from app.services import nutrition
+from benchmarks.harness import gc_counts, git_revision, latency_summary, memory_profile
+from benchmarks.nutrition_corpus import KINDS, build_corpus
+
+SCENARIOS = ("engine", "cached", "batch")
+
+# (metric, True when higher is better)
+_COMPARED = (("throughput_per_s", True), ("p50_us", False), ("p99_us", False))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Measurement helpers
+# ─────────────────────────────────────────────────────────────────────────────
+
+class _ResultCacheSize:
+    """Temporarily resize the engine's result cache (0 disables it)."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+
+    def __enter__(self):
+        self._saved = nutrition._RESULT_CACHE
+        nutrition.configure_result_cache(self.maxsize, float("inf"))
+
+    def __exit__(self, *exc):
+        nutrition._RESULT_CACHE = self._saved
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Scenarios
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _per_call(corpus: list[tuple[str, str]], repeat: int) -> dict:
+    """Time estimate_nutrition() call by call, grouped by path and kind."""
+    overall: list[int] = []
+    by_method: dict[str, list[int]] = {}
+    by_kind: dict[str, list[int]] = {k: [] for k in KINDS}
+    perf = time.perf_counter_ns
+    estimate = nutrition.estimate_nutrition
+
+    gc_before = gc_counts()
+    for _ in range(repeat):
+        for kind, text in corpus:
+            t0 = perf()
+            result = estimate(text)
+            elapsed = perf() - t0
+            overall.append(elapsed)
+            by_method.setdefault(result.method, []).append(elapsed)
+            by_kind[kind].append(elapsed)
+    gc_after = gc_counts()
+
+    calls = len(overall)
+    return {
+        **latency_summary(overall),
+        "by_method": {m: latency_summary(s) for m, s in sorted(by_method.items())},
+        "by_kind":   {k: latency_summary(s) for k, s in by_kind.items() if s},
+        "gc_per_1000_calls": [
+            round((after - before) * 1000 / calls, 3)
+            for before, after in zip(gc_before, gc_after)
+        ],
+    }
+
+
+def _run_engine(corpus, repeat: int) -> dict:
+    with _ResultCacheSize(0):
+        stats = _per_call(corpus, repeat)
+        stats["memory"] = memory_profile(
+            lambda: [nutrition.estimate_nutrition(text) for _, text in corpus]
+        )
+    return stats
+
+
+def _run_cached(corpus, repeat: int) -> dict:
+    with _ResultCacheSize(len(corpus)):
+        for _, text in corpus:                  # warm up
+            nutrition.estimate_nutrition(text)
+        stats = _per_call(corpus, repeat)
+        stats["memory"] = memory_profile(
+            lambda: [nutrition.estimate_nutrition(text) for _, text in corpus]
+        )
+    return stats
+
+
+def _run_batch(corpus, repeat: int, chunk: int) -> dict:
+    texts = [nutrition._clean_text(text) for _, text in corpus if text.strip()]
+    chunks = [texts[i:i + chunk] for i in range(0, len(texts), chunk)]
+    samples: list[int] = []
+
+    gc_before = gc_counts()
+    for _ in range(repeat):
+        for part in chunks:
+            t0 = time.perf_counter_ns()
+            nutrition._estimate_rule_batch(part)
+            samples.append(time.perf_counter_ns() - t0)
+    gc_after = gc_counts()
+
+    total_s = sum(samples) / 1e9
+    calls = len(texts) * repeat
+    chunk_stats = latency_summary(samples)
+    return {
+        "calls":            calls,
+        "chunk_size":       chunk,
+        "throughput_per_s": round(calls / total_s, 1),
+        "p50_us":           round(chunk_stats["p50_us"] / chunk, 2),   # per item
+        "p99_us":           round(chunk_stats["p99_us"] / chunk, 2),
+        "chunk_p50_us":     chunk_stats["p50_us"],
+        "chunk_p99_us":     chunk_stats["p99_us"],
+        "gc_per_1000_calls": [
+            round((after - before) * 1000 / calls, 3)
+            for before, after in zip(gc_before, gc_after)
+        ],
+        "memory": memory_profile(lambda: [nutrition._estimate_rule_batch(p) for p in chunks]),
+    }
+
+
+def _path_mix(corpus) -> dict:
+    """Share of corpus items per engine path, overall and per input kind."""
+    with _ResultCacheSize(0):
+        methods = [(kind, nutrition.estimate_nutrition(text).method) for kind, text in corpus]
+    overall: dict[str, int] = {}
+    per_kind: dict[str, dict[str, int]] = {}
+    for kind, method in methods:
+        overall[method] = overall.get(method, 0) + 1
+        per_kind.setdefault(kind, {})
+        per_kind[kind][method] = per_kind[kind].get(method, 0) + 1
+    n = len(methods)
+    return {
+        "overall":  {m: round(c / n, 4) for m, c in sorted(overall.items())},
+        "by_kind":  {
+            k: {m: round(c / sum(v.values()), 4) for m, c in sorted(v.items())}
+            for k, v in per_kind.items()
+        },
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Reporting
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _print_report(report: dict) -> None:
+    print(f"corpus: {report['meta']['corpus_size']} descriptions, "
+          f"{report['meta']['ingredients']} ingredients, repeat {report['meta']['repeat']}")
+    print("path mix: " + ", ".join(f"{m} {v:.1%}" for m, v in report["mix"]["overall"].items()))
+    print(f"{'scenario':<22}{'items/s':>12}{'p50 µs':>10}{'p99 µs':>10}{'gc0/1k':>9}{'peak KiB':>10}")
+    for name, stats in report["scenarios"].items():
+        print(f"{name:<22}{stats['throughput_per_s']:>12,.0f}{stats['p50_us']:>10.1f}"
+              f"{stats['p99_us']:>10.1f}{stats['gc_per_1000_calls'][0]:>9.2f}"
+              f"{stats['memory']['peak_kib']:>10.0f}")
+        for method, sub in stats.get("by_method", {}).items():
+            print(f"  {method:<20}{sub['throughput_per_s']:>12,.0f}{sub['p50_us']:>10.1f}"
+                  f"{sub['p99_us']:>10.1f}")
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Return human-readable regressions beyond `tolerance` (0.10 = 10 %)."""
+    regressions = []
+    for name, stats in current["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        rows = [(name, stats, old)] + [
+            (f"{name}/{method}", sub, old.get("by_method", {}).get(method))
+            for method, sub in stats.get("by_method", {}).items()
+        ]
+        for label, new_stats, old_stats in rows:
+            if not old_stats:
+                continue
+            for metric, higher_is_better in _COMPARED:
+                before, after = old_stats.get(metric), new_stats.get(metric)
+                if not before or after is None:
+                    continue
+                change = (after - before) / before
+                worse = -change if higher_is_better else change
+                marker = "REGRESSION" if worse > tolerance else ""
+                print(f"{label:<24}{metric:<18}{before:>12.1f} → {after:>12.1f}"
+                      f"  {change:+7.1%} {marker}")
+                if marker:
+                    regressions.append(f"{label} {metric} {change:+.1%}")
+    if current["mix"]["overall"] != baseline.get("mix", {}).get("overall"):
+        print(f"path mix changed: {baseline.get('mix', {}).get('overall')} → "
+              f"{current['mix']['overall']}")
+    return regressions
+
+
+def run(size: int, seed: int, repeat: int, chunk: int) -> dict:
+    corpus = build_corpus(size, seed)
+    report = {
+        "meta": {
+            "timestamp":   datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git":         git_revision(),
+            "python":      platform.python_version(),
+            "numpy":       np.__version__,
+            "machine":     platform.machine(),
+            "corpus_size": size,
+            "seed":        seed,
+            "repeat":      repeat,
+            "ingredients": len(nutrition.INGREDIENT_DB),
+        },
+        "mix": _path_mix(corpus),
+        "scenarios": {},
+    }
+    report["scenarios"]["engine"] = _run_engine(corpus, repeat)
+    report["scenarios"]["cached"] = _run_cached(corpus, repeat)
+    report["scenarios"]["batch"] = _run_batch(corpus, repeat, chunk)
+    return report
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the rule-based nutrition engine.")
+    parser.add_argument("--size", type=int, default=3000, help="corpus size")
+    parser.add_argument("--seed", type=int, default=20240601, help="corpus seed")
+    parser.add_argument("--repeat", type=int, default=3, help="timed passes per scenario")
+    parser.add_argument("--chunk", type=int, default=500, help="batch scenario chunk size")
+    parser.add_argument("--food-store", help="compiled food table to load first")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="relative slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    if args.food_store:
+        nutrition.load_food_store(args.food_store)
+
+    report = run(args.size, args.seed, args.repeat, args.chunk)
+    _print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
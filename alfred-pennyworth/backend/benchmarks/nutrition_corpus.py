@@ -0,0 +1,132 @@
+"""
+Deterministic corpus of meal descriptions for the nutrition benchmarks.
+
+The vocabulary below is fixed and independent of the engine's own tables,
+so the corpus stays identical between runs (and across engine changes) for
+a given size and seed.  Each entry is tagged with the kind of input it was
+built as; which path the engine actually takes is measured separately.
+"""
+import random
+
+KINDS = ("template", "parsed", "fallback", "typo", "long")
+
+_DISHES = [
+    "chicken curry", "butter chicken", "pad thai", "ramen", "pho", "sushi",
+    "chicken biryani", "dal", "palak paneer", "chana masala", "fried rice",
+    "egg fried rice", "nasi goreng", "beef stir fry", "dumplings", "gyoza",
+    "miso soup", "cheeseburger", "margherita pizza", "pizza", "spaghetti bolognese",
+    "mac and cheese", "grilled chicken", "chicken sandwich", "blt", "steak",
+    "fish and chips", "caesar salad", "greek salad", "tacos", "burrito",
+    "quesadilla", "nachos", "oatmeal", "scrambled eggs", "avocado toast",
+    "pancakes", "french toast", "granola", "smoothie bowl", "chicken soup",
+    "tomato soup", "lentil soup", "minestrone", "fruit salad",
+    "peanut butter toast", "yogurt with fruit", "trail mix", "poke bowl",
+    "laksa", "congee", "burrito bowl", "fish taco",
+]
+
+_DISH_PREFIXES = ["", "", "", "homemade ", "leftover ", "a big ", "small ", "spicy ",
+                  "vegetarian ", "takeaway "]
+_DISH_SUFFIXES = ["", "", "", " for lunch", " for dinner", " at the office",
+                  " from the canteen", " (restaurant portion)", " with a coke"]
+
+_INGREDIENTS = [
+    "chicken breast", "chicken thigh", "salmon", "tuna", "beef", "ground beef",
+    "pork", "tofu", "eggs", "egg", "white rice", "brown rice", "rice", "pasta",
+    "spaghetti", "quinoa", "oats", "bread", "potato", "sweet potato", "broccoli",
+    "spinach", "carrot", "tomato", "cucumber", "avocado", "banana", "apple",
+    "orange", "blueberries", "strawberries", "milk", "yogurt", "greek yogurt",
+    "cheese", "cheddar cheese", "mozzarella", "butter", "olive oil", "honey",
+    "peanut butter", "almonds", "walnuts", "hummus", "lentils", "chickpeas",
+    "black beans", "soy sauce", "coffee", "orange juice",
+]
+
+_QUANTITIES = [
+    "", "", "1", "2", "3", "1/2", "100g", "150g", "200 g", "250g", "1 cup",
+    "2 cups", "1/2 cup", "1 tbsp", "2 tbsp", "1 tsp", "1 slice", "2 slices",
+    "1 handful", "1 piece", "1 bowl", "1 serving", "30g", "500 ml",
+]
+
+_COOKING = ["", "", "", "grilled ", "fried ", "steamed ", "boiled ", "roasted ",
+            "baked ", "stir fried ", "raw ", "poached "]
+
+_JOINERS = [", ", " and ", " with ", " plus ", "; "]
+
+_UNKNOWN = [
+    "something from the vending machine", "mystery casserole", "grandma's special",
+    "the usual", "snack", "whatever was in the fridge", "team lunch",
+    "street food", "airport meal", "protein bar", "energy drink", "leftovers",
+    "buffet plate", "office cake", "bits and pieces", "tasting menu",
+    "brunch", "picnic food", "kebab", "moussaka", "pierogi", "jollof",
+    "bibimbap", "shawarma", "tiramisu", "croissant", "bagel", "muffin",
+]
+
+
+def _typo(rng: random.Random, word: str) -> str:
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    op = rng.randrange(3)
+    if op == 0:     # substitution
+        return word[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + word[i + 1:]
+    if op == 1:     # deletion
+        return word[:i] + word[i + 1:]
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]   # transposition
+
+
+def _ingredient_item(rng: random.Random) -> str:
+    qty = rng.choice(_QUANTITIES)
+    item = rng.choice(_COOKING) + rng.choice(_INGREDIENTS)
+    return f"{qty} {item}".strip()
+
+
+def _template(rng: random.Random) -> str:
+    return rng.choice(_DISH_PREFIXES) + rng.choice(_DISHES) + rng.choice(_DISH_SUFFIXES)
+
+
+def _parsed(rng: random.Random) -> str:
+    items = [_ingredient_item(rng) for _ in range(rng.randint(2, 5))]
+    return rng.choice(_JOINERS).join(items)
+
+
+def _fallback(rng: random.Random) -> str:
+    return rng.choice(_UNKNOWN)
+
+
+def _with_typos(rng: random.Random) -> str:
+    text = _template(rng) if rng.random() < 0.5 else _parsed(rng)
+    words = text.split(" ")
+    for _ in range(rng.randint(1, 2)):
+        i = rng.randrange(len(words))
+        words[i] = _typo(rng, words[i])
+    return " ".join(words)
+
+
+def _long(rng: random.Random) -> str:
+    parts = [_ingredient_item(rng) for _ in range(rng.randint(10, 25))]
+    if rng.random() < 0.5:
+        parts.insert(0, rng.choice(_DISHES))
+    return "had " + ", ".join(parts) + " and a " + rng.choice(_UNKNOWN)
+
+
+_BUILDERS = {
+    "template": _template,
+    "parsed":   _parsed,
+    "fallback": _fallback,
+    "typo":     _with_typos,
+    "long":     _long,
+}
+
+# Roughly what the meals endpoint sees: mostly dishes and short ingredient lists
+DEFAULT_MIX = {"template": 0.40, "parsed": 0.30, "fallback": 0.10, "typo": 0.15, "long": 0.05}
+
+
+def build_corpus(
+    size: int = 3000,
+    seed: int = 20240601,
+    mix: dict[str, float] = DEFAULT_MIX,
+) -> list[tuple[str, str]]:
+    """Return `size` (kind, description) pairs; identical for the same arguments."""
+    rng = random.Random(seed)
+    kinds = list(mix)
+    weights = [mix[k] for k in kinds]
+    return [(kind, _BUILDERS[kind](rng)) for kind in rng.choices(kinds, weights, k=size)]
@@ -0,0 +1,301 @@
+"""
+Benchmark harness for signal detection (app.services.signal_detector and
+app.services.signal_batch) over synthetic populations.
+
+For every (users, days) cell of the grid it builds a population (see
+wellness_population) and times, per user:
+
+  window        — WellnessWindow.from_records, i.e. building the columns
+  baselines     — the three live baselines the rule detectors read
+  <detector>    — each rule detector on its own, with live baselines
+  features      — daily_feature_matrix
+  anomaly_fit   — detect_anomaly fitting a forest per call (no stored model)
+  anomaly       — detect_anomaly against a stored per-user model
+  signals       — detect_signals with stored anomaly models, i.e. the
+                  request path without the database
+  batch         — detect_signals_batch over the whole population at once
+
+The model-fitting scenarios (anomaly_fit, and the model fit before anomaly
+and signals) run on the first --sample users only.  Each scenario reports
+wall and CPU time per user, p50/p99 latency, GC collections per 1000 users
+and traced peak memory of one pass; --compare flags regressions against an
+earlier report.  Nothing touches the database, Redis or the network:
+anomaly models are written to a temporary directory.
+
+    python -m benchmarks.signal_bench --users 100,1000 --days 7,14,30 --output before.json
+    python -m benchmarks.signal_bench --output after.json --compare before.json
+"""
+import argparse
+import json
+import logging
+import platform
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services import anomaly_models
+from app.services import signal_detector as sd
+from app.services.baselines import BaselineProvider
+from app.services.signal_batch import BATCH_METRICS, detect_signals_batch
+from app.services.wellness_window import WellnessWindow, WindowBatch
+from benchmarks.harness import gc_counts, git_revision, latency_summary, memory_profile
+from benchmarks.wellness_population import DEFAULT_NOW, build_population
+
+RULE_DETECTORS: dict[str, Callable[[WellnessWindow], object]] = {
+    "meal_gap":         sd.detect_meal_gap,
+    "poor_sleep":       lambda w: sd.detect_poor_sleep(w, BaselineProvider.live(w)),
+    "low_energy":       lambda w: sd.detect_low_energy(w, BaselineProvider.live(w)),
+    "recovery_needed":  lambda w: sd.detect_recovery_needed(w, BaselineProvider.live(w)),
+    "dehydration":      sd.detect_dehydration,
+}
+
+# (metric, True when higher is better)
+_COMPARED = (("throughput_per_s", True), ("p50_us", False), ("cpu_us_per_user", False))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Measurement
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _per_user(fn: Callable, items: list, repeat: int) -> dict:
+    """Time fn(item) call by call; CPU time is over the whole loop."""
+    samples: list[int] = []
+    perf = time.perf_counter_ns
+    gc_before = gc_counts()
+    cpu_before = time.process_time_ns()
+    for _ in range(repeat):
+        for item in items:
+            t0 = perf()
+            fn(item)
+            samples.append(perf() - t0)
+    cpu = time.process_time_ns() - cpu_before
+    gc_after = gc_counts()
+    calls = len(samples)
+    return {
+        **latency_summary(samples),
+        "cpu_us_per_user": round(cpu / 1000 / max(calls, 1), 2),
+        "gc_per_1000_users": [
+            round((after - before) * 1000 / max(calls, 1), 3)
+            for before, after in zip(gc_before, gc_after)
+        ],
+        "memory": memory_profile(lambda: [fn(item) for item in items]),
+    }
+
+
+def _whole_batch(batch: WindowBatch, repeat: int) -> dict:
+    """Time detect_signals_batch over the population; latencies are per user."""
+    samples: list[int] = []
+    gc_before = gc_counts()
+    cpu_before = time.process_time_ns()
+    for _ in range(repeat):
+        t0 = time.perf_counter_ns()
+        detect_signals_batch(batch)
+        samples.append(time.perf_counter_ns() - t0)
+    cpu = time.process_time_ns() - cpu_before
+    gc_after = gc_counts()
+    n = len(batch)
+    calls = n * repeat
+    whole = latency_summary(samples)
+    return {
+        "calls":            calls,
+        "throughput_per_s": round(calls / (sum(samples) / 1e9), 1),
+        "p50_us":           round(whole["p50_us"] / n, 2),      # per user
+        "p99_us":           round(whole["p99_us"] / n, 2),
+        "batch_p50_ms":     round(whole["p50_us"] / 1000, 2),
+        "cpu_us_per_user":  round(cpu / 1000 / calls, 2),
+        "gc_per_1000_users": [
+            round((after - before) * 1000 / calls, 3)
+            for before, after in zip(gc_before, gc_after)
+        ],
+        "memory": memory_profile(lambda: detect_signals_batch(batch)),
+    }
+
+
+def _live_baselines(window: WellnessWindow) -> None:
+    provider = BaselineProvider.live(window)
+    for metric in BATCH_METRICS:
+        provider.get(metric)
+
+
+def _fit_models(users: list, windows: list[WellnessWindow]) -> None:
+    for user, window in zip(users, windows):
+        _, X = sd.daily_feature_matrix(window)
+        if X.shape[0] >= settings.MIN_SAMPLES_FOR_PREDICTION:
+            anomaly_models.save_anomaly_model(
+                user.user_id, anomaly_models.fit_anomaly_model(X, sd.ANOMALY_FEATURES)
+            )
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Grid
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _cell(n_users: int, days: int, args, now: datetime) -> dict:
+    t0 = time.perf_counter()
+    population = build_population(n_users, days, args.density, args.anomaly_rate, args.seed, now)
+    generated_s = time.perf_counter() - t0
+    windows = [u.window(now) for u in population]
+    sample = population[:args.sample]
+    sample_windows = windows[:args.sample]
+
+    scenarios = {
+        "window": _per_user(lambda u: u.window(now), population, args.repeat),
+        "baselines": _per_user(_live_baselines, windows, args.repeat),
+    }
+    for name, detector in RULE_DETECTORS.items():
+        scenarios[name] = _per_user(detector, windows, args.repeat)
+    scenarios["features"] = _per_user(sd.daily_feature_matrix, windows, args.repeat)
+    scenarios["anomaly_fit"] = _per_user(sd.detect_anomaly, sample_windows, 1)
+
+    _fit_models(sample, sample_windows)
+    pairs = list(zip(sample_windows, (u.user_id for u in sample)))
+    scenarios["anomaly"] = _per_user(lambda p: sd.detect_anomaly(*p), pairs, args.repeat)
+    scenarios["signals"] = _per_user(lambda p: sd.detect_signals(p[0], p[1]), pairs, args.repeat)
+
+    batch = WindowBatch.from_windows([u.user_id for u in population], windows)
+    scenarios["batch"] = _whole_batch(batch, args.repeat)
+    mix = Counter(s.type.value if s else "none" for s in detect_signals_batch(batch))
+
+    return {
+        "population": {
+            "users":             n_users,
+            "days":              days,
+            "generated_s":       round(generated_s, 2),
+            "meals_per_user":    round(sum(len(u.meals) for u in population) / n_users, 1),
+            "sleep_per_user":    round(sum(len(u.sleep) for u in population) / n_users, 1),
+            "activities_per_user": round(sum(len(u.activities) for u in population) / n_users, 1),
+            "injected_anomalies": sum(len(u.anomalies) for u in population),
+        },
+        "signal_mix": {k: round(v / n_users, 4) for k, v in sorted(mix.items())},
+        "scenarios": scenarios,
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Reporting
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _print_report(report: dict) -> None:
+    for key, cell in report["grid"].items():
+        pop = cell["population"]
+        print(f"\n{key}: {pop['meals_per_user']} meals, {pop['sleep_per_user']} nights, "
+              f"{pop['activities_per_user']} activities per user")
+        print("signals: " + ", ".join(f"{k} {v:.1%}" for k, v in cell["signal_mix"].items()))
+        print(f"{'scenario':<18}{'users/s':>12}{'p50 µs':>10}{'p99 µs':>10}"
+              f"{'cpu µs':>10}{'gc0/1k':>9}{'peak KiB':>10}")
+        for name, stats in cell["scenarios"].items():
+            print(f"{name:<18}{stats['throughput_per_s']:>12,.0f}{stats['p50_us']:>10.1f}"
+                  f"{stats['p99_us']:>10.1f}{stats['cpu_us_per_user']:>10.1f}"
+                  f"{stats['gc_per_1000_users'][0]:>9.2f}{stats['memory']['peak_kib']:>10.0f}")
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Return human-readable regressions beyond `tolerance` (0.10 = 10 %)."""
+    regressions = []
+    for key, cell in current["grid"].items():
+        old_cell = baseline.get("grid", {}).get(key)
+        if not old_cell:
+            continue
+        for name, stats in cell["scenarios"].items():
+            old = old_cell["scenarios"].get(name)
+            if not old:
+                continue
+            for metric, higher_is_better in _COMPARED:
+                before, after = old.get(metric), stats.get(metric)
+                if not before or after is None:
+                    continue
+                change = (after - before) / before
+                worse = -change if higher_is_better else change
+                marker = "REGRESSION" if worse > tolerance else ""
+                label = f"{key} {name}"
+                print(f"{label:<30}{metric:<18}{before:>12.1f} → {after:>12.1f}"
+                      f"  {change:+7.1%} {marker}")
+                if marker:
+                    regressions.append(f"{label} {metric} {change:+.1%}")
+        if cell["signal_mix"] != old_cell.get("signal_mix"):
+            print(f"{key} signal mix changed: {old_cell.get('signal_mix')} → {cell['signal_mix']}")
+    return regressions
+
+
+def run(args) -> dict:
+    now = DEFAULT_NOW
+    report = {
+        "meta": {
+            "timestamp":    datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git":          git_revision(),
+            "python":       platform.python_version(),
+            "numpy":        np.__version__,
+            "machine":      platform.machine(),
+            "now":          now.isoformat(),
+            "density":      args.density,
+            "anomaly_rate": args.anomaly_rate,
+            "seed":         args.seed,
+            "sample":       args.sample,
+            "repeat":       args.repeat,
+        },
+        "grid": {},
+    }
+    saved_dir = settings.ANOMALY_MODEL_DIR
+    with tempfile.TemporaryDirectory(prefix="signal-bench-") as model_dir:
+        settings.ANOMALY_MODEL_DIR = model_dir
+        try:
+            for n_users in args.users:
+                for days in args.days:
+                    report["grid"][f"users={n_users},days={days}"] = _cell(n_users, days, args, now)
+        finally:
+            settings.ANOMALY_MODEL_DIR = saved_dir
+    return report
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark signal detection on synthetic users.")
+    parser.add_argument("--users", type=_int_list, default=[100, 1000],
+                        help="comma-separated population sizes")
+    parser.add_argument("--days", type=_int_list, default=[7, 14, 30],
+                        help="comma-separated history lengths in days")
+    parser.add_argument("--density", type=float, default=0.8, help="share of life that gets logged")
+    parser.add_argument("--anomaly-rate", type=float, default=0.05,
+                        help="share of user-days with an injected anomaly")
+    parser.add_argument("--seed", type=int, default=20240601, help="population seed")
+    parser.add_argument("--sample", type=int, default=25,
+                        help="users for the model-fitting scenarios")
+    parser.add_argument("--repeat", type=int, default=3, help="timed passes per scenario")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="relative slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    # detect_signals logs every decision at INFO
+    logging.disable(logging.INFO)
+
+    report = run(args)
+    _print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+Deterministic synthetic population of meals, sleep and activities for the
+signal benchmarks.
+
+Each user gets a fixed habit profile (bedtime, sleep need and quality, meal
+times and sizes, how active they are, whether they log water) and then
+`days` days of records ending at `now`, drawn around that profile.
+`density` scales how much of that life actually gets logged: at 1.0 a user
+logs nearly every meal, night and workout, at 0.3 most of it is missing.
+A fraction of user-days (`anomaly_rate`) gets one injected anomaly: a
+short, poor night, a binge day, a skipped-meals day or an extreme workout.
+
+Records are dicts keyed like the table columns, as WellnessWindow.from_records
+takes them.  The population is identical for the same arguments.
+"""
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from app.services.wellness_window import WellnessWindow, WindowBatch
+
+ANOMALY_KINDS = ("poor_night", "binge", "skipped_meals", "extreme_workout")
+
+_MEALS = (          # (meal hour, share of the day's calories)
+    (8.0, 0.25),
+    (13.0, 0.35),
+    (19.5, 0.35),
+)
+_SNACK_HOUR = 16.0
+
+# A fixed afternoon, so that reports stay comparable between runs
+DEFAULT_NOW = datetime(2024, 6, 1, 15, 30, tzinfo=timezone.utc)
+
+
+@dataclass
+class SyntheticUser:
+    user_id: int
+    meals: list[dict] = field(default_factory=list)
+    sleep: list[dict] = field(default_factory=list)
+    activities: list[dict] = field(default_factory=list)
+    # (day index, kind) of every injected anomaly
+    anomalies: list[tuple[int, str]] = field(default_factory=list)
+
+    def window(self, now: datetime) -> WellnessWindow:
+        return WellnessWindow.from_records(self.meals, self.sleep, self.activities, now)
+
+
+@dataclass(frozen=True)
+class _Profile:
+    bedtime: float              # hours after the day's midnight (23.5 = 23:30)
+    sleep_minutes: float
+    sleep_quality: float
+    daily_calories: float
+    meal_jitter: float          # std of meal times, hours
+    workouts_per_day: float
+    workout_minutes: float
+    logs_water: bool
+
+
+def _profile(rng: random.Random) -> _Profile:
+    return _Profile(
+        bedtime=rng.uniform(21.5, 25.0),
+        sleep_minutes=rng.gauss(430, 35),
+        sleep_quality=min(9.5, max(4.0, rng.gauss(7.0, 1.0))),
+        daily_calories=rng.gauss(2100, 350),
+        meal_jitter=rng.uniform(0.3, 1.2),
+        workouts_per_day=rng.choice((0.0, 0.3, 0.6, 1.0, 1.5)),
+        workout_minutes=rng.uniform(25, 70),
+        logs_water=rng.random() < 0.4,
+    )
+
+
+def _day(
+    rng: random.Random,
+    user: SyntheticUser,
+    p: _Profile,
+    midnight: datetime,
+    density: float,
+    anomaly: Optional[str],
+    now: datetime,
+) -> None:
+    def at(hours: float) -> datetime:
+        return midnight + timedelta(hours=hours)
+
+    # Sleep that starts this evening
+    if rng.random() < 0.9 * density:
+        minutes = rng.gauss(p.sleep_minutes, 40)
+        quality = rng.gauss(p.sleep_quality, 0.8)
+        if anomaly == "poor_night":
+            minutes *= rng.uniform(0.4, 0.6)
+            quality -= rng.uniform(3, 5)
+        minutes = max(90, round(minutes))
+        start = at(rng.gauss(p.bedtime, 0.6))
+        end = start + timedelta(minutes=minutes)
+        if end <= now:
+            user.sleep.append({
+                "sleep_start": start,
+                "sleep_end": end,
+                "duration_minutes": minutes,
+                "quality_score": round(min(10.0, max(1.0, quality)), 1),
+            })
+
+    # Meals
+    scale = rng.uniform(1.8, 2.5) if anomaly == "binge" else 1.0
+    for hour, share in _MEALS:
+        if anomaly == "skipped_meals" and hour > 10:
+            continue
+        if rng.random() < 0.85 * density:
+            t = at(rng.gauss(hour, p.meal_jitter))
+            if t <= now:
+                user.meals.append({
+                    "meal_time": t,
+                    "calories": round(rng.gauss(p.daily_calories * share, 120) * scale),
+                    "water_ml": round(rng.uniform(150, 600)) if p.logs_water else None,
+                })
+    if rng.random() < 0.3 * density:
+        t = at(rng.gauss(_SNACK_HOUR, 1.0))
+        if t <= now:
+            user.meals.append({
+                "meal_time": t,
+                "calories": round(rng.uniform(100, 350) * scale),
+                "water_ml": round(rng.uniform(100, 300)) if p.logs_water else None,
+            })
+
+    # Activities
+    workouts = int(p.workouts_per_day) + (rng.random() < p.workouts_per_day % 1)
+    if anomaly == "extreme_workout":
+        workouts += 1
+    for i in range(workouts):
+        if rng.random() >= density:
+            continue
+        minutes = max(10, round(rng.gauss(p.workout_minutes, 12)))
+        if anomaly == "extreme_workout" and i == workouts - 1:
+            minutes = round(rng.uniform(120, 240))
+        t = at(rng.uniform(6, 20))
+        if t <= now:
+            user.activities.append({
+                "start_time": t,
+                "duration_minutes": minutes,
+                "calories_burned": round(minutes * rng.uniform(6, 11)),
+            })
+
+
+def build_population(
+    n_users: int = 1000,
+    days: int = 14,
+    density: float = 0.8,
+    anomaly_rate: float = 0.05,
+    seed: int = 20240601,
+    now: datetime = DEFAULT_NOW,
+) -> list[SyntheticUser]:
+    """
+    `n_users` users with `days` days of history up to `now` (today included);
+    identical for the same arguments.
+    """
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    rng = random.Random(seed)
+    population = []
+    for user_id in range(1, n_users + 1):
+        p = _profile(rng)
+        user = SyntheticUser(user_id)
+        for day in range(days):
+            anomaly = rng.choice(ANOMALY_KINDS) if rng.random() < anomaly_rate else None
+            if anomaly:
+                user.anomalies.append((day, anomaly))
+            _day(rng, user, p, today - timedelta(days=days - 1 - day), density, anomaly, now)
+        population.append(user)
+    return population
+
+
+def build_batch(population: list[SyntheticUser], now: datetime) -> WindowBatch:
+    return WindowBatch.from_windows(
+        [u.user_id for u in population], [u.window(now) for u in population]
+    )